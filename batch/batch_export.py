@@ -0,0 +1,251 @@
+# BlenderFDS, an open tool for the NIST Fire Dynamics Simulator
+# Copyright (C) 2013  Emanuele Gissi, http://www.blenderfds.org
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""BlenderFDS, headless batch exporter.
+
+Run with Python, or headless with Blender, with the BlenderFDS addon installed:
+
+    python batch/batch_export.py "cases/*.blend" -j 4 --status status.json
+    blender -b --python batch/batch_export.py -- "cases/**/*.blend" --scene "Fire*"
+
+Each .blend file is opened by a headless Blender process, that exports its
+active Scene when matching the --scene patterns (all Scenes by default).
+The other matching Scenes of the file are then exported by more processes,
+started with the Blender --scene option. Processes run in parallel.
+The status of each case (.blend and FDS filepaths, Scene, error message,
+and wall time) is printed, and saved to a JSON file. The exit code is 1 if
+any case failed.
+"""
+
+import sys, os, json, glob, time, argparse, fnmatch, subprocess, tempfile, traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+PKG = "blenderfds28x"
+
+
+# Driver, run by Python or Blender
+
+
+def get_blend_filepaths(patterns) -> "filepaths":
+    """Get the sorted .blend filepaths matching the glob patterns."""
+    filepaths = set()
+    for pattern in patterns:
+        for filepath in glob.glob(pattern, recursive=True):
+            if filepath.lower().endswith(".blend"):
+                filepaths.add(os.path.abspath(filepath))
+    return sorted(filepaths)
+
+
+def run_process(args, filepath, scene=None) -> "cases, scenes":
+    """Export from a .blend file in a Blender process, get its cases and other Scenes."""
+    fd, status_filepath = tempfile.mkstemp(prefix="bfds_", suffix=".json")
+    os.close(fd)
+    cmd = [args.blender, "-b", "--factory-startup", filepath]
+    if scene:
+        cmd += ["--scene", scene]  # set the context Scene
+    cmd += ["--python", os.path.abspath(__file__), "--", "--worker"]
+    cmd += ["--status", status_filepath, "--pool-workers", str(args.pool_workers)]
+    if args.out_dir:
+        cmd += ["--out-dir", os.path.abspath(args.out_dir)]
+    if scene:
+        cmd += ["--only-context-scene"]
+    cmd += [f"--scene={pattern}" for pattern in args.scene]
+    t0, p = time.time(), None
+    try:
+        p = subprocess.run(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=args.timeout
+        )
+        with open(status_filepath) as f:
+            status = json.load(f)
+        return status["cases"], status["scenes"]
+    except (OSError, ValueError, subprocess.TimeoutExpired) as err:
+        if isinstance(err, subprocess.TimeoutExpired):
+            msg = f"Blender process timed out after {args.timeout} s"
+        elif p:  # failed before writing its status
+            output = p.stdout.decode(errors="replace").strip().splitlines()
+            msg = f"Blender process failed ({p.returncode}): {' '.join(output[-3:])}"
+        else:
+            msg = f"Blender process not started: {err}"
+        case = _get_case(filepath, scene, None, msg, time.time() - t0)
+        return [case], list()
+    finally:
+        os.remove(status_filepath)
+
+
+def run(args) -> "cases":
+    """Export all the requested cases, running Blender processes in parallel."""
+    filepaths = get_blend_filepaths(args.patterns)
+    if not filepaths:
+        print("BFDS: batch: no .blend file matching", args.patterns)
+        return list()
+    print(f"BFDS: batch: exporting {len(filepaths)} .blend files, {args.jobs} jobs")
+    cases = list()
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        todo = {executor.submit(run_process, args, fp): fp for fp in filepaths}
+        while todo:
+            done, _ = wait(todo, return_when=FIRST_COMPLETED)
+            for future in done:
+                filepath = todo.pop(future)
+                new_cases, scenes = future.result()
+                for case in new_cases:
+                    _print_case(case)
+                cases.extend(new_cases)
+                for scene in scenes:
+                    todo[executor.submit(run_process, args, filepath, scene)] = filepath
+    cases.sort(key=lambda k: (k["blend"], k["scene"] or ""))
+    _check_overwritten(cases)
+    return cases
+
+
+def _check_overwritten(cases):
+    """Fail the cases exported to the same FDS filepath, eg. same Scene names."""
+    counts = dict()
+    for case in cases:
+        if case["ok"]:
+            counts[case["fds"]] = counts.get(case["fds"], 0) + 1
+    for case in cases:
+        if case["ok"] and counts[case["fds"]] > 1:
+            case["ok"] = False
+            case["msg"] = f"FDS file <{case['fds']}> written by more cases"
+            _print_case(case)
+
+
+def _print_case(case):
+    """Print the status of an exported case."""
+    name = f"{os.path.basename(case['blend'])} > {case['scene'] or '?'}"
+    if case["ok"]:
+        print(f"BFDS: batch: {name}: exported in {case['time']:.3f} s: {case['fds']}")
+    else:
+        print(f"BFDS: batch: {name}: ERROR: {case['msg']}")
+
+
+def _get_case(blend, scene, fds, msg, dt) -> "case":
+    """Get the status of an exported case, failed if no fds filepath."""
+    ok = fds is not None
+    return {
+        "blend": blend,
+        "scene": scene,
+        "fds": fds,
+        "ok": ok,
+        "msg": msg,
+        "time": dt,
+    }
+
+
+# Worker, run by Blender
+
+
+def is_matching(name, patterns) -> "bool":
+    """Check if name matches any of the fnmatch patterns, or there are none."""
+    return not patterns or any(fnmatch.fnmatchcase(name, p) for p in patterns)
+
+
+def export_scenes(args) -> "cases, scenes":
+    """Export the context Scene, and get the other Scenes to be exported."""
+    import bpy, addon_utils, importlib
+
+    addon_utils.enable(PKG, default_set=True)
+    menus = importlib.import_module(f"{PKG}.bl.menus")
+    BFException = importlib.import_module(f"{PKG}.types").BFException
+    bpy.context.preferences.addons[PKG].preferences.bf_pref_workers = args.pool_workers
+    context, blend = bpy.context, bpy.data.filepath
+    sc = context.scene
+    cases, scenes = list(), list()
+    if args.only_context_scene or is_matching(sc.name, args.scene):
+        t0 = time.time()
+        filepath = menus.get_fds_filepath(sc, args.out_dir)
+        try:
+            msg = menus.export_fds(context, filepath)
+        except BFException as err:
+            filepath, msg = None, str(err)
+        except Exception as err:
+            traceback.print_exc()
+            filepath, msg = None, f"Unexpected error: {err.__class__.__name__}: {err}"
+        cases.append(_get_case(blend, sc.name, filepath, msg, time.time() - t0))
+    if not args.only_context_scene:
+        scenes = [
+            s.name
+            for s in bpy.data.scenes
+            if s != sc and is_matching(s.name, args.scene)
+        ]
+    return cases, scenes
+
+
+# Main
+
+
+def main(argv, blender=None):
+    parser = argparse.ArgumentParser(
+        prog=blender and "blender -b --python batch/batch_export.py --" or None,
+        description="BlenderFDS headless batch exporter",
+    )
+    parser.add_argument("patterns", nargs="*", help="glob patterns of .blend files")
+    parser.add_argument(
+        "--scene",
+        action="append",
+        default=list(),
+        help="export the Scenes matching this pattern (repeatable, default all)",
+    )
+    parser.add_argument("--out-dir", help="FDS case directory (default from Scene)")
+    parser.add_argument("--status", help="save the status of cases to JSON file")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="parallel Blender processes"
+    )
+    parser.add_argument(
+        "--pool-workers",
+        type=int,
+        default=1,
+        help="worker processes forked by each Blender (default 1, 0 for cores / jobs)",
+    )
+    parser.add_argument("--timeout", type=float, help="timeout of each process, in s")
+    parser.add_argument("--blender", help="Blender executable (default $BLENDER)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--only-context-scene", action="store_true", help=argparse.SUPPRESS
+    )
+    args = parser.parse_args(argv)
+    # Worker
+    if args.worker:
+        cases, scenes = export_scenes(args)
+        with open(args.status, "w") as f:
+            json.dump({"cases": cases, "scenes": scenes}, f)
+        return
+    # Driver
+    if not args.patterns:
+        parser.error("no .blend file pattern")
+    args.jobs = max(args.jobs, 1)
+    if args.pool_workers == 0:
+        args.pool_workers = max((os.cpu_count() or 1) // args.jobs, 1)
+    args.blender = args.blender or os.environ.get("BLENDER") or blender or "blender"
+    cases = run(args)
+    if args.status:
+        with open(args.status, "w") as f:
+            json.dump(cases, f, indent=2)
+        print(f"BFDS: batch: status saved to <{args.status}>")
+    failed = sum(not case["ok"] for case in cases)
+    print(f"BFDS: batch: {len(cases) - failed} cases exported, {failed} failed")
+    if failed or not cases:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    try:
+        import bpy
+    except ImportError:  # run by Python
+        main(sys.argv[1:])
+    else:  # run by Blender
+        argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else list()
+        main(argv, blender=bpy.app.binary_path)
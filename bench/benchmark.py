@@ -0,0 +1,280 @@
+# BlenderFDS, an open tool for the NIST Fire Dynamics Simulator
+# Copyright (C) 2013  Emanuele Gissi, http://www.blenderfds.org
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""BlenderFDS, voxelization benchmark suite.
+
+Run headless with the BlenderFDS addon installed:
+
+    blender -b --factory-startup --python bench/benchmark.py -- --out bench.json
+    blender -b --factory-startup --python bench/benchmark.py -- --compare bench.json
+
+Synthetic reference geometries are generated at several sizes and voxel
+resolutions, then voxelized, pixelized, and triangulated. Wall time, peak
+memory, face count, and resulting XB count of each case are saved to a JSON
+file. In comparison mode, cases slower than the stored baseline are flagged.
+"""
+
+import sys, json, time, argparse, tracemalloc, random
+from math import sin, cos
+
+import bpy, bmesh, addon_utils
+from mathutils import Matrix
+
+PKG = "blenderfds28x"
+
+
+# Synthetic reference geometries, in a new empty scene
+
+
+def _new_ob(name, bm):
+    """Link a new Object from bmesh to the scene, and make it active."""
+    me = bpy.data.meshes.new(name)
+    bm.to_mesh(me)
+    bm.free()
+    ob = bpy.data.objects.new(name, me)
+    bpy.context.collection.objects.link(ob)
+    bpy.context.view_layer.objects.active = ob
+    return ob
+
+
+def make_sphere(size):
+    """Sphere of radius size."""
+    bm = bmesh.new()
+    bmesh.ops.create_uvsphere(bm, u_segments=64, v_segments=32, diameter=size)
+    return _new_ob(f"sphere_{size:g}", bm)
+
+
+def make_building(size, floors=8):
+    """Stair-stepped building, size wide."""
+    bm = bmesh.new()
+    h = size / floors
+    geom = bmesh.ops.create_cube(bm, size=1.0)
+    bmesh.ops.scale(bm, vec=(size, size * 0.6, h), verts=geom["verts"])
+    bmesh.ops.translate(bm, vec=(0.0, 0.0, h / 2.0), verts=geom["verts"])
+    for _ in range(1, floors):
+        # Inset the roof, and extrude it up by one floor
+        top = max(bm.faces, key=lambda f: f.calc_center_median().z)
+        bmesh.ops.inset_region(bm, faces=[top], thickness=size / floors / 3.0)
+        geom = bmesh.ops.extrude_face_region(bm, geom=[top])
+        verts = [e for e in geom["geom"] if isinstance(e, bmesh.types.BMVert)]
+        bmesh.ops.translate(bm, vec=(0.0, 0.0, h), verts=verts)
+        bmesh.ops.delete(bm, geom=[top], context="FACES_ONLY")
+    bmesh.ops.recalc_face_normals(bm, faces=bm.faces[:])
+    return _new_ob(f"building_{size:g}", bm)
+
+
+def make_terrain(size, segments=64, seed=1):
+    """Noisy terrain, size wide, closed below."""
+    random.seed(seed)
+    bm = bmesh.new()
+    bmesh.ops.create_grid(bm, x_segments=segments, y_segments=segments, size=size / 2.0)
+    for v in bm.verts:
+        x, y = v.co.x / size, v.co.y / size
+        noise = random.uniform(-0.01, 0.01)
+        v.co.z = size * (0.1 * sin(7.0 * x) * cos(5.0 * y) + noise) + size * 0.2
+    # Extrude the terrain down to z=0, to close the volume
+    geom = bmesh.ops.extrude_face_region(bm, geom=bm.faces[:])
+    bottom = [e for e in geom["geom"] if isinstance(e, bmesh.types.BMVert)]
+    for v in bottom:
+        v.co.z = 0.0
+    bmesh.ops.recalc_face_normals(bm, faces=bm.faces[:])
+    return _new_ob(f"terrain_{size:g}", bm)
+
+
+def make_plate(size):
+    """Thin plate normal to z, size wide."""
+    bm = bmesh.new()
+    bmesh.ops.create_grid(bm, x_segments=16, y_segments=16, size=size / 2.0)
+    rot = Matrix.Rotation(0.3, 3, "Z")
+    bmesh.ops.rotate(bm, cent=(0.0, 0.0, 0.0), matrix=rot, verts=bm.verts[:])
+    return _new_ob(f"plate_{size:g}", bm)
+
+
+def make_text(size):
+    """Extruded text, size high."""
+    cu = bpy.data.curves.new(f"text_{size:g}", "FONT")
+    cu.body = "BlenderFDS"
+    cu.size = size
+    cu.extrude = size / 10.0
+    ob = bpy.data.objects.new(f"text_{size:g}", cu)
+    bpy.context.collection.objects.link(ob)
+    bpy.context.view_layer.objects.active = ob
+    ob.select_set(True)
+    bpy.ops.object.convert(target="MESH")
+    return bpy.context.view_layer.objects.active
+
+
+# Cases: name, geometry maker, sizes, relative voxel sizes, function
+
+CASES = (
+    ("sphere", make_sphere, (1.0, 4.0), (0.05, 0.02), "voxels"),
+    ("sphere", make_sphere, (1.0,), (None,), "trisurface"),
+    ("building", make_building, (10.0, 40.0), (0.05, 0.02), "voxels"),
+    ("building", make_building, (10.0,), (None,), "trisurface"),
+    ("terrain", make_terrain, (50.0, 200.0), (0.02, 0.01), "voxels"),
+    ("plate", make_plate, (5.0, 20.0), (0.02, 0.005), "pixels"),
+    ("text", make_text, (2.0,), (0.02, 0.01), "voxels"),
+)
+
+
+def get_cases(quick=False):
+    """Get benchmark cases: key, maker, size, voxel size, and function."""
+    for name, maker, sizes, rel_voxel_sizes, fn in CASES:
+        for size in sizes[:1] if quick else sizes:
+            for rel in rel_voxel_sizes[:1] if quick else rel_voxel_sizes:
+                voxel_size = rel and size * rel
+                key = f"{name}_{size:g}_{fn}" + (
+                    voxel_size and f"_{voxel_size:g}" or ""
+                )
+                yield key, maker, size, voxel_size, fn
+
+
+# Run
+
+
+def _clear_scene():
+    for ob in tuple(bpy.data.objects):
+        bpy.data.objects.remove(ob, do_unlink=True)
+    for me in tuple(bpy.data.meshes):
+        bpy.data.meshes.remove(me)
+    for cu in tuple(bpy.data.curves):
+        bpy.data.curves.remove(cu)
+
+
+def _run_fn(context, ob, fn) -> "count":
+    """Run the benchmarked function on ob, and get its result count."""
+    from blenderfds28x.geometry import calc_voxels, calc_trisurfaces
+
+    if fn == "voxels":
+        xbs, _, _ = calc_voxels.get_voxels(context, ob, 1.0)
+        return len(xbs)
+    elif fn == "pixels":
+        xbs, _ = calc_voxels.get_pixels(context, ob, 1.0)
+        return len(xbs)
+    _, _, tris = calc_trisurfaces.get_trisurface(context, ob, 1.0, check=True)
+    return len(tris)
+
+
+def run_case(context, maker, size, voxel_size, fn, repeat):
+    """Run a benchmark case, return its results."""
+    _clear_scene()
+    ob = maker(size)
+    ob.select_set(True)
+    ob.bf_xb_custom_voxel = True
+    ob.bf_xb_voxel_size = voxel_size or 0.1
+    faces = len(ob.data.polygons)
+    times, count = list(), 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        count = _run_fn(context, ob, fn)
+        times.append(time.perf_counter() - t0)
+    # Peak memory in a separate untimed run, as tracing slows numpy down
+    tracemalloc.start()
+    try:
+        _run_fn(context, ob, fn)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "faces": faces,
+        "count": count,
+        "time": min(times),
+        "peak_mem": peak,
+    }
+
+
+def run(args) -> "results":
+    """Run all benchmark cases."""
+    context = bpy.context
+    sc = context.scene
+    sc.bf_config_voxelizer = args.voxelizer
+    sc.bf_config_voxel_merge = args.merge
+    results = {
+        "blender": bpy.app.version_string,
+        "blenderfds": ".".join(str(v) for v in sys.modules[PKG].bl_info["version"]),
+        "voxelizer": args.voxelizer,
+        "merge": args.merge,
+        "cases": dict(),
+    }
+    for key, maker, size, voxel_size, fn in get_cases(args.quick):
+        if args.filter and args.filter not in key:
+            continue
+        print(f"BFDS: benchmark: {key}")
+        try:
+            result = run_case(context, maker, size, voxel_size, fn, args.repeat)
+        except Exception as err:
+            result = {"error": str(err)}
+        results["cases"][key] = result
+        print(f"BFDS: benchmark: {key}: {result}")
+    return results
+
+
+def compare(results, baseline, threshold, min_dt=0.05) -> "slowdowns":
+    """Compare results with baseline, print a report and return slowdowns."""
+    slowdowns = list()
+    print(f"\n{'case':<40} {'base s':>9} {'now s':>9} {'ratio':>7} {'xbs':>9}")
+    for key, r in results["cases"].items():
+        b = baseline["cases"].get(key)
+        if not b or "time" not in b or "time" not in r:
+            print(f"{key:<40} {'-':>9} {r.get('time', 0.0):9.3f}")
+            continue
+        ratio = r["time"] / max(b["time"], 1e-9)
+        slow = ratio > threshold and r["time"] - b["time"] > min_dt
+        flag = " SLOWER" if slow else ""
+        print(
+            f"{key:<40} {b['time']:9.3f} {r['time']:9.3f} {ratio:7.2f} {r['count']:9d}{flag}"
+        )
+        if slow:
+            slowdowns.append(key)
+    return slowdowns
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog="blender -b --python bench/benchmark.py --",
+        description="BlenderFDS voxelization benchmark suite",
+    )
+    parser.add_argument("--out", help="save results to JSON file")
+    parser.add_argument("--compare", help="compare results to JSON baseline file")
+    parser.add_argument(
+        "--threshold", type=float, default=1.2, help="slowdown ratio flagged"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs for each case")
+    parser.add_argument("--quick", action="store_true", help="smallest cases only")
+    parser.add_argument("--filter", help="run the cases containing this string")
+    parser.add_argument("--voxelizer", default="NATIVE", choices=("NATIVE", "REMESH"))
+    parser.add_argument(
+        "--merge", default="GREEDY", choices=("AXIS", "GREEDY", "SLABS")
+    )
+    args = parser.parse_args(argv)
+    addon_utils.enable(PKG, default_set=True)
+    results = run(args)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"BFDS: benchmark: results saved to <{args.out}>")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        slowdowns = compare(results, baseline, args.threshold)
+        if slowdowns:
+            print(f"BFDS: benchmark: {len(slowdowns)} slower cases")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else list()
+    main(argv)
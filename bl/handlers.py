@@ -1,9 +1,10 @@
 import bpy
 from bpy.app.handlers import persistent, load_post, save_pre, depsgraph_update_post
-from bpy.types import Object
+from bpy.types import Object, Material, Scene
 
 from .. import geometry
 from .. import config
+from .. import lang
 
 # Handlers
 
@@ -32,20 +33,20 @@ def _save_pre(self):  # Beware: self is None
 
 
 @persistent
-# def _depsgraph_update_post(scene):
-#     # Detect object change and erase cached geometry
-#     for update in bpy.context.view_layer.depsgraph.updates:
-#         ob = update.id.original
-#         if (
-#             isinstance(ob, Object)
-#             and ob.type in {"MESH", "CURVE", "SURFACE", "FONT", "META"}
-#             and (update.is_updated_geometry or update.is_updated_transform)
-#         ):
-#             ob["ob_to_geom_cache"] = False
-#             ob["ob_to_xbs_cache"] = False
-#             ob["ob_to_xyzs_cache"] = False
-#             ob["ob_to_pbs_cache"] = False
-#             print("BFDS: _depsgraph_update_post updated:", ob.name)  # FIXME
+def _depsgraph_update_post(scene, depsgraph=None):
+    """Detect element changes and drop their cached geometry and namelist text."""
+    depsgraph = depsgraph or bpy.context.view_layer.depsgraph  # not re-evaluated
+    for update in depsgraph.updates:
+        ob = update.id.original
+        if isinstance(ob, (Object, Material, Scene)):
+            lang.invalidate_texts(ob)
+        if (
+            isinstance(ob, Object)
+            and ob.type in {"MESH", "CURVE", "SURFACE", "FONT", "META"}
+            and (update.is_updated_geometry or update.is_updated_transform)
+        ):
+            geometry.to_fds.invalidate_cache(ob)
+            geometry.calc_trisurfaces.invalidate_trees(ob)
 
 
 # Register
@@ -55,15 +56,11 @@ def register():
     print("BFDS: Registering handlers")
     load_post.append(_load_post)
     save_pre.append(_save_pre)
-
-
-#    depsgraph_update_post.append(_depsgraph_update_post)
+    depsgraph_update_post.append(_depsgraph_update_post)
 
 
 def unregister():
     print("BFDS: Unregistering handlers")
     load_post.remove(_load_post)
     save_pre.remove(_save_pre)
-
-
-#    depsgraph_update_post.remove(_depsgraph_update_post)
+    depsgraph_update_post.remove(_depsgraph_update_post)
@@ -22,8 +22,9 @@ from bpy.types import Operator
 from bpy.props import StringProperty, BoolProperty, FloatProperty
 from bpy_extras.io_utils import ImportHelper, ExportHelper
 
-from ..utils import is_writable, write_to_file
+from ..utils import stage_chunks_to_file
 from ..types import BFException
+from .. import geometry, lang, profiling
 
 # Collections
 
@@ -81,69 +82,119 @@ class ExportFDS(Operator, ExportHelper):
         return context.scene is not None
 
     def execute(self, context):
-        # Init
         w = context.window_manager.windows[0]
         w.cursor_modal_set("WAIT")
-        sc = context.scene
-        # Prepare FDS filepath
-        print(f"BFDS: Exporting Blender Scene <{sc.name}> to FDS file...")
-        filepath = self.filepath
-        if not filepath.lower().endswith(".fds"):
-            filepath += ".fds"
-        filepath = bpy.path.abspath(filepath)
-        # Check FDS filepath writable
-        if not is_writable(filepath):
-            w.cursor_modal_restore()
-            self.report({"ERROR"}, "FDS file not writable, cannot export")
-            return {"CANCELLED"}
-        # Prepare FDS file
         try:
-            fds_file = sc.to_fds(context=context, full=True)
+            msg = export_fds(context, self.filepath)
         except BFException as err:
             w.cursor_modal_restore()
             self.report({"ERROR"}, str(err))
             return {"CANCELLED"}
-        # Add namelist index # TODO develop
-        # Write FDS file
-        if not write_to_file(filepath, fds_file):
-            w.cursor_modal_restore()
-            self.report({"ERROR"}, "FDS file not writable, cannot export")
-            return {"CANCELLED"}
-        print(f"BFDS: FDS file written.")
-        # GE1 description file requested?
-        if sc.bf_dump_render_file:
-            print(
-                f"BFDS: Warning: Exporting Blender Scene <{sc.name}> to GE1 file not implemented!"
-            )  # FIXME
-            # # Prepare GE1 filepath
-            # print(f"BFDS: Exporting Blender Scene <{sc.name}> to GE1 file...")
-            # filepath = filepath[:-4] + ".ge1"
-            # if not is_writable(filepath):
-            #     w.cursor_modal_restore()
-            #     self.report({"ERROR"}, "GE1 file not writable, cannot export")
-            #     return {"CANCELLED"}
-            # # Prepare GE1 file
-            # try:
-            #     ge1_file = sc.to_ge1(context=context)
-            # except BFException as err:
-            #     w.cursor_modal_restore()
-            #     self.report({"ERROR"}, str(err))
-            #     return {"CANCELLED"}
-            # # Write GE1 file
-            # if not write_to_file(filepath, ge1_file):
-            #     w.cursor_modal_restore()
-            #     self.report({"ERROR"}, "GE1 file not writable, cannot export")
-            #     return {"CANCELLED"}
-            # print(f"BFDS: GE1 file written.")
-        # End
         w.cursor_modal_restore()
-        self.report({"INFO"}, "FDS case exported")
+        self.report({"INFO"}, f"FDS case exported ({msg})")
         return {"FINISHED"}
 
     def draw(self, context):
         pass
 
 
+def export_fds(context, filepath) -> "msg":
+    """Export the context Scene to an FDS case file, and get the report msg."""
+    sc = context.scene
+    # Prepare FDS filepath
+    print(f"BFDS: Exporting Blender Scene <{sc.name}> to FDS file...")
+    if not filepath.lower().endswith(".fds"):
+        filepath += ".fds"
+    filepath = bpy.path.abspath(filepath)
+    # Prepare and write FDS file, streamed to a tmp file replacing filepath
+    geometry.calc_trisurfaces.reset_quality_stats()
+    lang.reset_text_stats()
+    geometry.to_fds.export_dir = os.path.dirname(filepath)  # GEOM binary files
+    geometry.utils.set_fingerprint_memo(True)
+    if sc.bf_config_export_profile != "NONE":
+        profiling.start(memory=sc.bf_config_export_profile_memory)
+    try:
+        with profiling.stage("export", sc.name):
+            tmp_filepath = stage_chunks_to_file(
+                filepath, sc.iter_fds(context=context, full=True)
+            )
+        replaced = geometry.to_fds.end_bingeoms(filepath, tmp_filepath)
+    finally:
+        geometry.to_fds.end_bingeoms()  # on errors
+        geometry.to_fds.export_dir = None
+        geometry.utils.set_fingerprint_memo(False)
+        records = profiling.stop()
+    # Add namelist index # TODO develop
+    if not tmp_filepath:
+        raise BFException(sc, "FDS file not writable, cannot export")
+    if not replaced:
+        raise BFException(sc, "FDS case files not replaceable, cannot export")
+    print(f"BFDS: FDS file written.")
+    # GE1 description file requested?
+    if sc.bf_dump_render_file:
+        print(
+            f"BFDS: Warning: Exporting Blender Scene <{sc.name}> to GE1 file not implemented!"
+        )  # FIXME
+        # # Prepare GE1 filepath
+        # print(f"BFDS: Exporting Blender Scene <{sc.name}> to GE1 file...")
+        # filepath = filepath[:-4] + ".ge1"
+        # if not is_writable(filepath):
+        #     w.cursor_modal_restore()
+        #     self.report({"ERROR"}, "GE1 file not writable, cannot export")
+        #     return {"CANCELLED"}
+        # # Prepare GE1 file
+        # try:
+        #     ge1_file = sc.to_ge1(context=context)
+        # except BFException as err:
+        #     w.cursor_modal_restore()
+        #     self.report({"ERROR"}, str(err))
+        #     return {"CANCELLED"}
+        # # Write GE1 file
+        # if not write_to_file(filepath, ge1_file):
+        #     w.cursor_modal_restore()
+        #     self.report({"ERROR"}, "GE1 file not writable, cannot export")
+        #     return {"CANCELLED"}
+        # print(f"BFDS: GE1 file written.")
+    # End
+    msgs = [
+        geometry.calc_trisurfaces.get_quality_stats_msg(),
+        lang.get_text_stats_msg(),
+    ]
+    if records:  # export profile requested
+        stages = [r for r in records if r["stage"] != "export"]
+        msgs.append(profiling.get_summary_msg(stages))
+        if not _write_profile(sc, filepath, records):
+            msgs.append("profile file not writable")
+    msg = ", ".join(msgs)
+    print(f"BFDS: {msg}")
+    return msg
+
+
+def _write_profile(sc, filepath, records) -> "bool":
+    """Print the summary of the export profile, and write its file if requested."""
+    print("BFDS: Export profile:")
+    for line in profiling.get_summary(
+        records, sort_by=sc.bf_config_export_profile_sort, n=20
+    ):
+        print(f"BFDS:   {line}")
+    kind = sc.bf_config_export_profile
+    if kind == "REPORT":
+        return True
+    profile_filepath = f"{filepath[:-4]}_profile.{kind.lower()}"
+    write = kind == "JSON" and profiling.write_json or profiling.write_csv
+    if not write(profile_filepath, records):
+        return False
+    print(f"BFDS: Export profile written to <{profile_filepath}>.")
+    return True
+
+
+def get_fds_filepath(sc, directory=None) -> "filepath":
+    """Get the default FDS filepath of Scene, in directory or its case directory."""
+    directory = directory or sc.bf_head_directory or os.path.dirname(bpy.data.filepath)
+    basename = "{0}.fds".format(bpy.path.clean_name(sc.name))
+    return os.path.join(bpy.path.abspath(directory), basename)
+
+
 def menu_func_export_FDS(self, context):
     # Prepare default filepath
     filepath = "{0}.fds".format(os.path.splitext(bpy.data.filepath)[0])
@@ -93,6 +93,36 @@ class OBJECT_OT_bf_check_intersections(Operator):
             w.cursor_modal_restore()
 
 
+@subscribe
+class SCENE_OT_bf_check_scene_intersections(Operator):
+    bl_label = "Check Scene Intersections"
+    bl_idname = "scene.bf_geom_check_scene_intersections"
+    bl_description = "Check intersections between all exported GEOM objects"
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene
+
+    def execute(self, context):
+        w = context.window_manager.windows[0]
+        w.cursor_modal_set("WAIT")
+        obs = [
+            ob
+            for ob in context.scene.objects
+            if ob.bf_namelist_cls == "ON_GEOM" and ob.bf_export and not ob.bf_is_tmp
+        ]
+        try:
+            geometry.calc_trisurfaces.check_scene_intersections(context, obs)
+        except BFException as err:
+            self.report({"ERROR"}, str(err))
+            return {"CANCELLED"}
+        else:
+            self.report({"INFO"}, "No intersection")
+            return {"FINISHED"}
+        finally:
+            w.cursor_modal_restore()
+
+
 @subscribe
 class SCENE_OT_bf_check_quality(Operator):
     bl_label = "Check Quality"
@@ -124,6 +154,63 @@ class SCENE_OT_bf_check_quality(Operator):
 # GEOM remesh
 
 
+@subscribe
+class OBJECT_OT_bf_decimate(Operator):
+    bl_idname = "object.bf_decimate"
+    bl_label = "Decimate Mesh"
+    bl_description = "Reduce the number of faces by quadric error edge collapses, preserving SURF boundaries"
+    bl_options = {"REGISTER", "UNDO"}
+
+    face_num: bpy.props.IntProperty(
+        name="Number of Faces",
+        description="Desired number of faces",
+        min=4,
+        default=1000,
+    )
+    max_error: bpy.props.FloatProperty(
+        name="Max Error",
+        description="Max geometric error, relative to the finest overlapping MESH cell size, 0 for no limit",
+        min=0.0,
+        default=0.5,
+        step=10.0,
+        precision=2,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return context.object and context.object.type == "MESH"
+
+    def execute(self, context):
+        w = context.window_manager.windows[0]
+        w.cursor_modal_set("WAIT")
+        try:
+            bpy.ops.object.mode_set(mode="OBJECT")
+            ob = context.object
+            co, ivs, mis = geometry.utils.get_mesh_tris(ob.data)
+            max_error = None
+            if self.max_error:  # 0 for no limit, as the export decimation
+                max_error = geometry.calc_trisurfaces.get_local_lod_max_error(
+                    context, ob, co, ivs, self.max_error
+                )
+            epsilon_len, epsilon_area = geometry.calc_trisurfaces.get_local_epsilons(
+                context, ob
+            )
+            co, ivs, mis = geometry.calc_decimation.decimate(
+                co,
+                ivs,
+                mis,
+                target_faces=self.face_num,
+                max_error=max_error,
+                epsilon_len=epsilon_len,
+                epsilon_area=epsilon_area,
+            )
+            geometry.utils.set_mesh_tris(ob.data, co, ivs, mis)
+        finally:
+            w.cursor_modal_restore()
+        self.report({"INFO"}, f"Decimated to {len(ivs)} faces")
+        return {"FINISHED"}
+
+
 class _external_tool:
     bl_options = {"REGISTER", "UNDO"}
 
@@ -227,6 +227,7 @@ class BF_GEOM_Toolbar:
         ob = context.active_object
         flow.prop(ob, "bf_geom_protect")
         flow.operator("object.bf_geom_check_intersections")
+        flow.operator("scene.bf_geom_check_scene_intersections")
         flow.operator("object.bf_geom_check_quality")
 
 
@@ -264,6 +265,7 @@ class BF_Remesh_Toolbar:
         flow.label(text=f"Verts: {len(me.vertices)} | Faces: {len(me.polygons)}")
         flow.menu("VIEW3D_MT_edit_mesh_clean")
         flow.operator("mesh.quads_convert_to_tris")
+        flow.operator("object.bf_decimate")
         flow.separator()
         flow.operator("object.manifold")
         flow.operator("object.quadriflow")
@@ -45,6 +45,16 @@ class BFPreferences(AddonPreferences):
         default="INFO",
     )
 
+    bf_pref_workers: IntProperty(
+        name="Worker Processes",
+        description=(
+            "Max number of worker processes forked from Blender for heavy computations\n"
+            "(1 to run serially, 0 for all cores; always serial on macOS and Windows)"
+        ),
+        min=0,
+        default=1,
+    )
+
     bf_quadriflow_filepath: StringProperty(
         name="Quadriflow",
         description="Quadriflow executable filepath (see: github.com/hjwdzh)",
@@ -74,6 +84,9 @@ class BFPreferences(AddonPreferences):
         box.prop(paths, "use_relative_paths")
         box.prop(self, "bf_loglevel")
         box = layout.box()
+        box.label(text="Performance")
+        box.prop(self, "bf_pref_workers")
+        box = layout.box()
         box.label(text="External Tools filepaths")
         box.prop(self, "bf_manifold_filepath")
         box.prop(self, "bf_quadriflow_filepath")
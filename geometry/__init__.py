@@ -1 +1 @@
-from . import to_fds, from_fds, to_ge1, utils
+from . import to_fds, from_fds, to_ge1, utils, calc_decimation
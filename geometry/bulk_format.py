@@ -0,0 +1,146 @@
+"""BlenderFDS, vectorized formatting of rows of numbers."""
+
+import re, string
+import numpy as np
+
+# Bulk formatting
+# Rows of numbers are formatted in a single vectorized pass, with the same
+# result of template.format(row, name, i, separator) for each row i.
+# The template fields are parsed once: fixed point numbers, like {0[1]:.6f}
+# or {0:+.3f}, integers, like {0[2]} or the row index {2}, and strings.
+# Each field is written as a fixed width block of ASCII codes, padded with
+# zeros, then the padding is removed from the whole buffer at once.
+# Numbers that could be rounded differently, as close to a rounding tie,
+# and unsupported templates are formatted by str.format.
+
+MIN_ROWS = 32  # fewer rows are formatted by str.format
+_CHUNK_ROWS = 1 << 16
+_EOL = "\x01"
+_templates = dict()
+
+
+def format_rows(template, rows, name="", separator="", indexes=None) -> "lines":
+    """Format rows of numbers with template, as template.format(row, name, i, separator)."""
+    rows = np.asarray(rows)
+    if indexes is None:
+        indexes = np.arange(len(rows))
+    pieces = _parse_template(template)
+    literals = str(name) + str(separator) + template
+    if len(rows) < MIN_ROWS or pieces is None or _EOL in literals:
+        return list(
+            template.format(row, name, i, separator)
+            for row, i in zip(rows.tolist(), np.asarray(indexes).tolist())
+        )
+    lines = list()
+    for i0 in range(0, len(rows), _CHUNK_ROWS):
+        i1 = i0 + _CHUNK_ROWS
+        lines.extend(
+            _format_chunk(
+                template, pieces, rows[i0:i1], name, separator, indexes[i0:i1]
+            )
+        )
+    return lines
+
+
+def format_pbs(templates, pbs, name="", separator="") -> "lines":
+    """Format pbs with the template of their axis, as format_rows."""
+    pbs = np.array(pbs, dtype=np.float64).reshape(-1, 2)
+    lines = [None] * len(pbs)
+    for axis, template in enumerate(templates):
+        indexes = np.flatnonzero(pbs[:, 0] == axis)
+        axis_lines = format_rows(template, pbs[indexes, 1], name, separator, indexes)
+        for i, line in zip(indexes.tolist(), axis_lines):
+            lines[i] = line
+    return lines
+
+
+def _parse_template(template) -> "pieces":
+    """Parse template into literal strings and (arg, key, decimals, plus) fields."""
+    if template in _templates:
+        return _templates[template]
+    pieces = list()
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        if literal:
+            pieces.append(literal)
+        if field is None:
+            continue
+        m = re.fullmatch(r"([0-3])(?:\[(\d+)\])?", field)
+        f = re.fullmatch(r"(\+?)\.([1-9])f", spec) if spec else None
+        if not m or conversion or (spec and not f):
+            pieces = None  # unsupported
+            break
+        arg, key = int(m.group(1)), m.group(2) and int(m.group(2))
+        if arg in (1, 3) and (spec or key is not None):
+            pieces = None
+            break
+        decimals, plus = f and int(f.group(2)), bool(f and f.group(1))
+        pieces.append((arg, key, decimals, plus))
+    _templates[template] = pieces
+    return pieces
+
+
+def _format_chunk(template, pieces, rows, name, separator, indexes) -> "lines":
+    """Format a chunk of rows with parsed template pieces."""
+    n = len(rows)
+    blocks, bad = list(), np.zeros(n, dtype=bool)
+    for piece in pieces:
+        if isinstance(piece, str):
+            blocks.append(_get_literal_block(piece, n))
+            continue
+        arg, key, decimals, plus = piece
+        if arg in (1, 3):
+            blocks.append(_get_literal_block(str((name, separator)[arg == 3]), n))
+            continue
+        values = indexes if arg == 2 else (rows if key is None else rows[:, key])
+        if decimals is None:
+            if not np.issubdtype(values.dtype, np.integer):
+                bad[:] = True  # eg. floats in default format
+                break
+            block, bad_values = _get_int_block(values)
+        else:
+            block, bad_values = _get_fixed_block(values, decimals, plus)
+        blocks.append(block)
+        bad |= bad_values
+    blocks.append(_get_literal_block(_EOL, n))
+    buffer = np.concatenate(blocks, axis=1).ravel()
+    lines = buffer[buffer != 0].tobytes().decode().split(_EOL)[:-1]
+    # Format uncertain rows with str.format
+    for i in np.flatnonzero(bad).tolist():
+        lines[i] = template.format(rows[i].tolist(), name, int(indexes[i]), separator)
+    return lines
+
+
+def _get_literal_block(literal, n) -> "block":
+    """Get the (n, w) ASCII codes block of a literal string."""
+    codes = np.frombuffer(literal.encode(), dtype=np.uint8)
+    return np.broadcast_to(codes, (n, len(codes)))
+
+
+def _get_int_block(values, min_width=1) -> "block, bad":
+    """Get the (n, w) ASCII codes block of non negative integers, zero padded."""
+    values = values.astype(np.int64)
+    bad = values < 0
+    values = np.where(bad, 0, values)
+    width = max(len(str(values.max(initial=0))), min_width)
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    block = (values[:, None] // powers % 10 + ord("0")).astype(np.uint8)
+    block[:, : width - min_width][values[:, None] < powers[: width - min_width]] = 0
+    return block, bad
+
+
+def _get_fixed_block(values, decimals, plus) -> "block, bad":
+    """Get the (n, w) ASCII codes block of fixed point numbers, zero padded."""
+    values = values.astype(np.float64)
+    with np.errstate(over="ignore", invalid="ignore"):
+        scaled = np.abs(values) * 10 ** decimals
+        frac = scaled - np.floor(scaled)
+        bad = ~(scaled < 2.0 ** 52) | (np.abs(frac - 0.5) <= np.spacing(scaled))
+    ns = np.where(bad, 0.0, np.rint(scaled)).astype(np.int64)
+    digits, _ = _get_int_block(ns, min_width=decimals + 1)
+    sign = np.where(np.signbit(values), ord("-"), plus and ord("+") or 0)
+    block = np.empty((len(values), digits.shape[1] + 2), dtype=np.uint8)
+    block[:, 0] = sign
+    block[:, 1 : -decimals - 1] = digits[:, :-decimals]
+    block[:, -decimals - 1] = ord(".")
+    block[:, -decimals:] = digits[:, -decimals:]
+    return block, bad
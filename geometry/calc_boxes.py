@@ -0,0 +1,412 @@
+"""BlenderFDS, voxel boxes from triangulated surfaces, with no access to bpy."""
+
+import numpy as np
+from math import ceil
+
+DEBUG = False
+
+# Triangles are given in grid coordinates, where each voxel is a unit cube:
+# voxel (ix, iy, iz) spans [ix, ix+1) x [iy, iy+1) x [iz, iz+1).
+# Rays are cast along z through the voxel column centers (ix+.5, iy+.5).
+# The ray crossings of each column are sorted and paired (ray parity):
+# 0|==solid==1| void 2|==solid==3| void ...
+# and the voxels whose centers are inside a solid become a box.
+# Boxes are (N,6) int32 arrays of (ix0, ix1, iy0, iy1, iz0, iz1).
+
+
+# Large objects are voxelized in chunks of the grid, to bound memory
+# and to use all cores: each chunk spans CHUNK_SIZE voxel columns along
+# x and y, and is sliced in blocks of CHUNK_SIZE voxels along z for merging.
+
+CHUNK_SIZE = 128
+
+
+def get_chunk_jobs(tris, merge, shape=None) -> "jobs":
+    """Get the jobs of the chunks of the grid, from tris in grid coo."""
+    return list(
+        (tris[selected], bounds, merge)
+        for bounds, selected in _get_chunks(tris, CHUNK_SIZE, shape)
+    )
+
+
+def join_chunk_boxes(jobs, results) -> "boxes, voxel_count":
+    """Join the merged boxes of the chunk jobs."""
+    if not results:
+        return np.empty((0, 6), dtype=np.int32), 0
+    boxes = np.concatenate(tuple(r[0] for r in results))
+    voxel_count = sum(r[1] for r in results)
+    # Stitch boxes back across chunk and z block seams
+    nz = jobs[0][1][5] - jobs[0][1][4]
+    if (len(jobs) > 1 or nz > CHUNK_SIZE) and len(boxes):
+        boxes = stitch_boxes(boxes)
+    return boxes, voxel_count
+
+
+def _get_chunks(tris, chunk_size, shape=None) -> "bounds, selected":
+    """Get voxel aligned chunks of the grid and their overlapping tris in grid coo."""
+    co_min, co_max = tris.min(axis=1), tris.max(axis=1)
+    nx, ny, nz = shape or (max(ceil(n), 1) for n in co_max.max(axis=0))
+    for cx0 in range(0, nx, chunk_size):
+        cx1 = min(cx0 + chunk_size, nx)
+        for cy0 in range(0, ny, chunk_size):
+            cy1 = min(cy0 + chunk_size, ny)
+            # Tris with bounding box overlapping chunk column centers
+            selected = (
+                (co_max[:, 0] >= cx0 + 0.5)
+                & (co_min[:, 0] <= cx1 - 0.5)
+                & (co_max[:, 1] >= cy0 + 0.5)
+                & (co_min[:, 1] <= cy1 - 0.5)
+            )
+            if np.any(selected):
+                yield (cx0, cx1, cy0, cy1, 0, nz), selected
+
+
+def get_chunk_boxes(job) -> "boxes, voxel_count":
+    """Get merged boxes of a chunk, from its tris in grid coo."""
+    tris, bounds, merge = job
+    cx0, cx1, cy0, cy1, cz0, cz1 = bounds
+    ixs, iys, zs = get_tris_crossings(tris, bounds=(cx0, cx1, cy0, cy1))
+    columns = get_boxes_from_crossings(ixs, iys, zs)
+    # Grow along x, then along y
+    grows = ((grow_boxes_along_x, 2), (grow_boxes_along_y, 0))
+    results, voxel_count = list(), 0
+    for bz0 in range(cz0, cz1, CHUNK_SIZE):
+        bz1 = min(bz0 + CHUNK_SIZE, cz1)
+        # Clip columns to block
+        boxes = columns.copy()
+        boxes[:, 4] = np.maximum(boxes[:, 4], bz0)
+        boxes[:, 5] = np.minimum(boxes[:, 5], bz1)
+        boxes = boxes[boxes[:, 4] < boxes[:, 5]]
+        if len(boxes):
+            voxel_count += get_boxes_volume(boxes)  # only inside the grid
+            results.append(get_merged_boxes(boxes, merge, grows))
+    if not results:
+        return np.empty((0, 6), dtype=np.int32), 0
+    return np.concatenate(results), voxel_count
+
+
+def stitch_boxes(boxes) -> "boxes":
+    """Join adjacent boxes with identical cross section, along each axis."""
+    for axis in (0, 1, 2):
+        boxes = grow_boxes_along_axis(boxes, axis)
+    return boxes
+
+
+# Ray crossings
+
+
+def get_tris_crossings(tris, bounds=None, batch_size=1 << 20) -> "ixs, iys, zs":
+    """Get crossings of z rays through voxel column centers with tris in grid coo."""
+    # Projected double area, vertical tris are never crossed
+    a, b, c = tris[:, 0], tris[:, 1], tris[:, 2]
+    area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (
+        c[:, 0] - a[:, 0]
+    )
+    tris = tris[area != 0.0]
+    if not len(tris):  # eg. vertical plane
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64)
+    # Set counter-clockwise order in projection
+    cw = area[area != 0.0] < 0.0
+    tris[cw, 1], tris[cw, 2] = tris[cw, 2], tris[cw, 1]
+    # Range of column centers covered by each tri bounding box
+    i0 = np.ceil(tris[:, :, 0].min(axis=1) - 0.5).astype(np.int64)
+    i1 = np.floor(tris[:, :, 0].max(axis=1) - 0.5).astype(np.int64) + 1
+    j0 = np.ceil(tris[:, :, 1].min(axis=1) - 0.5).astype(np.int64)
+    j1 = np.floor(tris[:, :, 1].max(axis=1) - 0.5).astype(np.int64) + 1
+    if bounds:  # limit to the columns in bounds (ix0, ix1, iy0, iy1)
+        i0, i1 = np.maximum(i0, bounds[0]), np.minimum(i1, bounds[1])
+        j0, j1 = np.maximum(j0, bounds[2]), np.minimum(j1, bounds[3])
+    ni, nj = np.maximum(i1 - i0, 0), np.maximum(j1 - j0, 0)
+    counts = ni * nj
+    # Split tris in batches of candidate columns to bound memory
+    ixs, iys, zs = list(), list(), list()
+    cumcounts = np.cumsum(counts)
+    start = 0
+    while start < len(tris):
+        base = cumcounts[start - 1] if start else 0
+        stop = max(np.searchsorted(cumcounts, base + batch_size, "right"), start + 1)
+        sl = slice(start, stop)
+        ix, iy, z = _get_batch_crossings(tris[sl], i0[sl], j0[sl], nj[sl], counts[sl])
+        ixs.append(ix)
+        iys.append(iy)
+        zs.append(z)
+        start = stop
+    return np.concatenate(ixs), np.concatenate(iys), np.concatenate(zs)
+
+
+def _get_batch_crossings(tris, i0, j0, nj, counts) -> "ixs, iys, zs":
+    """Get crossings of z rays with a batch of counter-clockwise tris."""
+    # Candidate columns, one for each tri and covered column center
+    it = np.repeat(np.arange(len(tris)), counts)
+    k = np.arange(len(it)) - np.repeat(np.cumsum(counts) - counts, counts)
+    ix, iy = i0[it] + k // nj[it], j0[it] + k % nj[it]
+    px, py = ix + 0.5, iy + 0.5
+    # Edge functions (w0 is opposite to vertex a, ...) and point in tri test,
+    # the top-left rule counts points on edges shared by two tris only once
+    t = tris[it]
+    ws, inside = list(), np.ones(len(it), dtype=bool)
+    for iu, iv in ((1, 2), (2, 0), (0, 1)):
+        w = _get_edge_function(t[:, iu], t[:, iv], px, py)
+        dx, dy = t[:, iv, 0] - t[:, iu, 0], t[:, iv, 1] - t[:, iu, 1]
+        top_left = (dy < 0.0) | ((dy == 0.0) & (dx < 0.0))
+        inside &= (w > 0.0) | ((w == 0.0) & top_left)
+        ws.append(w)
+    w0, w1, w2 = ws[0][inside], ws[1][inside], ws[2][inside]
+    t = t[inside]
+    z = (w0 * t[:, 0, 2] + w1 * t[:, 1, 2] + w2 * t[:, 2, 2]) / (w0 + w1 + w2)
+    return ix[inside], iy[inside], z
+
+
+def _get_edge_function(u, v, px, py) -> "w":
+    """Get edge function of points p relative to edges u->v, exactly antisymmetric."""
+    # Evaluate with a canonical vertex order, so that the two tris
+    # sharing an edge get exactly opposite values
+    swap = (u[:, 0] > v[:, 0]) | ((u[:, 0] == v[:, 0]) & (u[:, 1] > v[:, 1]))
+    cu = np.where(swap[:, None], v, u)
+    cv = np.where(swap[:, None], u, v)
+    w = (cv[:, 0] - cu[:, 0]) * (py - cu[:, 1]) - (cv[:, 1] - cu[:, 1]) * (
+        px - cu[:, 0]
+    )
+    return np.where(swap, -w, w)
+
+
+class OddCrossingsError(Exception):
+    """Odd number of crossings in a voxel column, from non manifold or open geometry."""
+
+
+def get_boxes_from_crossings(ixs, iys, zs) -> "boxes":
+    """Get boxes by pairing the sorted crossings of each voxel column."""
+    # boxes = [[ix0, ix1, iy0, iy1, iz0, iz1], ...]
+    if not len(zs):
+        return np.empty((0, 6), dtype=np.int32)
+    order = np.lexsort((zs, iys, ixs))  # sort in +z direction, by column
+    ixs, iys, zs = ixs[order], iys[order], zs[order]
+    # Each column should have an even number of crossings
+    new_col = np.empty(len(zs), dtype=bool)
+    new_col[0] = True
+    new_col[1:] = (ixs[1:] != ixs[:-1]) | (iys[1:] != iys[:-1])
+    col_starts = np.flatnonzero(new_col)
+    if np.any(np.diff(np.append(col_starts, len(zs))) % 2):
+        raise OddCrossingsError("BFDS: odd number of crossings")
+    # Pair crossings and get voxels with center inside
+    ix, iy = ixs[0::2], iys[0::2]
+    iz0 = np.ceil(zs[0::2] - 0.5).astype(np.int64)
+    iz1 = np.ceil(zs[1::2] - 0.5).astype(np.int64)
+    solid = iz0 < iz1
+    ix, iy, iz0, iz1 = ix[solid], iy[solid], iz0[solid], iz1[solid]
+    boxes = np.column_stack((ix, ix + 1, iy, iy + 1, iz0, iz1))
+    return boxes.astype(np.int32)
+
+
+# The following functions reduce the number of boxes in xbs format,
+# used to describe the geometry, by merging them
+
+
+def grow_boxes_along_x(boxes, sort_by):
+    """Grow boxes by merging neighbours along x axis."""
+    DEBUG and print("BFDS: grow_boxes_along_x")
+    return grow_boxes_along_axis(boxes, 0, sort_by)
+
+
+def grow_boxes_along_y(boxes, sort_by):
+    """Grow boxes by merging neighbours along y axis."""
+    DEBUG and print("BFDS: grow_boxes_along_y")
+    return grow_boxes_along_axis(boxes, 1, sort_by)
+
+
+def grow_boxes_along_z(boxes, sort_by):
+    """Grow boxes by merging neighbours along z axis."""
+    DEBUG and print("BFDS: grow_boxes_along_z")
+    return grow_boxes_along_axis(boxes, 2, sort_by)
+
+
+def grow_boxes_along_axis(boxes, axis, sort_by=None) -> "boxes":
+    """Grow boxes by merging neighbours with the same cross section along axis."""
+    if not len(boxes):
+        return boxes
+    a0, a1 = 2 * axis, 2 * axis + 1
+    # Sort boxes by cross section, sort_by first, then along axis
+    others = [i for i in range(6) if i not in (a0, a1, sort_by)]
+    if sort_by is not None:
+        others.append(sort_by)
+    order = np.lexsort((boxes[:, a0],) + tuple(boxes[:, i] for i in others))
+    boxes = boxes[order]
+    # A box starts a new run, unless it touches the previous one
+    new_run = np.ones(len(boxes), dtype=bool)
+    new_run[1:] = np.any(boxes[1:, others] != boxes[:-1, others], axis=1) | (
+        boxes[1:, a0] != boxes[:-1, a1]
+    )
+    starts = np.flatnonzero(new_run)
+    stops = np.append(starts[1:], len(boxes)) - 1
+    grown = boxes[starts]
+    grown[:, a1] = boxes[stops, a1]
+    return grown
+
+
+# The following functions merge boxes on a dense occupancy grid of the
+# integer voxel coordinates, obtaining far less boxes than the two
+# greedy merging passes along axis:
+# - GREEDY: each box is grown from the first free voxel as much
+#   as possible along z, then y, then x (maximal 3D greedy growth)
+# - SLABS: each z slab is decomposed in rectangles, choosing the larger
+#   of two growing directions from each seed, then identical rectangles
+#   of adjacent slabs are stacked
+
+
+def get_boxes_volume(boxes) -> "voxel_count":
+    """Get total number of voxels in boxes."""
+    b = np.asarray(boxes, dtype=np.int64).reshape(-1, 6)
+    return int(np.sum((b[:, 1] - b[:, 0]) * (b[:, 3] - b[:, 2]) * (b[:, 5] - b[:, 4])))
+
+
+def get_merged_boxes(boxes, merge, grows) -> "boxes":
+    """Merge boxes according to merge strategy, grows are used by AXIS."""
+    if merge == "AXIS":  # join boxes along other axis
+        for grow_boxes, sort_by in grows:
+            boxes = grow_boxes(boxes, sort_by)
+        return boxes
+    return merge_boxes(boxes, merge)
+
+
+def merge_boxes(boxes, merge) -> "boxes":
+    """Merge boxes according to merge strategy."""
+    DEBUG and print("BFDS: merge_boxes:", merge)
+    grid, offset = get_occupancy(boxes)
+    return get_occupancy_boxes(grid, merge) + np.repeat(offset, 2).astype(np.int32)
+
+
+def get_occupancy_boxes(grid, merge) -> "boxes":
+    """Get boxes from occupancy grid according to merge strategy."""
+    if merge == "SLABS":
+        return _get_slabs_boxes(grid)
+    elif merge == "AXIS":
+        boxes = _get_column_boxes(grid)
+        boxes = grow_boxes_along_x(boxes, 2)
+        return grow_boxes_along_y(boxes, 0)
+    return _get_greedy_boxes(grid)
+
+
+def get_block_boxes(job) -> "boxes, voxel_count":
+    """Get merged boxes of the union of overlapping boxes in a block."""
+    boxes, merge = job
+    grid, offset = get_occupancy(boxes)
+    boxes = get_occupancy_boxes(grid, merge) + np.repeat(offset, 2).astype(np.int32)
+    return boxes, int(np.count_nonzero(grid))
+
+
+def _get_column_boxes(grid) -> "boxes":
+    """Get boxes from the runs of voxels along z of occupancy grid."""
+    nx, ny, nz = grid.shape
+    padded = np.zeros((nx, ny, nz + 2), dtype=np.int8)
+    padded[:, :, 1:-1] = grid
+    d = np.diff(padded, axis=2)
+    ix, iy, iz0 = np.nonzero(d == 1)  # in C order, so starts
+    _, _, iz1 = np.nonzero(d == -1)  # and stops are paired
+    return np.column_stack((ix, ix + 1, iy, iy + 1, iz0, iz1)).astype(np.int32)
+
+
+def get_occupancy(boxes) -> "grid, offset":
+    """Get dense boolean occupancy grid of boxes, and its integer offset."""
+    b = np.asarray(boxes, dtype=np.int64).reshape(-1, 6)
+    offset = b[:, 0::2].min(axis=0)
+    b = b - np.repeat(offset, 2)
+    shape = tuple(b[:, 1::2].max(axis=0))
+    # Scatter box corners into a difference array, then integrate along axis
+    diff = np.zeros(tuple(n + 1 for n in shape), dtype=np.int32)
+    for cx, sx in ((0, 1), (1, -1)):
+        for cy, sy in ((2, 1), (3, -1)):
+            for cz, sz in ((4, 1), (5, -1)):
+                np.add.at(diff, (b[:, cx], b[:, cy], b[:, cz]), sx * sy * sz)
+    count = diff.cumsum(axis=0).cumsum(axis=1).cumsum(axis=2)
+    return count[:-1, :-1, :-1] > 0, offset
+
+
+def _iter_free_voxels(grid, window=4096) -> "flat index":
+    """Iterate on the flat indexes of the True voxels, while grid is consumed."""
+    flat = grid.reshape(-1)  # a view
+    start, size = 0, flat.size
+    while start < size:
+        stop = min(start + window, size)
+        i = np.argmax(flat[start:stop])
+        if flat[start + i]:
+            yield start + i
+            start += i + 1
+        else:
+            start = stop
+
+
+def _get_greedy_boxes(grid) -> "boxes":
+    """Get boxes by maximal 3D greedy growth on occupancy grid."""
+    grid = grid.copy()  # consumed
+    nx, ny, nz = grid.shape
+    boxes = list()
+    for f in _iter_free_voxels(grid):
+        if not grid.flat[f]:
+            continue  # already consumed by a box
+        ix0, iy0, iz0 = np.unravel_index(f, grid.shape)
+        # Grow along z
+        col = grid[ix0, iy0, iz0:]
+        iz1 = iz0 + (np.argmin(col) if not col.all() else len(col))
+        # Grow along y
+        iy1 = iy0 + 1
+        while iy1 < ny and grid[ix0, iy1, iz0:iz1].all():
+            iy1 += 1
+        # Grow along x
+        ix1 = ix0 + 1
+        while ix1 < nx and grid[ix1, iy0:iy1, iz0:iz1].all():
+            ix1 += 1
+        grid[ix0:ix1, iy0:iy1, iz0:iz1] = False
+        boxes.append((ix0, ix1, iy0, iy1, iz0, iz1))
+    return np.array(boxes, dtype=np.int32).reshape(-1, 6)
+
+
+def _get_slab_rects(slab) -> "rects":
+    """Get rectangles decomposing a 2D occupancy slab."""
+    slab = slab.copy()  # consumed
+    nx, ny = slab.shape
+    rects = list()
+    for f in _iter_free_voxels(slab):
+        if not slab.flat[f]:
+            continue  # already consumed by a rectangle
+        ix0, iy0 = np.unravel_index(f, slab.shape)
+        # Grow along y, then x
+        row = slab[ix0, iy0:]
+        iy1 = iy0 + (np.argmin(row) if not row.all() else len(row))
+        ix1 = ix0 + 1
+        while ix1 < nx and slab[ix1, iy0:iy1].all():
+            ix1 += 1
+        # Grow along x, then y, and keep the larger
+        col = slab[ix0:, iy0]
+        jx1 = ix0 + (np.argmin(col) if not col.all() else len(col))
+        jy1 = iy0 + 1
+        while jy1 < ny and slab[ix0:jx1, jy1].all():
+            jy1 += 1
+        if (jx1 - ix0) * (jy1 - iy0) > (ix1 - ix0) * (iy1 - iy0):
+            ix1, iy1 = jx1, jy1
+        slab[ix0:ix1, iy0:iy1] = False
+        rects.append((ix0, ix1, iy0, iy1))
+    return rects
+
+
+def _get_slabs_boxes(grid) -> "boxes":
+    """Get boxes by rectangle decomposition of z slabs, stacked along z."""
+    rects = list()
+    for iz in range(grid.shape[2]):
+        rects.extend((*rect, iz) for rect in _get_slab_rects(grid[:, :, iz]))
+    rects = np.array(rects, dtype=np.int64).reshape(-1, 5)
+    # Stack identical rectangles of adjacent slabs
+    order = np.lexsort(
+        (rects[:, 4], rects[:, 3], rects[:, 2], rects[:, 1], rects[:, 0])
+    )
+    rects = rects[order]
+    new_box = np.ones(len(rects), dtype=bool)
+    new_box[1:] = np.any(rects[1:, :4] != rects[:-1, :4], axis=1) | (
+        rects[1:, 4] != rects[:-1, 4] + 1
+    )
+    starts = np.flatnonzero(new_box)
+    stops = np.append(starts[1:], len(rects)) - 1
+    boxes = np.empty((len(starts), 6), dtype=np.int32)
+    boxes[:, :4] = rects[starts, :4]
+    boxes[:, 4] = rects[starts, 4]
+    boxes[:, 5] = rects[stops, 4] + 1
+    return boxes
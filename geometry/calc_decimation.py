@@ -0,0 +1,233 @@
+"""BlenderFDS, quadric error mesh decimation."""
+
+import heapq
+import numpy as np
+
+# Triangulated surfaces are decimated by edge collapses, ordered by the
+# quadric error metric (Garland and Heckbert, 1997): the error of moving a
+# vertex to x is the sum of its squared distances to the planes of the
+# original faces around it.
+# Planes are not area weighted, so sqrt(error) bounds the geometric error.
+# Open, non manifold, and material (SURF) boundaries add heavily weighted
+# planes perpendicular to their faces, and collapses that would change the
+# topology, pinch a boundary, or flip a face are rejected, as are collapses
+# making edges or faces not longer or larger than the quality epsilons.
+# Boundary corners, where boundaries turn or join, are pinned: they are never
+# moved, so the boundary outlines are kept.
+
+BOUNDARY_WEIGHT = 1e3
+CORNER_COS = 0.9999  # min cosine between straight boundary edges
+
+
+def decimate(
+    co, tris, mis, target_faces=0, max_error=None, epsilon_len=0.0, epsilon_area=0.0
+) -> "co, tris, mis":
+    """Decimate a triangulated surface down to target_faces, within max_error."""
+    co = np.array(co, dtype=np.float64)
+    tris = np.array(tris, dtype=np.int64).reshape(-1, 3)
+    mis = np.array(mis, dtype=np.int64)
+    qs, bound_edges = _get_quadrics(co, tris, mis)
+    bound_adj = [set() for _ in range(len(co))]  # neighbours along boundaries
+    for i, j in bound_edges.tolist():
+        bound_adj[i].add(j)
+        bound_adj[j].add(i)
+    is_bound = np.array([bool(adj) for adj in bound_adj], dtype=bool)
+    is_pinned = _get_corners(co, bound_adj)
+    # Topology, as lists and sets for fast local updates
+    faces = tris.tolist()
+    vfaces = [set() for _ in range(len(co))]
+    for f, face in enumerate(faces):
+        for i in face:
+            vfaces[i].add(f)
+    alive = np.ones(len(faces), dtype=bool)
+    versions = np.zeros(len(co), dtype=np.int64)
+    # Heap of candidate collapses
+    edges = np.sort(tris[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    edges = np.unique(edges, axis=0)
+    heap = list()
+    _push_collapses(heap, qs, co, edges, versions, is_pinned)
+    max_cost = np.inf if max_error is None else max_error ** 2
+    nfaces = len(faces)
+    while heap and nfaces > target_faces:
+        cost, u, v, ver_u, ver_v, x = heapq.heappop(heap)
+        if versions[u] != ver_u or versions[v] != ver_v:
+            continue  # outdated
+        if cost > max_cost:
+            break
+        x = np.array(x)
+        if not _can_collapse(
+            co, faces, vfaces, is_bound, bound_adj, u, v, x, epsilon_len, epsilon_area
+        ):
+            continue
+        # Collapse v into u
+        for f in vfaces[v]:
+            face = faces[f]
+            if u in face:  # shared by u and v, removed
+                alive[f] = False
+                nfaces -= 1
+                for i in face:
+                    if i != v:
+                        vfaces[i].discard(f)
+            else:
+                face[face.index(v)] = u
+                vfaces[u].add(f)
+        vfaces[v] = set()
+        for w in bound_adj[v]:
+            bound_adj[w].discard(v)
+            if w != u:
+                bound_adj[w].add(u)
+                bound_adj[u].add(w)
+        bound_adj[v] = set()
+        co[u] = x
+        qs[u] += qs[v]
+        is_bound[u] |= is_bound[v]
+        is_pinned[u] |= is_pinned[v]
+        versions[u] += 1
+        versions[v] += 1
+        # Update candidate collapses around u
+        ws = sorted(_get_neighbours(faces, vfaces, u))
+        if ws:
+            edges = np.array([(min(u, w), max(u, w)) for w in ws], dtype=np.int64)
+            _push_collapses(heap, qs, co, edges, versions, is_pinned)
+    # Compact
+    tris = np.array(faces, dtype=np.int64)[alive]
+    used = np.unique(tris)
+    remap = np.zeros(len(co), dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    return co[used], remap[tris], mis[alive]
+
+
+def _get_quadrics(co, tris, mis) -> "qs, bound_edges":
+    """Get the (N,4,4) vertex quadrics, and the (N,2) boundary edges."""
+    qs = np.zeros((len(co), 4, 4))
+    a, b, c = co[tris[:, 0]], co[tris[:, 1]], co[tris[:, 2]]
+    normals = np.cross(b - a, c - a)
+    lengths = np.linalg.norm(normals, axis=1)
+    valid = lengths > 0.0
+    normals[valid] /= lengths[valid, None]
+    # Face planes
+    planes = np.concatenate((normals, -np.einsum("ij,ij->i", normals, a)[:, None]), 1)
+    ks = planes[:, :, None] * planes[:, None, :]
+    for i in range(3):
+        np.add.at(qs, tris[:, i], ks)
+    # Boundary edges, with one face, more than two faces, or two SURFs
+    hes = np.stack((tris, np.roll(tris, -1, axis=1)), axis=2).reshape(-1, 2)
+    keys = np.sort(hes, axis=1)
+    _, inverse, counts = np.unique(
+        keys, axis=0, return_inverse=True, return_counts=True
+    )
+    inverse = inverse.ravel()
+    he_mis = np.repeat(mis, 3)
+    mis_min = np.full(len(counts), np.iinfo(np.int64).max)
+    mis_max = np.full(len(counts), np.iinfo(np.int64).min)
+    np.minimum.at(mis_min, inverse, he_mis)
+    np.maximum.at(mis_max, inverse, he_mis)
+    is_bound = ((counts != 2) | (mis_min != mis_max))[inverse]
+    # Boundary planes, through the edge and perpendicular to its face
+    he_faces = np.repeat(np.arange(len(tris)), 3)[is_bound]
+    bhes = hes[is_bound]
+    p0, p1 = co[bhes[:, 0]], co[bhes[:, 1]]
+    bnormals = np.cross(p1 - p0, normals[he_faces])
+    lengths = np.linalg.norm(bnormals, axis=1)
+    valid = lengths > 0.0
+    bnormals[valid] /= lengths[valid, None]
+    bplanes = np.concatenate(
+        (bnormals, -np.einsum("ij,ij->i", bnormals, p0)[:, None]), 1
+    )
+    ks = BOUNDARY_WEIGHT * bplanes[:, :, None] * bplanes[:, None, :]
+    np.add.at(qs, bhes[:, 0], ks)
+    np.add.at(qs, bhes[:, 1], ks)
+    return qs, keys[is_bound]
+
+
+def _get_corners(co, bound_adj) -> "is_corner":
+    """Get the boundary vertices where boundaries turn or join."""
+    is_corner = np.zeros(len(co), dtype=bool)
+    for i, adj in enumerate(bound_adj):
+        if not adj:
+            continue
+        if len(adj) != 2:
+            is_corner[i] = True
+            continue
+        a, b = co[list(adj)] - co[i]
+        norms = np.linalg.norm(a) * np.linalg.norm(b)
+        is_corner[i] = not norms or -np.dot(a, b) < CORNER_COS * norms
+    return is_corner
+
+
+def _push_collapses(heap, qs, co, edges, versions, is_pinned):
+    """Push the best collapses of (N,2) edges into heap, keeping pinned vertices."""
+    us, vs = edges[:, 0], edges[:, 1]
+    costs, xs = _get_collapses(
+        qs[us] + qs[vs], co[us], co[vs], is_pinned[us], is_pinned[vs]
+    )
+    for cost, u, v, x in zip(costs.tolist(), us.tolist(), vs.tolist(), xs.tolist()):
+        if cost < np.inf:  # not between pinned vertices
+            heapq.heappush(heap, (cost, u, v, int(versions[u]), int(versions[v]), x))
+
+
+def _get_collapses(qs, cu, cv, pu, pv) -> "costs, xs":
+    """Get the min costs of collapsing edges, and the new vertex positions."""
+    a, b, c = qs[:, :3, :3], qs[:, :3, 3], qs[:, 3, 3]
+    mid = (cu + cv) / 2.0
+    # Optimal position, when solvable and near the edge
+    xopt = mid.copy()
+    solvable = np.abs(np.linalg.det(a)) > 1e-10
+    if solvable.any():
+        xopt[solvable] = np.linalg.solve(a[solvable], -b[solvable, :, None])[:, :, 0]
+    far = np.linalg.norm(xopt - mid, axis=1) > np.linalg.norm(cv - cu, axis=1)
+    xopt[far] = mid[far]
+    # Choose the best of the candidate positions
+    xs = np.stack((xopt, cu, cv, mid), axis=1)
+    costs = (
+        np.einsum("eki,eij,ekj->ek", xs, a, xs)
+        + 2.0 * np.einsum("eki,ei->ek", xs, b)
+        + c[:, None]
+    )
+    costs[pu | pv, 0] = np.inf  # pinned u or v, keep it in place
+    costs[pu, 2:] = np.inf
+    costs[pv, 1] = np.inf
+    costs[pv, 3] = np.inf
+    best = costs.argmin(axis=1)
+    i = np.arange(len(xs))
+    return np.maximum(costs[i, best], 0.0), xs[i, best]
+
+
+def _get_neighbours(faces, vfaces, u) -> "ws":
+    """Get the vertices sharing a face with u."""
+    return {w for f in vfaces[u] for w in faces[f]} - {u}
+
+
+def _can_collapse(
+    co, faces, vfaces, is_bound, bound_adj, u, v, x, epsilon_len=0.0, epsilon_area=0.0
+) -> "bool":
+    """Check that collapsing v into u at x keeps topology, boundaries, orientation and quality."""
+    # Do not pinch boundaries
+    if is_bound[u] and is_bound[v] and v not in bound_adj[u]:
+        return False
+    # Link condition, the common neighbours are the opposite vertices
+    shared = vfaces[u] & vfaces[v]
+    opposite = {w for f in shared for w in faces[f]} - {u, v}
+    common = _get_neighbours(faces, vfaces, u) & _get_neighbours(faces, vfaces, v)
+    if common != opposite:
+        return False
+    # Do not collapse closed tetrahedra and smaller, boundary edges down to a face
+    is_bound_edge = v in bound_adj[u]
+    if len(vfaces[u] | vfaces[v]) - len(shared) < (1 if is_bound_edge else 3):
+        return False
+    # Do not flip or degenerate the moved faces
+    moved = [faces[f] for f in (vfaces[u] | vfaces[v]) - shared]
+    tris = np.array(moved, dtype=np.int64)
+    old = co[tris]
+    new = old.copy()
+    new[(tris == u) | (tris == v)] = x
+    n_old = np.cross(old[:, 1] - old[:, 0], old[:, 2] - old[:, 0])
+    n_new = np.cross(new[:, 1] - new[:, 0], new[:, 2] - new[:, 0])
+    dots = np.einsum("ij,ij->i", n_old, n_new)
+    norms = np.linalg.norm(n_old, axis=1) * np.linalg.norm(n_new, axis=1)
+    if not (np.all(dots > 1e-3 * norms) and np.all(norms > 0.0)):
+        return False
+    # Keep the moved edges and faces above the quality epsilons
+    lengths = np.linalg.norm(new - new[:, (1, 2, 0)], axis=2)
+    areas = 0.5 * np.linalg.norm(n_new, axis=1)
+    return bool(np.all(lengths > epsilon_len) and np.all(areas > epsilon_area))
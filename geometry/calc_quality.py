@@ -0,0 +1,174 @@
+"""BlenderFDS, vectorized quality checks of triangulated surfaces."""
+
+import numpy as np
+
+# Triangulated surfaces are given as arrays of vertex coordinates, and of
+# edge and triangle vertex indexes, so they are checked with no access to
+# bpy. Reports list the failing element indexes for each quality criterion.
+
+
+def get_quality_report(co, edges, tris, epsilon_len, epsilon_area) -> "report":
+    """Get the quality report of a triangulated surface from its arrays."""
+    nv = len(co)
+    # Directed half-edges of the triangles, and their undirected edge
+    hes = np.stack((tris, np.roll(tris, -1, axis=1)), axis=2).reshape(-1, 2)
+    he_keys = hes.min(axis=1) * nv + hes.max(axis=1)
+    edge_keys = edges.min(axis=1) * nv + edges.max(axis=1)
+    order = np.argsort(edge_keys)
+    he_edges = order[np.searchsorted(edge_keys, he_keys, sorter=order)]
+    # Edge-face incidence counts, manifold edges join exactly two faces
+    counts = np.bincount(he_edges, minlength=len(edges))
+    manifold_edges = np.flatnonzero(counts != 2)
+    # Orientation, the two half-edges of a manifold edge run in opposite directions
+    he_order = np.argsort(he_edges, kind="stable")
+    he_pairs = he_order[np.repeat(counts == 2, counts)].reshape(-1, 2)
+    he0, he1 = hes[he_pairs[:, 0]], hes[he_pairs[:, 1]]
+    flipped = he0[:, 0] == he1[:, 0]
+    normals = he_edges[he_pairs[flipped, 0]]
+    # Manifold vertices, with at least two edges, no wire edges,
+    # no edges shared by more than two faces, and a single fan of faces
+    vert_counts = np.bincount(edges.ravel(), minlength=nv)
+    bad_edge_verts = np.zeros(nv, dtype=bool)
+    bad_edge_verts[edges[(counts == 0) | (counts > 2)].ravel()] = True
+    fans = _get_fan_counts(nv, tris, he_pairs, flipped)
+    manifold_verts = np.flatnonzero((vert_counts < 2) | bad_edge_verts | (fans != 1))
+    # Degenerate edges and faces
+    degenerate_edges = np.flatnonzero(get_edge_lengths(co, edges) <= epsilon_len)
+    degenerate_faces = np.flatnonzero(get_tri_areas(co, tris) <= epsilon_area)
+    # Loose and duplicate vertices
+    loose_verts = np.flatnonzero(vert_counts == 0)
+    duplicate_verts = get_duplicate_verts(co, epsilon_len)
+    return {
+        "manifold_verts": manifold_verts,
+        "manifold_edges": manifold_edges,
+        "degenerate_edges": degenerate_edges,
+        "degenerate_faces": degenerate_faces,
+        "loose_verts": loose_verts,
+        "duplicate_verts": duplicate_verts,
+        "normals": np.sort(normals),
+    }
+
+
+def get_edge_lengths(co, edges) -> "lengths":
+    """Get the lengths of edges."""
+    return np.linalg.norm(co[edges[:, 1]] - co[edges[:, 0]], axis=1)
+
+
+def get_tri_areas(co, tris) -> "areas":
+    """Get the areas of triangles."""
+    v0, v1, v2 = co[tris[:, 0]], co[tris[:, 1]], co[tris[:, 2]]
+    return 0.5 * np.linalg.norm(np.cross(v1 - v0, v2 - v0), axis=1)
+
+
+def _get_fan_counts(nv, tris, he_pairs, flipped) -> "fans":
+    """Get the number of face fans around each vertex, by label propagation."""
+    corner_verts = tris.ravel()
+    # Corners of the same vertex across each manifold edge share the fan
+    # the half-edge i runs from corner i to the next corner of its triangle
+    h0, h1 = he_pairs[:, 0], he_pairs[:, 1]
+    h0_next = h0 - h0 % 3 + (h0 + 1) % 3
+    h1_next = h1 - h1 % 3 + (h1 + 1) % 3
+    links = np.concatenate(
+        (
+            np.where(flipped, np.stack((h0, h1)), np.stack((h0, h1_next))),
+            np.where(flipped, np.stack((h0_next, h1_next)), np.stack((h0_next, h1))),
+        ),
+        axis=1,
+    )
+    labels = get_connected_labels(len(corner_verts), links)
+    # Count distinct labels for each vertex
+    fans = np.unique(np.stack((corner_verts, labels), axis=1), axis=0)[:, 0]
+    return np.bincount(fans, minlength=nv)
+
+
+def get_partial_quality_report(
+    co, edges, tris, moved, report, epsilon_len, epsilon_area
+) -> "report":
+    """Update the quality report of a surface with unchanged topology, near moved vertices."""
+    report = dict(report)  # manifold, loose, and normals criteria are topological
+    is_moved = np.zeros(len(co), dtype=bool)
+    is_moved[moved] = True
+    # Degenerate edges and faces, adjacent to the moved vertices
+    dirty = np.flatnonzero(is_moved[edges].any(axis=1))
+    is_bad = get_edge_lengths(co, edges[dirty]) <= epsilon_len
+    report["degenerate_edges"] = np.union1d(
+        np.setdiff1d(report["degenerate_edges"], dirty), dirty[is_bad]
+    )
+    dirty = np.flatnonzero(is_moved[tris].any(axis=1))
+    is_bad = get_tri_areas(co, tris[dirty]) <= epsilon_area
+    report["degenerate_faces"] = np.union1d(
+        np.setdiff1d(report["degenerate_faces"], dirty), dirty[is_bad]
+    )
+    # Duplicate vertices, moved vertices can get close to any other vertex
+    report["duplicate_verts"] = get_duplicate_verts(co, epsilon_len)
+    return report
+
+
+def get_connected_labels(n, links) -> "labels":
+    """Label n nodes joined by (2,N) links with the min node index of their component."""
+    labels = np.arange(n)
+    while True:
+        lmin = np.minimum(labels[links[0]], labels[links[1]])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, links[0], lmin)
+        np.minimum.at(new_labels, links[1], lmin)
+        new_labels = new_labels[new_labels]  # pointer jumping
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+
+def get_duplicate_verts(co, epsilon_len) -> "duplicate_verts":
+    """Get the vertices closer than epsilon_len to another vertex."""
+    labels = get_vert_clusters(co, epsilon_len)
+    sizes = np.bincount(labels, minlength=len(co))
+    return np.flatnonzero(sizes[labels] > 1)
+
+
+def get_vert_clusters(co, epsilon_len) -> "labels":
+    """Label each vertex with the min vertex index of its duplicate cluster."""
+    return get_connected_labels(len(co), get_close_vert_pairs(co, epsilon_len))
+
+
+# Half of the neighbour cells, so each cell pair is visited once
+_HALF_NEIGHBOURS = tuple(
+    (di, dj, dk)
+    for di in (-1, 0, 1)
+    for dj in (-1, 0, 1)
+    for dk in (-1, 0, 1)
+    if (di, dj, dk) >= (0, 0, 0)
+)
+
+
+def get_close_vert_pairs(co, epsilon_len) -> "pairs":
+    """Get the (2,N) pairs of vertices closer than epsilon_len, by spatial hashing."""
+    if len(co) < 2:
+        return np.empty((2, 0), dtype=np.int64)
+    # Hash vertices to grid cells, cell size is bounded to keep int64 cell keys
+    lo = co.min(axis=0)
+    cell_size = max(epsilon_len, float(np.ptp(co, axis=0).max()) / 2**20, 1e-12)
+    ijk = np.floor((co - lo) / cell_size).astype(np.int64) + 1  # padded by one cell
+    dims = ijk.max(axis=0) + 2
+    keys = (ijk[:, 0] * dims[1] + ijk[:, 1]) * dims[2] + ijk[:, 2]
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    cells, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+    # Candidate pairs from each vertex to the vertices of its neighbour cells
+    pairs = list()
+    for di, dj, dk in _HALF_NEIGHBOURS:
+        offset = (di * dims[1] + dj) * dims[2] + dk
+        nkeys = keys + offset
+        pos = np.minimum(np.searchsorted(cells, nkeys), len(cells) - 1)
+        a = np.flatnonzero(cells[pos] == nkeys)
+        b0, n = starts[pos[a]], counts[pos[a]]
+        firsts = np.repeat(np.cumsum(n) - n, n)
+        b = np.repeat(b0, n) + np.arange(firsts.size) - firsts
+        a = np.repeat(a, n)
+        if offset == 0:  # same cell
+            keep = a < b
+            a, b = a[keep], b[keep]
+        pairs.append(np.stack((a, b)))
+    pairs = np.concatenate(pairs, axis=1)
+    # Keep the close pairs, in original vertex indexes
+    dists = np.linalg.norm(co[order[pairs[0]]] - co[order[pairs[1]]], axis=1)
+    return order[pairs[:, dists <= epsilon_len]]
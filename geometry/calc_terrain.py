@@ -0,0 +1,105 @@
+"""BlenderFDS, algorithms for terrain heightfields, with no access to bpy."""
+
+import numpy as np
+
+from .calc_boxes import get_tris_crossings
+
+# Terrains are exported as heightfields, z values on a regular grid of
+# (nx, ny) points covering the object bounding box, listed by row from y0
+# to y1, each row from x0 to x1.
+# Grid-like meshes are read directly from their vertices, other meshes are
+# sampled at the requested cell size by batches of triangles.
+
+BATCH_SIZE = 1 << 18  # max tris sampled at once, to bound memory
+
+
+class TerrainError(Exception):
+    """Terrain surface not exportable as a heightfield."""
+
+
+def get_heightfield(
+    co, ivs, cell_size, epsilon_len, check=True
+) -> "ijk, xb, zvals, is_grid":
+    """Get terrain heightfield from the top surface of tris, sampled at cell_size if needed."""
+    if not len(ivs):
+        raise TerrainError("Empty object!")
+    grid = _get_vertex_grid(co, ivs)
+    if grid:
+        (x0, x1, y0, y1), (nx, ny), zvals = grid
+    else:
+        (x0, x1, y0, y1), (nx, ny), zvals = _sample_heightfield(
+            co, ivs, cell_size, epsilon_len, check
+        )
+    xb = (x0, x1, y0, y1, float(zvals.min()), float(zvals.max()))
+    return (nx, ny), xb, zvals, bool(grid)
+
+
+def _get_vertex_grid(co, ivs) -> "(x0, x1, y0, y1), (nx, ny), zvals or None":
+    """Get the heightfield from vertices lying on a regular xy grid, if so."""
+    size = max(np.ptp(co[:, 0]), np.ptp(co[:, 1]))
+    tol = size * 1e-6 or 1e-9
+    xs, ys = _get_lattice(co[:, 0], tol), _get_lattice(co[:, 1], tol)
+    if xs is None or ys is None:
+        return
+    (x0, x1, nx), (y0, y1, ny) = xs, ys  # python ints
+    if nx * ny != len(co) or len(ivs) != 2 * (nx - 1) * (ny - 1):
+        return
+    ix = np.rint((co[:, 0] - x0) / (x1 - x0) * (nx - 1)).astype(np.int64)
+    iy = np.rint((co[:, 1] - y0) / (y1 - y0) * (ny - 1)).astype(np.int64)
+    keys = iy * nx + ix
+    if len(np.unique(keys)) != len(co):  # each grid point once
+        return
+    zvals = np.empty(nx * ny)
+    zvals[keys] = co[:, 2]
+    return (x0, x1, y0, y1), (nx, ny), zvals
+
+
+def _get_lattice(values, tol) -> "v0, v1, n or None":
+    """Get the range and count of values lying on a regular lattice, if so."""
+    bins = np.unique(np.rint((values - values.min()) / tol))
+    if len(bins) < 2:
+        return
+    steps = np.diff(bins)
+    if np.abs(steps - steps.mean()).max() > 1.0:  # one bin of rounding
+        return
+    return float(values.min()), float(values.max()), len(bins)
+
+
+def _sample_heightfield(
+    co, ivs, cell_size, epsilon_len, check
+) -> "(x0, x1, y0, y1), (nx, ny), zvals":
+    """Sample the heightfield of tris top surface on a regular xy grid."""
+    lo, hi = co[:, :2].min(axis=0), co[:, :2].max(axis=0)
+    if (hi - lo <= epsilon_len).any():
+        raise TerrainError("Terrain has no horizontal extent!")
+    nx, ny = np.ceil((hi - lo) / cell_size - 1e-6).astype(np.int64) + 1
+    nx, ny = max(int(nx), 2), max(int(ny), 2)
+    # Grid points are the column centers of calc_boxes z rays,
+    # inset to sample the boundary of rectangular terrains
+    inset = (hi - lo) * 1e-6
+    step = (hi - lo - 2.0 * inset) / (nx - 1, ny - 1)
+    zmin = np.full(nx * ny, np.inf)
+    zmax = np.full(nx * ny, -np.inf)
+    for start in range(0, len(ivs), BATCH_SIZE):
+        tris = co[ivs[start : start + BATCH_SIZE]]
+        tris[:, :, :2] = (tris[:, :, :2] - lo - inset) / step + 0.5
+        ixs, iys, zs = get_tris_crossings(tris, bounds=(0, nx, 0, ny))
+        keys = iys * nx + ixs
+        np.minimum.at(zmin, keys, zs)
+        np.maximum.at(zmax, keys, zs)
+    # Check open surface quality
+    holes = np.flatnonzero(np.isinf(zmax))
+    overhangs = np.flatnonzero(zmax - zmin > epsilon_len)
+    if check and len(holes):
+        msg = f"Terrain does not cover its bounding box ({len(holes)} grid points)."
+        raise TerrainError(msg)
+    if check and len(overhangs):
+        msg = (
+            "Terrain is not a heightfield, "
+            f"overhangs detected ({len(overhangs)} grid points)."
+        )
+        raise TerrainError(msg)
+    if len(holes) == len(zmax):
+        raise TerrainError("No terrain surface!")
+    zmax[holes] = zmax[np.isfinite(zmax)].min()  # fill at the lowest level
+    return (float(lo[0]), float(hi[0]), float(lo[1]), float(hi[1])), (nx, ny), zmax
@@ -1,17 +1,20 @@
 """BlenderFDS, algorithms for triangulated surfaces."""
 
 import bpy, bmesh, mathutils
+import numpy as np
 from time import time
+from hashlib import blake2b
 from math import floor, ceil
 
 from ..types import BFException
-from . import utils
-
+from ..utils import LRUCache
+from .. import profiling
+from . import utils, calc_decimation, calc_quality
+from .calc_voxels import _get_overlapping_mesh_grids
 
 # Get triangulated surface
 
 # FIXME updates object after calculation
-# FIXME check mesh for quality
 
 
 def get_trisurface(
@@ -20,29 +23,130 @@ def get_trisurface(
     """Get triangulated surface from object in xbs format."""
     print("BFDS: calc_voxels.get_trisurface:", ob.name)
     mas = _get_materials(context, ob)
-    bm = _get_prepared_bmesh(context, ob)
-    # Check
+    job = get_trisurface_job(context, ob, check)
+    topology, report, status, co, tris, mis = calc_trisurface_job(job)
+    set_trisurface_verdict(job, topology, report, status)
     if check:
-        _check_bm_quality(context, ob, bm, protect=True)
-    # Extract verts and faces from bmesh
-    verts = [
-        (v.co.x * scale_length, v.co.y * scale_length, v.co.z * scale_length)
-        for v in bm.verts
-    ]
+        raise_quality_report(context, ob, report, protect=True)
+    verts = [tuple(v) for v in (co * scale_length).tolist()]
     faces = [
-        (
-            f.verts[0].index + 1,  # FDS index start from 1, not 0
-            f.verts[1].index + 1,
-            f.verts[2].index + 1,
-            f.material_index + 1,
-        )
-        for f in bm.faces
+        (i0 + 1, i1 + 1, i2 + 1, mi + 1)  # FDS index start from 1, not 0
+        for (i0, i1, i2), mi in zip(tris.tolist(), mis.tolist())
     ]
-    # Clean up
-    bm.free()
     return mas, verts, faces
 
 
+# Triangulated surface jobs
+# Arrays are extracted from bpy on the main thread, then checked and
+# decimated by calc_trisurface_job, that does not access bpy and can run
+# in a process pool. Verdicts are stored and failures raised on the main thread.
+
+
+def get_trisurface_job(context, ob, check=True) -> "job":
+    """Extract the triangulated surface arrays of Object and their settings."""
+    sc = context.scene
+    bm = _get_export_bmesh(context, ob)
+    try:
+        co, edges, tris = _get_bm_arrays(bm)
+        mis = np.array([f.material_index for f in bm.faces], dtype=np.int64)
+    finally:
+        bm.free()
+    lod = None
+    if ob.bf_geom_lod:
+        max_error = None  # 0 for no limit
+        if ob.bf_geom_lod_error:
+            max_error = ob.bf_geom_lod_error * get_lod_cell_size(context, co[tris])
+        lod = ob.bf_geom_lod_faces, max_error
+    return {
+        "name": ob.name,
+        "co": co,
+        "edges": edges,
+        "tris": tris,
+        "mis": mis,
+        "check": check,
+        "epsilon_len": sc.bf_config_min_edge_length,
+        "epsilon_area": sc.bf_config_min_face_area,
+        "verdict": check and _verdicts.get(ob.name) or None,
+        "lod": lod,
+    }
+
+
+def calc_trisurface_job(job) -> "topology, report, status, co, tris, mis":
+    """Check and decimate the extracted triangulated surface, with no access to bpy."""
+    co, tris, mis = job["co"], job["tris"], job["mis"]
+    topology, report, status = None, None, None
+    if job["check"]:
+        with profiling.stage("quality_check", job["name"]):
+            profiling.add_count(len(tris))
+            topology, report, status = _update_quality_report(
+                job["name"],
+                co,
+                job["edges"],
+                tris,
+                job["epsilon_len"],
+                job["epsilon_area"],
+                job["verdict"],
+            )
+        if any(len(bad) for bad in report.values()):
+            return topology, report, status, co, tris, mis
+    if job["lod"]:
+        t0 = time()
+        target_faces, max_error = job["lod"]
+        nfaces = len(tris)
+        with profiling.stage("decimation", job["name"]):
+            co, tris, mis = calc_decimation.decimate(
+                co,
+                tris,
+                mis,
+                target_faces=target_faces,
+                max_error=max_error,
+                epsilon_len=job["epsilon_len"],
+                epsilon_area=job["epsilon_area"],
+            )
+            profiling.add_count(len(tris))
+        print(
+            f"BFDS: calc_trisurfaces: <{job['name']}> decimated from {nfaces} to {len(tris)} faces, in {time() - t0:.3f} s"
+        )
+    return topology, report, status, co, tris, mis
+
+
+def set_trisurface_verdict(job, topology, report, status):
+    """Store the quality verdict of a checked job."""
+    if job["check"]:
+        _set_verdict(job["name"], job["co"], topology, report, status)
+
+
+def get_lod_cell_size(context, tris) -> "cell_size":
+    """Get the finest cell size of the MESHes overlapping tris, or the default one."""
+    grids = _get_overlapping_mesh_grids(context, tris)
+    cell_sizes = [cell_size.min() for _, cell_size, _ in grids]
+    return min(cell_sizes, default=context.scene.bf_default_voxel_size)
+
+
+def get_local_lod_max_error(context, ob, co, tris, lod_error) -> "max_error":
+    """Get the max error of local tris, relative to the finest overlapping MESH cell size."""
+    m = np.array(ob.matrix_world, dtype=np.float64)
+    world_co = co @ m[:3, :3].T + m[:3, 3]
+    scale = np.linalg.norm(m[:3, :3], axis=0).max() or 1.0  # conservative
+    return lod_error * get_lod_cell_size(context, world_co[tris]) / scale
+
+
+def get_local_epsilons(context, ob) -> "epsilon_len, epsilon_area":
+    """Get the quality epsilons of the Scene, in local coordinates."""
+    sc = context.scene
+    m = np.array(ob.matrix_world, dtype=np.float64)
+    scale = np.linalg.norm(m[:3, :3], axis=0).min() or 1.0  # conservative
+    return sc.bf_config_min_edge_length / scale, sc.bf_config_min_face_area / scale ** 2
+
+
+def _get_export_bmesh(context, ob):
+    """Prepare ob into a triangulated bmesh in world coordinates, welded if requested."""
+    bm = _get_prepared_bmesh(context, ob)
+    if ob.bf_geom_weld_verts:
+        _weld_bm_verts(context, ob, bm)
+    return bm
+
+
 def _get_prepared_bmesh(context, ob):
     """Prepare ob into a triangulated bmesh in world coordinates."""
     # Check object and init
@@ -60,6 +164,25 @@ def _get_prepared_bmesh(context, ob):
     return bm
 
 
+def _weld_bm_verts(context, ob, bm):
+    """Weld bmesh vertices closer than min edge length, and remap faces."""
+    epsilon_len = context.scene.bf_config_min_edge_length
+    co, _, _ = _get_bm_arrays(bm)
+    labels = calc_quality.get_vert_clusters(co, epsilon_len)
+    targetmap = {bm.verts[i]: bm.verts[j] for i, j in enumerate(labels) if i != j}
+    if not targetmap:
+        return
+    bmesh.ops.weld_verts(bm, targetmap=targetmap)
+    print(f"BFDS: calc_trisurfaces: {len(targetmap)} vertices welded in <{ob.name}>")
+    # Update bmesh index for reference
+    bm.verts.index_update()
+    bm.edges.index_update()
+    bm.faces.index_update()
+    bm.faces.ensure_lookup_table()
+    bm.verts.ensure_lookup_table()
+    bm.edges.ensure_lookup_table()
+
+
 def _get_materials(context, ob):
     """Get ob materials from slots."""
     mas = list()
@@ -84,112 +207,169 @@ def _get_materials(context, ob):
 def check_geom_quality(context, ob, protect):
     """Check that Object is a closed orientable manifold,
     with no degenerate geometry."""
-    bm = _get_prepared_bmesh(context, ob)
-    _check_bm_quality(context, ob, bm, protect)
+    report = get_geom_quality_report(context, ob)
+    raise_quality_report(context, ob, report, protect)
+
+
+def get_geom_quality_report(context, ob) -> "report":
+    """Get the quality report of Object, listing all failing elements."""
+    bm = _get_export_bmesh(context, ob)
+    try:
+        return _get_bm_quality_report(context, bm, ob)
+    finally:
+        bm.free()
+
+
+# Quality criteria, in check order: report key, element type, message
+
+QUALITY_CHECKS = (
+    ("manifold_verts", "VERT", "Non manifold vertices detected ({} vertices)."),
+    ("manifold_edges", "EDGE", "Non manifold or open geometry detected ({} edges)."),
+    ("degenerate_edges", "EDGE", "Too short edges detected ({} edges)."),
+    ("degenerate_faces", "FACE", "Too small area faces detected ({} faces)."),
+    ("loose_verts", "VERT", "Loose vertices detected ({} vertices)."),
+    ("duplicate_verts", "VERT", "Duplicate vertices detected ({} vertices)."),
+    ("normals", "EDGE", "Inconsistent face normals detected ({} edges)."),
+)
+
+
+def raise_quality_report(context, ob, report, protect=True):
+    """Raise the first failure of the quality report of Object.
+
+    If not protect, the bmesh is rebuilt and the bad elements are selected.
+    """
+    if not any(len(report[key]) for key, _, _ in QUALITY_CHECKS):
+        return
+    if protect:
+        for key, _, msg in QUALITY_CHECKS:
+            if len(report[key]):
+                raise BFException(ob, msg.format(len(report[key])))
+    bm = _get_export_bmesh(context, ob)  # same element indexes as the report
+    _raise_bm_quality_report(context, ob, bm, report, protect)
     bm.free()
 
 
-def _check_bm_quality(context, ob, bm, protect):
-    """Check that bmesh is a closed orientable manifold, with no degenerate geometry."""
+def _raise_bm_quality_report(context, ob, bm, report, protect):
+    """Raise the first failure of the quality report of bmesh."""
+    for key, select_type, msg in QUALITY_CHECKS:
+        bad = report[key]
+        if not len(bad):
+            continue
+        msg = msg.format(len(bad))
+        if select_type == "VERT":
+            bad_verts = [bm.verts[i] for i in bad]
+            _raise_bad_geometry(context, ob, bm, msg, protect, bad_verts=bad_verts)
+        elif select_type == "EDGE":
+            bad_edges = [bm.edges[i] for i in bad]
+            _raise_bad_geometry(context, ob, bm, msg, protect, bad_edges=bad_edges)
+        else:
+            bad_faces = [bm.faces[i] for i in bad]
+            _raise_bad_geometry(context, ob, bm, msg, protect, bad_faces=bad_faces)
+
+
+def _get_bm_quality_report(context, bm, ob=None) -> "report":
+    """Get the quality report of triangulated bmesh, in a single extraction pass.
+
+    Return a dict of the QUALITY_CHECKS keys to the arrays of failing element indexes.
+    If ob is set, its last verdict is reused for unchanged geometry.
+    """
     epsilon_len = context.scene.bf_config_min_edge_length
     epsilon_area = context.scene.bf_config_min_face_area
-    _check_bm_manifold_verts(context, ob, bm, epsilon_len, epsilon_area, protect)
-    _check_bm_manifold_edges(context, ob, bm, epsilon_len, epsilon_area, protect)
-    _check_bm_degenerate_edges(context, ob, bm, epsilon_len, epsilon_area, protect)
-    _check_bm_degenerate_faces(context, ob, bm, epsilon_len, epsilon_area, protect)
-    _check_bm_loose_vertices(context, ob, bm, epsilon_len, epsilon_area, protect)
-    _check_bm_duplicate_vertices(context, ob, bm, epsilon_len, epsilon_area, protect)
-    _check_bm_normals(context, ob, bm, epsilon_len, epsilon_area, protect)
-
-
-def _check_bm_manifold_verts(context, ob, bm, epsilon_len, epsilon_area, protect):
-    """Check manifold vertices."""
-    bad_verts = list()
-    for vert in bm.verts:
-        if not vert.is_manifold:
-            bad_verts.append(vert)
-    if bad_verts:
-        msg = f"Non manifold vertices detected ({len(bad_verts)} vertices)."
-        _raise_bad_geometry(context, ob, bm, msg, protect, bad_verts=bad_verts)
+    co, edges, tris = _get_bm_arrays(bm)
+    if ob is None:
+        return calc_quality.get_quality_report(
+            co, edges, tris, epsilon_len, epsilon_area
+        )
+    return _get_incremental_quality_report(
+        ob.name, co, edges, tris, epsilon_len, epsilon_area
+    )
 
 
-def _check_bm_manifold_edges(context, ob, bm, epsilon_len, epsilon_area, protect):
-    """Check manifold edges, each edge should join two faces, no more no less."""
-    bad_edges = list()
-    for edge in bm.edges:
-        if not edge.is_manifold:
-            bad_edges.append(edge)
-    if bad_edges:
-        msg = f"Non manifold or open geometry detected ({len(bad_edges)} edges)."
-        _raise_bad_geometry(context, ob, bm, msg, protect, bad_edges=bad_edges)
+def _get_bm_arrays(bm) -> "co, edges, tris":
+    """Get vertex coordinates, edge and triangle vertex indexes from triangulated bmesh."""
+    me = bpy.data.meshes.new("bf_check_tmp")
+    try:
+        bm.to_mesh(me)  # keeps the bmesh element order
+        co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+        me.vertices.foreach_get("co", co)
+        edges = np.empty(len(me.edges) * 2, dtype=np.int32)
+        me.edges.foreach_get("vertices", edges)
+        tris = np.empty(len(me.loops), dtype=np.int32)
+        me.loops.foreach_get("vertex_index", tris)
+    finally:
+        bpy.data.meshes.remove(me)
+    return (
+        co.reshape(-1, 3).astype(np.float64),
+        edges.reshape(-1, 2).astype(np.int64),
+        tris.reshape(-1, 3).astype(np.int64),
+    )
 
 
-def _check_bm_normals(context, ob, bm, epsilon_len, epsilon_area, protect):
-    """Check normals, adjoining faces should have normals in the same directions."""
-    bad_edges = list()
-    for edge in bm.edges:
-        if not edge.is_contiguous:
-            bad_edges.append(edge)
-    if bad_edges:
-        msg = f"Inconsistent face normals detected ({len(bad_edges)} edges)."
-        _raise_bad_geometry(context, ob, bm, msg, protect, bad_edges=bad_edges)
-    if not protect:
-        bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
-
-
-def _check_bm_degenerate_edges(context, ob, bm, epsilon_len, epsilon_area, protect):
-    """Check no degenerate edges, zero lenght edges."""
-    bad_edges = list()
-    for edge in bm.edges:
-        if edge.calc_length() <= epsilon_len:
-            bad_edges.append(edge)
-    if bad_edges:
-        msg = f"Too short edges detected ({len(bad_edges)} edges)."
-        _raise_bad_geometry(context, ob, bm, msg, protect, bad_edges=bad_edges)
+# Quality verdicts
+# The last quality report of each Object is stored by Object name, with its
+# vertex coordinates and a hash of its topology and of the quality settings.
+# Unchanged Objects are skipped, Objects with unchanged topology are
+# checked only near their moved vertices.
 
+_verdicts = LRUCache(maxsize=1024)
+quality_stats = dict.fromkeys(("checked", "skipped", "partial"), 0)
 
-def _check_bm_degenerate_faces(
-    context, ob, bm, epsilon_len, epsilon_area, protect=True
-):
-    """Check degenerate faces, zero area faces."""
-    bad_faces = list()
-    for face in bm.faces:
-        if face.calc_area() <= epsilon_area:
-            bad_faces.append(face)
-    if bad_faces:
-        msg = f"Too small area faces detected ({len(bad_faces)} faces)."
-        _raise_bad_geometry(context, ob, bm, msg, protect, bad_faces=bad_faces)
 
+def reset_quality_stats():
+    """Reset the counters of checked, skipped, and partially checked Objects."""
+    for key in quality_stats:
+        quality_stats[key] = 0
 
-def _check_bm_loose_vertices(context, ob, bm, epsilon_len, epsilon_area, protect):
-    """Check loose vertices, vertices that have no connectivity."""
-    bad_verts = list()
-    for vert in bm.verts:
-        if not bool(vert.link_edges):
-            bad_verts.append(vert)
-    if bad_verts:
-        msg = f"Loose vertices detected ({len(bad_verts)} vertices)."
-        _raise_bad_geometry(context, ob, bm, msg, protect, bad_verts=bad_verts)
-
-
-def _check_bm_duplicate_vertices(context, ob, bm, epsilon_len, epsilon_area, protect):
-    """Check duplicate vertices."""
-    bad_verts = list()
-    size = len(bm.verts)
-    kd = mathutils.kdtree.KDTree(size)  # create a kd-tree from a mesh
-    for i, vert in enumerate(bm.verts):
-        kd.insert(vert.co, i)
-    kd.balance()
-    for vert in bm.verts:
-        vert_group = list()
-        for (_, i, _) in kd.find_range(vert.co, epsilon_len):
-            vert_group.append(i)
-        if len(vert_group) > 1:
-            for i in vert_group:
-                bad_verts.append(bm.verts[i])
-    if bad_verts:
-        msg = f"Duplicate vertices detected ({len(bad_verts)} vertices)."
-        _raise_bad_geometry(context, ob, bm, msg, protect, bad_verts=bad_verts)
+
+def get_quality_stats_msg() -> "msg":
+    """Get a message with the counters of checked Objects."""
+    return (
+        f"GEOM quality: {quality_stats['checked']} checked, "
+        f"{quality_stats['skipped']} skipped, "
+        f"{quality_stats['partial']} partially checked"
+    )
+
+
+def _get_incremental_quality_report(
+    name, co, edges, tris, epsilon_len, epsilon_area
+) -> "report":
+    """Get the quality report of a triangulated surface, reusing its last verdict."""
+    with profiling.stage("quality_check", name):
+        profiling.add_count(len(tris))
+        topology, report, status = _update_quality_report(
+            name, co, edges, tris, epsilon_len, epsilon_area, _verdicts.get(name)
+        )
+    _set_verdict(name, co, topology, report, status)
+    return dict(report)
+
+
+def _update_quality_report(
+    name, co, edges, tris, epsilon_len, epsilon_area, verdict=None
+) -> "topology, report, status":
+    """Update the last verdict of a triangulated surface, with no access to bpy."""
+    h = blake2b(digest_size=16)
+    h.update(np.array((len(co), epsilon_len, epsilon_area)).tobytes())
+    h.update(edges.tobytes())
+    h.update(tris.tobytes())
+    topology = h.hexdigest()
+    if verdict and verdict[0] == topology:
+        moved = np.flatnonzero((co != verdict[1]).any(axis=1))
+        if not len(moved):
+            print(f"BFDS: calc_trisurfaces: quality of <{name}> unchanged, skipped")
+            return topology, dict(verdict[2]), "skipped"
+        print(f"BFDS: calc_trisurfaces: {len(moved)} vertices moved in <{name}>")
+        report = calc_quality.get_partial_quality_report(
+            co, edges, tris, moved, verdict[2], epsilon_len, epsilon_area
+        )
+        return topology, report, "partial"
+    report = calc_quality.get_quality_report(co, edges, tris, epsilon_len, epsilon_area)
+    return topology, report, "checked"
+
+
+def _set_verdict(name, co, topology, report, status):
+    """Store the quality verdict of a triangulated surface, and count it."""
+    quality_stats[status] += 1
+    _verdicts[name] = topology, co, dict(report)
 
 
 # Check intersections
@@ -227,8 +407,11 @@ def check_intersections(context, ob, other_obs=None, protect=True):
     bm, tree = _get_bm_and_tree(context, ob, epsilon_len=epsilon_len)
     # Get self-intersections
     bad_faces.extend(_get_bm_intersected_faces(bm, tree, tree))
-    # Get intersections
-    for other_ob in other_obs or tuple():
+    # Get intersections, with the other obs whose bounding box overlaps
+    other_obs = other_obs or tuple()
+    aabbs = _get_world_aabbs((ob, *other_obs), epsilon_len)
+    near = [j for i, j in _get_aabb_pairs(aabbs) if i == 0]
+    for other_ob in (other_obs[j - 1] for j in near):
         matrix = (
             ob.matrix_world.inverted() @ other_ob.matrix_world
         )  # Blender 2.80 matrix multiplication
@@ -242,6 +425,96 @@ def check_intersections(context, ob, other_obs=None, protect=True):
         _raise_bad_geometry(context, ob, bm, msg, protect, bad_faces=bad_faces)
 
 
+# Check scene intersections
+# World BVH trees are stored by Object name, and are valid while the
+# fingerprint of the evaluated Object geometry, its transform, and epsilon
+# is unchanged.
+# Entries are dropped by the depsgraph handler when the Object changes.
+
+_trees = LRUCache(maxsize=1024)
+
+
+def invalidate_trees(ob=None):
+    """Drop cached BVH tree of ob, or of all Objects."""
+    if ob is None:
+        _trees.clear()
+    else:
+        _trees.pop(ob.name, None)
+
+
+def check_scene_intersections(context, obs):
+    """Check intersections between all obs, select and report intersecting pairs."""
+    print(f"BFDS: Check intersections between {len(obs)} Objects")
+    bpy.ops.object.mode_set(mode="OBJECT")
+    epsilon_len = context.scene.bf_config_min_edge_length
+    obs = [ob for ob in obs if ob.type in {"MESH", "CURVE", "SURFACE", "FONT", "META"}]
+    # Broad phase, on world bounding boxes
+    candidates = _get_aabb_pairs(_get_world_aabbs(obs, epsilon_len))
+    print(f"BFDS: {len(candidates)} candidate pairs with overlapping bounding boxes")
+    # Narrow phase, on cached world BVH trees
+    pairs = list()
+    for i, j in candidates:
+        tree = _get_world_tree(context, obs[i], epsilon_len)
+        other_tree = _get_world_tree(context, obs[j], epsilon_len)
+        if tree.overlap(other_tree):
+            pairs.append((obs[i], obs[j]))
+    # Raise
+    if pairs:
+        bpy.ops.object.select_all(action="DESELECT")
+        for ob, other_ob in pairs:
+            ob.select_set(True)
+            other_ob.select_set(True)
+        names = ", ".join(f"<{ob.name}>/<{other_ob.name}>" for ob, other_ob in pairs)
+        msg = f"Intersections detected ({len(pairs)} pairs): {names}."
+        raise BFException(context.scene, msg)
+
+
+def _get_world_tree(context, ob, epsilon_len) -> "BVHTree":
+    """Get the cached BVHTree of Object in world coordinates."""
+    fingerprint = utils.get_object_fingerprint(context, ob, (epsilon_len,))
+    entry = _trees.get(ob.name)
+    if entry and entry[0] == fingerprint:
+        return entry[1]
+    bm = utils.get_object_bmesh(context, ob, world=True)
+    tree = mathutils.bvhtree.BVHTree.FromBMesh(bm, epsilon=epsilon_len)
+    bm.free()
+    _trees[ob.name] = fingerprint, tree
+    return tree
+
+
+def _get_world_aabbs(obs, epsilon_len) -> "aabbs":
+    """Get the (N,6) world axis aligned bounding boxes of obs in xbs format."""
+    aabbs = np.empty((len(obs), 6))
+    for i, ob in enumerate(obs):
+        m = np.array(ob.matrix_world, dtype=np.float64)
+        bb = np.array(ob.bound_box, dtype=np.float64) @ m[:3, :3].T + m[:3, 3]
+        aabbs[i, 0::2] = bb.min(axis=0) - epsilon_len
+        aabbs[i, 1::2] = bb.max(axis=0) + epsilon_len
+    return aabbs
+
+
+def _get_aabb_pairs(aabbs) -> "pairs":
+    """Get the index pairs of overlapping aabbs, by sweep and prune along x."""
+    order = np.argsort(aabbs[:, 0], kind="stable")
+    sorted_aabbs = aabbs[order]
+    # Each aabb can only overlap the next ones starting before its end along x
+    ends = np.searchsorted(sorted_aabbs[:, 0], sorted_aabbs[:, 1], side="right")
+    pairs = list()
+    for i, end in enumerate(ends):
+        a, others = sorted_aabbs[i], sorted_aabbs[i + 1 : end]
+        overlap = (
+            (others[:, 2] <= a[3])
+            & (others[:, 3] >= a[2])
+            & (others[:, 4] <= a[5])
+            & (others[:, 5] >= a[4])
+        )
+        pairs.extend(
+            (int(min(order[i], order[j])), int(max(order[i], order[j])))
+            for j in np.flatnonzero(overlap) + i + 1
+        )
+    return sorted(pairs)
+
+
 # Raise bad geometry
 
 
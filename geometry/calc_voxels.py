@@ -1,12 +1,15 @@
 """BlenderFDS, voxelization algorithms."""
 
 import bpy, bmesh
+import numpy as np
 from math import floor, ceil
+from itertools import product
 
 from mathutils import Matrix
 
 from ..types import BFException
-from . import utils
+from .. import config, utils as bf_utils
+from . import utils, calc_boxes
 
 DEBUG = False
 
@@ -15,7 +18,7 @@ DEBUG = False
 # one and only origin of axes)
 
 
-def get_voxels(context, ob, scale_length):
+def get_voxels(context, ob, scale_length) -> "xbs, voxel_size, voxel_count":
     """Get voxels from object in xbs format."""
     print("BFDS: calc_voxels.get_voxels:", ob.name)
     # Check object and init
@@ -24,6 +27,194 @@ def get_voxels(context, ob, scale_length):
     if not ob.data.vertices:
         raise BFException(ob, "Empty object!")
     voxel_size = _get_voxel_size(context, ob)
+    merge = context.scene.bf_config_voxel_merge
+    boxes, origin, voxel_count = _get_ob_boxes(context, ob, voxel_size, merge)
+    DEBUG and print(f"BFDS: get_voxels: {len(boxes)} boxes in {boxes.nbytes} bytes")
+    # Transform boxes to xbs in world coordinates and correct for unit_settings
+    xbs = _get_box_xbs(boxes, origin, voxel_size, scale_length)
+    if not len(xbs):
+        raise BFException(ob, "No voxel/pixel created!")
+    return xbs, voxel_size * scale_length, voxel_count
+
+
+def _get_ob_boxes(context, ob, voxel_size, merge) -> "boxes, origin, voxel_count":
+    """Get merged boxes of object in integer coordinates."""
+    if context.scene.bf_config_voxelizer == "REMESH":
+        boxes, origin, grows = _get_remesh_boxes(context, ob, voxel_size)
+        if not len(boxes):
+            raise BFException(ob, "No voxel/pixel created!")
+        voxel_count = calc_boxes.get_boxes_volume(boxes)
+        boxes = calc_boxes.get_merged_boxes(boxes, merge, grows)
+    else:
+        boxes, origin, voxel_count = _get_raytraced_boxes(
+            context, ob, voxel_size, merge
+        )
+        if not len(boxes):
+            raise BFException(ob, "No voxel/pixel created!")
+    return boxes, origin, voxel_count
+
+
+def get_fused_voxels(context, obs, scale_length) -> "xbs, voxel_size, voxel_count":
+    """Get the union of voxels from objects aligned to world origin in xbs format."""
+    print("BFDS: calc_voxels.get_fused_voxels:", ", ".join(ob.name for ob in obs))
+    voxel_size = _get_voxel_size(context, obs[0])
+    merge = context.scene.bf_config_voxel_merge
+    # Get the boxes of each object on the shared grid, with origin
+    # in the world origin, quickly merged along axis
+    ob_boxes = list()
+    for ob in obs:
+        if ob.type not in {"MESH", "CURVE", "SURFACE", "FONT", "META"}:
+            raise BFException(ob, "Object can not be converted to mesh.")
+        if not ob.data.vertices:
+            raise BFException(ob, "Empty object!")
+        if ob.bf_xb_center_voxels or _get_voxel_size(context, ob) != voxel_size:
+            raise BFException(ob, "Cannot fuse Objects with different voxel grids.")
+        boxes, origin, _ = _get_ob_boxes(context, ob, voxel_size, "AXIS")
+        shift = np.rint(np.array(origin) / voxel_size).astype(np.int32)
+        ob_boxes.append(boxes + np.repeat(shift, 2))
+    # Take their union and merge
+    boxes, voxel_count = _get_union_boxes(np.concatenate(ob_boxes), merge)
+    xbs = _get_box_xbs(boxes, np.zeros(3), voxel_size, scale_length)
+    return xbs, voxel_size * scale_length, voxel_count
+
+
+def get_mesh_voxels(context, ob, scale_length) -> "xbs, voxel_size, voxel_count":
+    """Get voxels from object on the cells of overlapping MESHes in xbs format."""
+    print("BFDS: calc_voxels.get_mesh_voxels:", ob.name)
+    # Check object and init
+    if ob.type not in {"MESH", "CURVE", "SURFACE", "FONT", "META"}:
+        raise BFException(ob, "Object can not be converted to mesh.")
+    if not ob.data.vertices:
+        raise BFException(ob, "Empty object!")
+    tris = utils.get_object_tris(context, ob, world=True)
+    if not len(tris):
+        raise BFException(ob, "No voxel/pixel created!")
+    merge = context.scene.bf_config_voxel_merge
+    # Voxelize on each overlapping MESH, at its own resolution
+    mesh_xbs, voxel_count, cell_sizes = list(), 0, list()
+    for origin, cell_size, ijk in _get_overlapping_mesh_grids(context, tris):
+        boxes, count = _get_grid_boxes(ob, (tris - origin) / cell_size, merge, ijk)
+        if not len(boxes):
+            continue
+        # Exactly on cell faces, no epsilon
+        xbs = np.repeat(origin, 2) + boxes * np.repeat(cell_size, 2)
+        mesh_xbs.append(xbs * scale_length)
+        voxel_count += count
+        cell_sizes.append(cell_size.min())
+    if not mesh_xbs:
+        raise BFException(ob, "No voxel created on MESH cells!")
+    return np.concatenate(mesh_xbs), min(cell_sizes) * scale_length, voxel_count
+
+
+def _get_overlapping_mesh_grids(context, tris) -> "origin, cell_size, ijk":
+    """Get the grids of the exported MESHes overlapping tris bounding box."""
+    co = tris.reshape(-1, 3)
+    co_min, co_max = co.min(axis=0), co.max(axis=0)
+    for ob in context.scene.objects:
+        if (
+            ob.type != "MESH"
+            or ob.bf_is_tmp
+            or ob.bf_namelist_cls != "ON_MESH"
+            or not ob.bf_export
+        ):
+            continue
+        xb = np.array(utils.get_bbox_xbs(context, ob, 1.0, world=True))
+        m_min, m_max = xb[0::2], xb[1::2]
+        if np.any(m_max <= co_min) or np.any(m_min >= co_max):
+            continue
+        ijk = tuple(ob.bf_mesh_ijk)
+        yield m_min, (m_max - m_min) / np.array(ijk), ijk
+
+
+# Native voxelization, without temporary objects or modifiers.
+# The evaluated triangles are transformed into grid coordinates, where each
+# voxel is a unit cube, then raytraced and merged into boxes by calc_boxes.
+
+
+# Voxelization jobs
+# The native voxelization of many objects runs in a single process pool:
+# their tris are extracted and cut in chunks on the main thread, the chunks
+# of all objects are merged in the pool, then joined back for each object.
+
+
+def get_voxels_job(context, ob) -> "job":
+    """Get the chunk jobs of the native voxelization of object."""
+    print("BFDS: calc_voxels.get_voxels_job:", ob.name)
+    # Check object and init
+    if ob.type not in {"MESH", "CURVE", "SURFACE", "FONT", "META"}:
+        raise BFException(ob, "Object can not be converted to mesh.")
+    if not ob.data.vertices:
+        raise BFException(ob, "Empty object!")
+    voxel_size = _get_voxel_size(context, ob)
+    merge = context.scene.bf_config_voxel_merge
+    tris = utils.get_object_tris(context, ob, world=True)
+    if not len(tris):
+        raise BFException(ob, "No voxel/pixel created!")
+    origin = _get_grid_origin(ob, tris, voxel_size)
+    tris = (tris - origin) / voxel_size  # in grid coo
+    return {
+        "origin": origin,
+        "voxel_size": voxel_size,
+        "chunks": calc_boxes.get_chunk_jobs(tris, merge),
+    }
+
+
+def get_voxels_from_job(
+    ob, job, results, scale_length
+) -> "xbs, voxel_size, voxel_count":
+    """Get voxels from the results of the chunk jobs of object in xbs format."""
+    if any(isinstance(r, calc_boxes.OddCrossingsError) for r in results):
+        raise BFException(ob, "Non manifold or open geometry, cannot voxelize.")
+    boxes, voxel_count = calc_boxes.join_chunk_boxes(job["chunks"], results)
+    if not len(boxes):
+        raise BFException(ob, "No voxel/pixel created!")
+    voxel_size = job["voxel_size"]
+    xbs = _get_box_xbs(boxes, job["origin"], voxel_size, scale_length)
+    return xbs, voxel_size * scale_length, voxel_count
+
+
+def _get_raytraced_boxes(context, ob, voxel_size, merge) -> "boxes, origin, count":
+    """Get merged boxes from object by raytracing its triangles along z axis."""
+    tris = utils.get_object_tris(context, ob, world=True)
+    if not len(tris):
+        raise BFException(ob, "No voxel/pixel created!")
+    origin = _get_grid_origin(ob, tris, voxel_size)
+    tris = (tris - origin) / voxel_size  # in grid coo
+    boxes, voxel_count = _get_grid_boxes(ob, tris, merge)
+    return boxes, origin, voxel_count
+
+
+def _get_grid_boxes(ob, tris, merge, shape=None) -> "boxes, voxel_count":
+    """Get merged boxes from tris in grid coo, within grid shape if set."""
+    # Tile the grid in chunks, voxelized and merged independently
+    jobs = calc_boxes.get_chunk_jobs(tris, merge, shape)
+    max_workers = config.get_prefs().bf_pref_workers
+    try:
+        results = bf_utils.pool_map(
+            calc_boxes.get_chunk_boxes, jobs, max_workers=max_workers
+        )
+    except calc_boxes.OddCrossingsError:
+        raise BFException(ob, "Non manifold or open geometry, cannot voxelize.")
+    return calc_boxes.join_chunk_boxes(jobs, results)
+
+
+def _get_grid_origin(ob, tris, voxel_size) -> "origin":
+    """Get voxel grid origin in world coordinates."""
+    co = tris.reshape(-1, 3)
+    co_min, co_max = co.min(axis=0), co.max(axis=0)
+    if ob.bf_xb_center_voxels:
+        # Grid centered to object bounding box
+        n = np.maximum(np.ceil((co_max - co_min) / voxel_size), 1.0)
+        return (co_min + co_max - n * voxel_size) / 2.0
+    # Grid aligned to world origin
+    return np.floor(co_min / voxel_size) * voxel_size
+
+
+# Voxelization by remesh modifier
+
+
+def _get_remesh_boxes(context, ob, voxel_size) -> "boxes, origin, grows":
+    """Get boxes from object by applying a blocks remesh modifier."""
     # Get evaluated ob (eg. modifiers applied) and its Mesh
     dg = context.evaluated_depsgraph_get()
     ob_eval = ob.evaluated_get(dg)
@@ -37,20 +228,20 @@ def get_voxels(context, ob, scale_length):
     if not ob.bf_xb_center_voxels:
         _align_remesh_to_world_origin(context, ob_tmp, voxel_size)
     _add_remesh_mod(context, ob_tmp, voxel_size)
-    # Get evaluated bmesh from ob_tmp; it is already in world coo
-    bm = utils.get_object_bmesh(context, ob_tmp, world=False)
+    # Get evaluated face centers and normals from ob_tmp; already in world coo
+    centers, normals = _get_remesh_centers_normals(context, ob_tmp)
     # Clean up
     bpy.data.meshes.remove(ob_tmp.data, do_unlink=True)  # no mem leaks
     # Check
-    if len(bm.faces) == 0:  # no faces
+    if len(centers) == 0:  # no faces
         raise BFException(ob, "No voxel/pixel created!")
-    # Get faces and sort them according to normals
-    x_faces, y_faces, z_faces = _sort_faces_by_normal(bm)
+    # Get face centers and sort them according to normals
+    x_faces, y_faces, z_faces = _sort_faces_by_normal(centers, normals)
     # Choose shorter list of faces, relative functions, and parameters
     choices = [
-        (len(x_faces), _get_boxes_along_x, x_faces, _grow_boxes_along_x, 0),
-        (len(y_faces), _get_boxes_along_y, y_faces, _grow_boxes_along_y, 2),
-        (len(z_faces), _get_boxes_along_z, z_faces, _grow_boxes_along_z, 4),
+        (len(x_faces), _get_boxes_along_x, x_faces, calc_boxes.grow_boxes_along_x, 0),
+        (len(y_faces), _get_boxes_along_y, y_faces, calc_boxes.grow_boxes_along_y, 2),
+        (len(z_faces), _get_boxes_along_z, z_faces, calc_boxes.grow_boxes_along_z, 4),
     ]
     choices.sort(key=lambda choice: choice[0])
     get_boxes = choices[0][1]  # get boxes by fastest orientation
@@ -61,31 +252,38 @@ def get_voxels(context, ob, scale_length):
     second_sort_by = choices[1][4]
     # For each face find other sides and build boxes data structure
     boxes, origin = get_boxes(faces, voxel_size)
-    # Join boxes along other axis and return their world coordinates
-    boxes = grow_boxes_along_first_axis(boxes, first_sort_by)
-    boxes = grow_boxes_along_second_axis(boxes, second_sort_by)
-    # Transform boxes to xbs in world coordinates and correct for unit_settings
-    xbs = list(_get_box_xbs(boxes, origin, voxel_size, scale_length))
-    # Clean up
-    bm.free()
-    if not xbs:
-        raise BFException(ob, "No voxel/pixel created!")
-    return xbs, voxel_size * scale_length
-
-
-def _sort_faces_by_normal(bm):
-    """Sort bmesh faces according to normal."""
-    x_faces, y_faces, z_faces = list(), list(), list()
-    for face in bm.faces:
-        normal = face.normal
-        if abs(normal[0]) > 0.9:
-            x_faces.append(face)  # face is normal to x axis
-        elif abs(normal[1]) > 0.9:
-            y_faces.append(face)  # ... to y axis
-        elif abs(normal[2]) > 0.9:
-            z_faces.append(face)  # ... to z axis
-        else:
-            raise ValueError("BFDS: abnormal face")
+    grows = (
+        (grow_boxes_along_first_axis, first_sort_by),
+        (grow_boxes_along_second_axis, second_sort_by),
+    )
+    return boxes, origin, grows
+
+
+def _get_remesh_centers_normals(context, ob) -> "centers, normals":
+    """Get evaluated polygon centers and normals of ob as (N,3) arrays."""
+    bpy.ops.object.mode_set(mode="OBJECT")  # actualize
+    depsgraph = context.evaluated_depsgraph_get()
+    ob_eval = ob.evaluated_get(depsgraph)
+    me = ob_eval.to_mesh()
+    try:
+        centers = np.empty(len(me.polygons) * 3, dtype=np.float32)
+        normals = np.empty(len(me.polygons) * 3, dtype=np.float32)
+        me.polygons.foreach_get("center", centers)
+        me.polygons.foreach_get("normal", normals)
+    finally:
+        ob_eval.to_mesh_clear()
+    return (
+        centers.reshape(-1, 3).astype(np.float64),
+        normals.reshape(-1, 3).astype(np.float64),
+    )
+
+
+def _sort_faces_by_normal(centers, normals):
+    """Sort face centers according to normal."""
+    axis = np.argmax(np.abs(normals), axis=1)  # face is normal to axis
+    if np.any(np.abs(normals[np.arange(len(normals)), axis]) <= 0.9):
+        raise ValueError("BFDS: abnormal face")
+    x_faces, y_faces, z_faces = (centers[axis == i] for i in range(3))
     if len(x_faces) < 2 or len(y_faces) < 2 or len(z_faces) < 2:
         raise ValueError("BFDS: not enough faces")
     return x_faces, y_faces, z_faces
@@ -216,213 +414,95 @@ def _insert_verts_into_mesh(me, verts):
 #    0   1 A 2   3 x
 
 
-def _get_face_center(face):
-    """Get bmesh face center point."""
-    xs, ys, zs = zip(*(v.co for v in face.verts))
-    return sum(xs) / len(xs), sum(ys) / len(ys), sum(zs) / len(zs)
-
-
 def _get_boxes_along_x(faces, voxel_size) -> "boxes, origin":
-    """Get minimal boxes from faces by raytracing along x axis."""
+    """Get minimal boxes from face centers by raytracing along x axis."""
     DEBUG and print("BFDS: _get_boxes_along_x")
-    # First face center becomes origin of the integer grid for faces
-    f_origin = _get_face_center(faces[0])
-    hvs = voxel_size / 2.0  # half voxel size
-    origin = (f_origin[0], f_origin[1] - hvs, f_origin[2] - hvs)
-    # Get integer coordinates of faces and
-    # classify faces in integer piles along z
-    # piles = {(3,4):(3,4,15,25,), (3,5):(3,4,15,25), ...}
-    piles = dict()
-    for face in faces:
-        center = _get_face_center(face)
-        ix, iy, iz = (
-            round((center[0] - f_origin[0]) / voxel_size),
-            round((center[1] - f_origin[1]) / voxel_size),
-            round((center[2] - f_origin[2]) / voxel_size),
-        )
-        try:
-            piles[(iy, iz)].append(ix)
-        except KeyError:
-            piles[(iy, iz)] = [ix]
-    # Create boxes by raytracing piles along axis
-    # boxes = [[ix0, ix1, iy0, iy1, iz0, iz1], ...]
-    boxes = list()
-    for (iy, iz), ixs in piles.items():
-        ixs.sort()  # sort in +x direction
-        while ixs:
-            ix1, ix0 = ixs.pop(), ixs.pop()  # pop solid volumes from top to bottom
-            boxes.append([ix0, ix1, iy, iy + 1, iz, iz + 1])
-    return boxes, origin
+    return _get_boxes_along_axis(faces, voxel_size, axis=0)
 
 
 def _get_boxes_along_y(faces, voxel_size) -> "boxes, origin":
-    """Get minimal boxes from faces by raytracing along y axis."""
+    """Get minimal boxes from face centers by raytracing along y axis."""
     DEBUG and print("BFDS: _get_boxes_along_y")
-    # First face center becomes origin of the integer grid for faces
-    f_origin = _get_face_center(faces[0])
-    hvs = voxel_size / 2.0  # half voxel size
-    origin = (f_origin[0] - hvs, f_origin[1], f_origin[2] - hvs)
-    # Get integer coordinates of faces and
-    # classify faces in integer piles along z
-    # piles = {(3,4):(3,4,15,25,), (3,5):(3,4,15,25), ...}
-    piles = dict()
-    for face in faces:
-        center = _get_face_center(face)
-        ix, iy, iz = (
-            round((center[0] - f_origin[0]) / voxel_size),
-            round((center[1] - f_origin[1]) / voxel_size),
-            round((center[2] - f_origin[2]) / voxel_size),
-        )
-        try:
-            piles[(iz, ix)].append(iy)
-        except KeyError:
-            piles[(iz, ix)] = [iy]
-    # Create boxes by raytracing piles along axis
-    # boxes = [[ix0, ix1, iy0, iy1, iz0, iz1], ...]
-    boxes = list()
-    for (iz, ix), iys in piles.items():
-        iys.sort()  # sort in +y direction
-        while iys:
-            iy1, iy0 = iys.pop(), iys.pop()  # pop solid volumes from top to bottom
-            boxes.append([ix, ix + 1, iy0, iy1, iz, iz + 1])
-    return boxes, origin
+    return _get_boxes_along_axis(faces, voxel_size, axis=1)
 
 
 def _get_boxes_along_z(faces, voxel_size) -> "boxes, origin":
-    """Get minimal boxes from faces by raytracing along z axis."""
+    """Get minimal boxes from face centers by raytracing along z axis."""
     DEBUG and print("BFDS: _get_boxes_along_z")
+    return _get_boxes_along_axis(faces, voxel_size, axis=2)
+
+
+def _get_boxes_along_axis(faces, voxel_size, axis) -> "boxes, origin":
+    """Get minimal boxes from (N,3) face centers by raytracing along axis."""
     # First face center becomes origin of the integer grid for faces
-    f_origin = _get_face_center(faces[0])
+    f_origin = faces[0]
     hvs = voxel_size / 2.0  # half voxel size
-    origin = (f_origin[0] - hvs, f_origin[1] - hvs, f_origin[2])
-    # Get integer coordinates of faces and
-    # classify faces in integer piles along z
-    # piles = {(3,4):(3,4,15,25,), (3,5):(3,4,15,25), ...}
-    piles = dict()
-    for face in faces:
-        center = _get_face_center(face)
-        ix, iy, iz = (
-            round((center[0] - f_origin[0]) / voxel_size),
-            round((center[1] - f_origin[1]) / voxel_size),
-            round((center[2] - f_origin[2]) / voxel_size),
-        )
-        try:
-            piles[(ix, iy)].append(iz)
-        except KeyError:
-            piles[(ix, iy)] = [iz]
-    # Create boxes by raytracing piles along axis
+    origin = [coo - hvs for coo in f_origin]
+    origin[axis] = f_origin[axis]
+    origin = tuple(origin)
+    # Get integer coordinates of faces in one step
+    icos = np.rint((faces - f_origin) / voxel_size).astype(np.int64)
+    # Classify faces in integer piles along axis, by sorting them
+    # by their pile coordinates and then along axis
+    ia, ib = ((1, 2), (2, 0), (0, 1))[axis]
+    order = np.lexsort((icos[:, axis], icos[:, ib], icos[:, ia]))
+    icos = icos[order]
+    new_pile = np.empty(len(icos), dtype=bool)
+    new_pile[0] = True
+    new_pile[1:] = np.any(icos[1:, (ia, ib)] != icos[:-1, (ia, ib)], axis=1)
+    pile_starts = np.flatnonzero(new_pile)
+    pile_sizes = np.diff(np.append(pile_starts, len(icos)))
+    if np.any(pile_sizes % 2):
+        raise ValueError("BFDS: odd number of faces in pile")
+    # Create boxes by pairing faces of each pile, solid volumes go
+    # from entry face (even index) to exit face (odd index)
     # boxes = [[ix0, ix1, iy0, iy1, iz0, iz1], ...]
-    boxes = list()
-    for (ix, iy), izs in piles.items():
-        izs.sort()  # sort in +z direction
-        while izs:
-            iz1, iz0 = izs.pop(), izs.pop()  # pop solid volumes from top to bottom
-            boxes.append([ix, ix + 1, iy, iy + 1, iz0, iz1])
+    entries, exits = icos[0::2], icos[1::2]
+    boxes = np.empty((len(entries), 6), dtype=np.int32)
+    boxes[:, 0::2] = entries
+    boxes[:, 1::2] = entries + 1
+    boxes[:, 2 * axis + 1] = exits[:, axis]
     return boxes, origin
 
 
-# The following functions reduce the number of boxes in xbs format,
-# used to describe the geometry, by merging them
-
-
-def _grow_boxes_along_x(boxes, sort_by):
-    """Grow boxes by merging neighbours along x axis."""
-    DEBUG and print("BFDS: _grow_boxes_along_x")
-    # Sort boxes
-    boxes.sort(key=lambda box: (box[sort_by], box[0]))
-    # Grow boxes in -x direction, starting from last one
-    boxes_grown = list()
-    box = boxes.pop()
-    while boxes:
-        abox = boxes.pop()
-        # Check same iz0, iz1, iy0, iy1, and touching abox ix1 with box ix0
-        if (
-            abox[4] == box[4]
-            and abox[5] == box[5]
-            and abox[2] == box[2]
-            and abox[3] == box[3]
-            and abox[1] == box[0]
-        ):
-            box[0] = abox[0]  # grow box along -x
-        else:
-            boxes_grown.append(box)  # stash the resulting box
-            box = abox  # init next cycle
-    # Stash the last one
-    boxes_grown.append(box)
-    return boxes_grown
-
-
-def _grow_boxes_along_y(boxes, sort_by):
-    """Grow boxes by merging neighbours along y axis."""
-    DEBUG and print("BFDS: _grow_boxes_along_y")
-    # Sort boxes
-    boxes.sort(key=lambda box: (box[sort_by], box[2]))
-    # Grow boxes in -y direction, starting from last one
-    boxes_grown = list()
-    box = boxes.pop()
-    while boxes:
-        abox = boxes.pop()
-        # Check same iz0, iz1, ix0, ix1, and touching abox iy1 with box iy0
-        if (
-            abox[4] == box[4]
-            and abox[5] == box[5]
-            and abox[0] == box[0]
-            and abox[1] == box[1]
-            and abox[3] == box[2]
-        ):
-            box[2] = abox[2]  # grow box along -y
-        else:
-            boxes_grown.append(box)  # stash the resulting box
-            box = abox  # init next cycle
-    # Stash the last one
-    boxes_grown.append(box)
-    return boxes_grown
-
-
-def _grow_boxes_along_z(boxes, sort_by):
-    """Grow boxes by merging neighbours along z axis."""
-    DEBUG and print("BFDS: _grow_boxes_along_z")
-    # Sort boxes
-    boxes.sort(key=lambda box: (box[sort_by], box[4]))
-    # Grow boxes in -z direction, starting from last one
-    boxes_grown = list()
-    box = boxes.pop()
-    while boxes:
-        abox = boxes.pop()
-        # Check same iy0, iy1, ix0, ix1, and touching abox iz1 with box iz0
-        if (
-            abox[2] == box[2]
-            and abox[3] == box[3]
-            and abox[0] == box[0]
-            and abox[1] == box[1]
-            and abox[5] == box[4]
-        ):
-            box[4] = abox[4]  # grow box along -z
-        else:
-            boxes_grown.append(box)  # stash the resulting box
-            box = abox  # init next cycle
-    # Stash the last one
-    boxes_grown.append(box)
-    return boxes_grown
+def _get_union_boxes(boxes, merge) -> "boxes, voxel_count":
+    """Get merged boxes of the union of overlapping boxes, in blocks."""
+    b_min, b_max = boxes[:, 0::2].min(axis=0), boxes[:, 1::2].max(axis=0)
+    jobs = list()
+    for c0 in product(
+        *(range(i0, i1, calc_boxes.CHUNK_SIZE) for i0, i1 in zip(b_min, b_max))
+    ):
+        c0 = np.array(c0)
+        c1 = c0 + calc_boxes.CHUNK_SIZE
+        # Clip overlapping boxes to block
+        selected = np.all(boxes[:, 0::2] < c1, axis=1) & np.all(
+            boxes[:, 1::2] > c0, axis=1
+        )
+        clipped = boxes[selected]
+        clipped[:, 0::2] = np.maximum(clipped[:, 0::2], c0)
+        clipped[:, 1::2] = np.minimum(clipped[:, 1::2], c1)
+        if len(clipped):
+            jobs.append((clipped, merge))
+    max_workers = config.get_prefs().bf_pref_workers
+    results = bf_utils.pool_map(
+        calc_boxes.get_block_boxes, jobs, max_workers=max_workers
+    )
+    boxes = np.concatenate(tuple(r[0] for r in results))
+    voxel_count = sum(r[1] for r in results)
+    if len(jobs) > 1:
+        boxes = calc_boxes.stitch_boxes(boxes)
+    return boxes, voxel_count
 
 
 # Transform boxes in integer coordinates, back to world coordinates
 
 
 def _get_box_xbs(boxes, origin, voxel_size, scale_length) -> "xbs":
-    """Transform boxes to xbs in world coordinates."""
+    """Transform boxes to xbs in world coordinates, as an (N,6) array."""
     epsilon = 1e-5
-    return (
-        (
-            (origin[0] + box[0] * voxel_size - epsilon) * scale_length,
-            (origin[0] + box[1] * voxel_size + epsilon) * scale_length,
-            (origin[1] + box[2] * voxel_size - epsilon) * scale_length,
-            (origin[1] + box[3] * voxel_size + epsilon) * scale_length,
-            (origin[2] + box[4] * voxel_size - epsilon) * scale_length,
-            (origin[2] + box[5] * voxel_size + epsilon) * scale_length,
-        )
-        for box in boxes
-    )
+    xbs = np.repeat(origin, 2) + boxes * voxel_size
+    xbs += np.tile((-epsilon, epsilon), 3)
+    return xbs * scale_length
 
 
 # Pixelization
@@ -430,13 +510,63 @@ def _get_box_xbs(boxes, origin, voxel_size, scale_length) -> "xbs":
 
 def get_pixels(context, ob, scale_length):
     """Get pixels from flat object in xbs format."""
-    print("BFDS: calc_voxels.get_voxels:", ob.name)
+    print("BFDS: calc_voxels.get_pixels:", ob.name)
     # Check object and init
     if ob.type not in {"MESH", "CURVE", "SURFACE", "FONT", "META"}:
         raise BFException(ob, "Object can not be converted to mesh.")
     if not ob.data.vertices:
         raise BFException(ob, "Empty object!")
     voxel_size = _get_voxel_size(context, ob)
+    if context.scene.bf_config_voxelizer == "REMESH":
+        xbs = _get_remesh_pixels(context, ob, voxel_size, scale_length)
+    else:
+        xbs = _get_raytraced_pixels(context, ob, voxel_size, scale_length)
+    return xbs, voxel_size
+
+
+def _get_raytraced_pixels(context, ob, voxel_size, scale_length) -> "xbs":
+    """Get pixels from flat object by rasterizing its projected triangles."""
+    tris = utils.get_object_tris(context, ob, world=True)
+    if not len(tris):
+        raise BFException(ob, "No voxel/pixel created!")
+    # Check how flat it is
+    co = tris.reshape(-1, 3)
+    co_min, co_max = co.min(axis=0), co.max(axis=0)
+    flat_axis = int(np.argmin(co_max - co_min))
+    if co_max[flat_axis] - co_min[flat_axis] > voxel_size / 3.0:
+        raise BFException(ob, "Object is not flat enough.")
+    # Get origin for flat xbs
+    flat_origin = tuple((co_min + co_max) / 2.0 * scale_length)
+    # Project tris on the pixel grid, and get the pixels with center inside
+    origin = _get_grid_origin(ob, tris, voxel_size)
+    iu, iv = ((1, 2), (0, 2), (0, 1))[flat_axis]  # in plane axis
+    ptris = np.zeros_like(tris)
+    ptris[:, :, 0:2] = (tris[:, :, (iu, iv)] - origin[[iu, iv]]) / voxel_size
+    ixs, iys, _ = calc_boxes.get_tris_crossings(ptris)
+    pixels = np.unique(np.column_stack((ixs, iys)), axis=0)  # rm overlaps
+    if not len(pixels):
+        raise BFException(ob, "No voxel/pixel created!")
+    # Merge pixels as boxes one voxel thick along the flat axis
+    boxes = np.zeros((len(pixels), 6), dtype=np.int32)
+    boxes[:, 2 * iu], boxes[:, 2 * iu + 1] = pixels[:, 0], pixels[:, 0] + 1
+    boxes[:, 2 * iv], boxes[:, 2 * iv + 1] = pixels[:, 1], pixels[:, 1] + 1
+    boxes[:, 2 * flat_axis + 1] = 1
+    grow_boxes = (
+        calc_boxes.grow_boxes_along_x,
+        calc_boxes.grow_boxes_along_y,
+        calc_boxes.grow_boxes_along_z,
+    )
+    grows = ((grow_boxes[iu], 2 * iv), (grow_boxes[iv], 2 * iu))
+    merge = context.scene.bf_config_voxel_merge
+    boxes = calc_boxes.get_merged_boxes(boxes, merge, grows)
+    # Transform boxes to xbs and flatten them
+    xbs = _get_box_xbs(boxes, origin, voxel_size, scale_length)
+    choice = (_x_flatten_xbs, _y_flatten_xbs, _z_flatten_xbs)[flat_axis]
+    return choice(xbs, flat_origin)
+
+
+def _get_remesh_pixels(context, ob, voxel_size, scale_length) -> "xbs":
+    """Get pixels from flat object by solidifying and voxelizing it."""
     flat_axis = _get_flat_axis(ob, voxel_size)
     # Work on a full ob copy in world coordinates
     ob_copy = ob.copy()
@@ -458,13 +588,12 @@ def get_pixels(context, ob, scale_length):
     # Add solidify modifier
     _add_solidify_mod(context, ob_copy, voxel_size)
     # Voxelize (Already corrected for unit_settings)
-    xbs, voxel_size = get_voxels(context, ob_copy, scale_length)
+    xbs, _, _ = get_voxels(context, ob_copy, scale_length)
     # Clean up
     bpy.data.meshes.remove(ob_copy.data, do_unlink=True)
     # Flatten the solidified object
     choice = (_x_flatten_xbs, _y_flatten_xbs, _z_flatten_xbs)[flat_axis]
-    xbs = choice(xbs, flat_origin)
-    return xbs, voxel_size
+    return choice(xbs, flat_origin)
 
 
 def _add_solidify_mod(context, ob, voxel_size) -> "modifier":
@@ -489,14 +618,20 @@ def _get_flat_axis(ob, voxel_size):
 
 def _x_flatten_xbs(xbs, flat_origin) -> "[(l0, l0, y0, y1, z0, z1), ...]":
     """Flatten voxels to obtain pixels (normal to x axis) at flat_origin height."""
-    return [[flat_origin[0], flat_origin[0], xb[2], xb[3], xb[4], xb[5]] for xb in xbs]
+    xbs = xbs.copy()
+    xbs[:, 0:2] = flat_origin[0]
+    return xbs
 
 
 def _y_flatten_xbs(xbs, flat_origin) -> "[(x0, x1, l0, l0, z0, z1), ...]":
     """Flatten voxels to obtain pixels (normal to y axis) at flat_origin height."""
-    return [[xb[0], xb[1], flat_origin[1], flat_origin[1], xb[4], xb[5]] for xb in xbs]
+    xbs = xbs.copy()
+    xbs[:, 2:4] = flat_origin[1]
+    return xbs
 
 
 def _z_flatten_xbs(xbs, flat_origin) -> "[(x0, x1, y0, y1, l0, l0), ...]":
     """Flatten voxels to obtain pixels (normal to z axis) at flat_origin height."""
-    return [[xb[0], xb[1], xb[2], xb[3], flat_origin[2], flat_origin[2]] for xb in xbs]
+    xbs = xbs.copy()
+    xbs[:, 4:6] = flat_origin[2]
+    return xbs
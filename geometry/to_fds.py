@@ -1,16 +1,149 @@
 """BlenderFDS, translate Blender object geometry to FDS notation."""
 
-import bpy
+import os, tempfile, bpy
+import numpy as np
 from time import time
+from functools import wraps
 from . import utils
 from . import calc_voxels
+from . import calc_boxes
 from . import calc_trisurfaces
+from . import calc_terrain
+from .bulk_format import format_rows, format_pbs
 from ..types import BFException
+from ..utils import LRUCache, pool_map, get_pool_workers, get_file_mode
+from ..utils import replace_staged_files, remove_staged_files
+from .. import config, profiling
+
+# Geometry cache
+# Results are stored by Object name and kind of geometry, and are valid
+# while the fingerprint of the evaluated Object geometry, its transform,
+# and the relevant settings is unchanged.
+# Entries are dropped by the depsgraph handler when the Object changes.
+# Entries prepared in advance by prepare_obs do not call on_hit on their
+# first hit, as they are already counted.
+# Calls are profiled by Object, with the count of exported elements.
+
+_cache = LRUCache(maxsize=4096)
+_prepared = set()
+
+
+def _cached(kind, get_settings, on_hit=None, count=lambda results: len(results[0])):
+    """Decorate a geometry function, caching its results."""
+
+    def decorator(fn):
+        def get_fingerprint(context, ob, scale_length, *args, **kwargs):
+            settings = (scale_length, args, sorted(kwargs.items()))
+            settings += get_settings(context, ob)
+            return (ob.name, kind), utils.get_object_fingerprint(context, ob, settings)
+
+        @wraps(fn)
+        def wrapper(context, ob, scale_length, *args, **kwargs):
+            with profiling.stage(fn.__name__, ob.name):
+                key, fingerprint = get_fingerprint(
+                    context, ob, scale_length, *args, **kwargs
+                )
+                entry = _cache.get(key)
+                if entry and entry[0] == fingerprint:
+                    print(f"BFDS: {fn.__name__}: cached:", ob.name)
+                    if on_hit and key not in _prepared:
+                        on_hit(context, ob, scale_length, *args, **kwargs)
+                    _prepared.discard(key)
+                    profiling.add_count(count(entry[1]))
+                    *result, msg = entry[1]
+                    return (*_copy_results(result), msg and f"{msg} (cached)")
+                results = fn(context, ob, scale_length, *args, **kwargs)
+                _cache[key] = fingerprint, results
+                profiling.add_count(count(results))
+                return _copy_results(results)
+
+        wrapper.get_fingerprint = get_fingerprint
+        return wrapper
+
+    return decorator
+
+
+def _copy_results(results):
+    """Copy results, as cached lists and arrays could be modified by the caller."""
+    return tuple(r.copy() if isinstance(r, (list, np.ndarray)) else r for r in results)
+
+
+def invalidate_cache(ob=None):
+    """Drop cached geometry of ob, or of all Objects."""
+    if ob is None:
+        _cache.clear()
+        _prepared.clear()
+        return
+    for key in tuple(_cache):
+        if key[0] == ob.name:
+            del _cache[key]
+            _prepared.discard(key)
+
+
+def _get_xb_settings(context, ob) -> "settings":
+    """Get settings affecting the xbs of ob."""
+    sc = context.scene
+    settings = (
+        ob.bf_xb,
+        ob.bf_xb_custom_voxel,
+        ob.bf_xb_voxel_size,
+        ob.bf_xb_center_voxels,
+        ob.bf_xb_mesh_voxels,
+        sc.bf_default_voxel_size,
+        sc.bf_config_voxelizer,
+        sc.bf_config_voxel_merge,
+    )
+    if ob.bf_xb == "VOXELS" and ob.bf_xb_mesh_voxels:
+        settings += get_mesh_grids_settings(context)
+    return settings
+
+
+def get_mesh_grids_settings(context) -> "settings":
+    """Get settings of the exported MESH grids."""
+    return tuple(
+        (
+            mesh_ob.name,
+            tuple(mesh_ob.bf_mesh_ijk),
+            tuple(tuple(v) for v in mesh_ob.bound_box),
+            tuple(tuple(v) for v in mesh_ob.matrix_world),
+        )
+        for mesh_ob in context.scene.objects
+        if mesh_ob.bf_namelist_cls == "ON_MESH" and mesh_ob.bf_export
+    )
+
+
+def _get_geom_settings(context, ob) -> "settings":
+    """Get settings affecting the GEOM of ob."""
+    sc = context.scene
+    settings = (
+        ob.bf_geom_weld_verts,
+        ob.bf_geom_lod,
+        ob.bf_geom_lod_faces,
+        ob.bf_geom_lod_error,
+        sc.bf_default_voxel_size,
+        sc.bf_config_min_edge_length,
+        sc.bf_config_min_face_area,
+    ) + tuple(ms.material and ms.material.name for ms in ob.material_slots)
+    if ob.bf_geom_lod:  # error relative to MESH cell size
+        settings += get_mesh_grids_settings(context)
+    return settings
 
 
 # to GEOM
 
 
+def _on_geom_hit(context, ob, scale_length, check=True):
+    """Count a cached GEOM as skipped by the quality check."""
+    if check:
+        calc_trisurfaces.quality_stats["skipped"] += 1
+
+
+def _count_faces(results) -> "count":
+    """Count the faces of GEOM results."""
+    return len(results[2]) // 4
+
+
+@_cached("GEOM", _get_geom_settings, on_hit=_on_geom_hit, count=_count_faces)
 def ob_to_geom(
     context, ob, scale_length, check=True
 ) -> "mas, fds_verts, fds_faces, 'Msg'":
@@ -27,6 +160,154 @@ def ob_to_geom(
     return mas, fds_verts, fds_faces, msg
 
 
+@_cached(
+    "GEOM_STR",
+    _get_geom_settings,
+    on_hit=_on_geom_hit,
+    count=lambda results: results[2] and results[2].count("\n") + 1,
+)
+def ob_to_geom_strs(
+    context, ob, scale_length, check=True
+) -> "mas, verts_str, faces_str, 'Msg'":
+    """Transform Object geometry to FDS mas, and formatted VERTS and FACES."""
+    mas, fds_verts, fds_faces, msg = ob_to_geom(context, ob, scale_length, check)
+    verts_str, faces_str = geom_to_strs(fds_verts, fds_faces)
+    return mas, verts_str, faces_str, msg
+
+
+def geom_to_strs(fds_verts, fds_faces) -> "verts_str, faces_str":
+    """Format FDS verts and faces, one vertex or face for each line."""
+    # Group by 3 and 4
+    verts = np.array(fds_verts, dtype=np.float64).reshape(-1, 3)
+    faces = np.array(fds_faces, dtype=np.int64).reshape(-1, 4)
+    # Prepare
+    separator = "\n            "
+    verts_str = separator.join(
+        format_rows("{0[0]:+.6f}, {0[1]:+.6f}, {0[2]:+.6f},", verts)
+    )
+    faces_str = separator.join(format_rows("{0[0]},{0[1]},{0[2]}, {0[3]},", faces))
+    return verts_str, faces_str
+
+
+# to GEOM terrain
+
+
+def _get_terrain_settings(context, ob) -> "settings":
+    """Get settings affecting the terrain GEOM of ob."""
+    return (
+        ob.bf_geom_terrain_cell_size,
+        context.scene.bf_config_min_edge_length,
+    ) + tuple(ms.material and ms.material.name for ms in ob.material_slots)
+
+
+@_cached(
+    "TERRAIN",
+    _get_terrain_settings,
+    count=lambda results: results[1][0] * results[1][1],
+)
+def ob_to_terrain(
+    context, ob, scale_length, check=True
+) -> "mas, ijk, xb, zvals, 'Msg'":
+    """Transform Object top surface to FDS terrain GEOM, sampled on a regular grid."""
+    t0 = time()
+    mas = calc_trisurfaces._get_materials(context, ob)
+    if len(mas) > 1:  # ZVALS have a single SURF_ID
+        raise BFException(
+            ob, "Terrain GEOM supports a single SURF, remove the other Materials"
+        )
+    co, ivs = utils.get_object_verts_tris(context, ob, world=True)
+    try:
+        ijk, xb, zvals, is_grid = calc_terrain.get_heightfield(
+            co,
+            ivs,
+            ob.bf_geom_terrain_cell_size,
+            context.scene.bf_config_min_edge_length,
+            check,
+        )
+    except calc_terrain.TerrainError as err:
+        raise BFException(ob, str(err))
+    xb = tuple(c * scale_length for c in xb)
+    zvals = zvals * scale_length
+    dt = time() - t0
+    source = is_grid and "grid-like mesh" or "sampled mesh"
+    msg = f"GEOM: terrain {ijk[0]}x{ijk[1]} points from {source}, in {dt:.3f} s"
+    return mas, ijk, xb, zvals, msg
+
+
+# to GEOM binary file
+# Binary files are written in the directory of the exported FDS case file,
+# set by the exporter. When unset, binary files are referenced but not written.
+# Binary files are first written to tmp files, that replace the final files
+# together with the FDS case file tmp file, only when all of them are written,
+# so a failed export leaves the previous case untouched.
+
+export_dir = None
+_pending_bingeoms = dict()  # {filepath: tmp_filepath}
+
+
+def ob_to_bingeom(context, ob, fds_verts, fds_faces, n_surf_id) -> "filename, 'Msg'":
+    """Write FDS verts and faces of Object to a GEOM binary file."""
+    filename = "{}_{}.bingeom".format(
+        bpy.path.clean_name(context.scene.name), bpy.path.clean_name(ob.name)
+    )
+    if export_dir is None:
+        return filename, f"GEOM binary file <{filename}> not written"
+    t0 = time()
+    filepath = os.path.join(export_dir, filename)
+    tmp_filepath = None
+    try:
+        fd, tmp_filepath = tempfile.mkstemp(
+            prefix=".bf_", suffix=".tmp", dir=export_dir
+        )
+        os.close(fd)
+        os.chmod(tmp_filepath, get_file_mode(filepath))
+        write_bingeom(tmp_filepath, fds_verts, fds_faces, n_surf_id)
+    except IOError:
+        if tmp_filepath:
+            os.remove(tmp_filepath)
+        raise BFException(ob, f"GEOM binary file <{filename}> not writable")
+    old_tmp_filepath = _pending_bingeoms.pop(filepath, None)
+    if old_tmp_filepath:  # same Object exported twice
+        os.remove(old_tmp_filepath)
+    _pending_bingeoms[filepath] = tmp_filepath
+    dt = time() - t0
+    return filename, f"GEOM binary file <{filename}> written in {dt:.3f} s"
+
+
+def end_bingeoms(filepath=None, tmp_filepath=None) -> "bool":
+    """Replace the pending GEOM binary files, then the FDS file filepath, with their tmp files.
+
+    If tmp_filepath is unset, the FDS file was not written: remove them all.
+    """
+    staged = dict(_pending_bingeoms)
+    _pending_bingeoms.clear()
+    if not tmp_filepath:
+        remove_staged_files(staged)
+        return False
+    staged[filepath] = tmp_filepath  # last, as it references the others
+    return replace_staged_files(staged)
+
+
+def write_bingeom(filepath, fds_verts, fds_faces, n_surf_id):
+    """Write FDS verts and faces to filepath, as Fortran unformatted records."""
+    verts = np.asarray(fds_verts, dtype=np.float64)
+    faces = np.asarray(fds_faces, dtype=np.int32).reshape(-1, 4)
+    records = (
+        np.array((1,), dtype=np.int32),
+        np.array((len(verts) // 3, len(faces), n_surf_id, 0), dtype=np.int32),
+        verts,
+        np.ascontiguousarray(faces[:, :3]),  # FACES
+        np.ascontiguousarray(faces[:, 3]),  # SURFS
+        np.empty(0, dtype=np.int32),  # VOLUS
+    )
+    with open(filepath, "wb") as f:
+        for record in records:
+            marker = np.array((record.nbytes,), dtype=np.int32).tobytes()
+            f.write(marker)
+            f.write(record.tobytes())
+            f.write(marker)
+
+
 # to XB
 
 
@@ -35,9 +316,36 @@ def _ob_to_xbs_voxels(
 ) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Msg'":
     """Transform Object solid geometry to xbs notation (voxelization)."""
     t0 = time()
-    xbs, voxel_size = calc_voxels.get_voxels(context, ob, scale_length)
+    if ob.bf_xb_mesh_voxels:
+        get_voxels = calc_voxels.get_mesh_voxels
+    else:
+        get_voxels = calc_voxels.get_voxels
+    xbs, voxel_size, voxel_count = get_voxels(context, ob, scale_length)
+    return xbs, _get_voxels_msg(xbs, voxel_size, voxel_count, time() - t0)
+
+
+def _get_voxels_msg(xbs, voxel_size, voxel_count, dt) -> "msg":
+    reduction = 1.0 - len(xbs) / voxel_count
+    return (
+        f"XB: {len(xbs)} boxes from {voxel_count} voxels ({reduction:.1%} reduction), "
+        f"resolution {voxel_size:.3f} m, in {dt:.3f} s"
+    )
+
+
+def obs_to_xbs_fused(
+    context, obs, scale_length
+) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Msg'":
+    """Transform the union of Objects solid geometry to xbs notation (voxelization)."""
+    t0 = time()
+    xbs, voxel_size, voxel_count = calc_voxels.get_fused_voxels(
+        context, obs, scale_length
+    )
     dt = time() - t0
-    msg = f"XB: {len(xbs)} voxels, resolution {voxel_size:.3f} m, in {dt:.3f} s"
+    reduction = 1.0 - len(xbs) / voxel_count
+    msg = (
+        f"XB: {len(xbs)} boxes from {voxel_count} fused voxels ({reduction:.1%} reduction), "
+        f"resolution {voxel_size:.3f} m, in {dt:.3f} s"
+    )
     return xbs, msg
 
 
@@ -130,6 +438,7 @@ _choice_to_xbs = {
 }
 
 
+@_cached("XB", _get_xb_settings)
 def ob_to_xbs(context, ob, scale_length) -> "((x0,x1,y0,y1,z0,z1,), ...), 'Msg'":
     """Transform Object geometry according to ob.bf_xb to FDS notation."""
     print("BFDS: ob_to_xbs:", ob.name)
@@ -172,6 +481,7 @@ def _ob_to_xyzs_center(context, ob, scale_length) -> "((x0,y0,z0,), ...), 'Msg'"
 _choice_to_xyzs = {"CENTER": _ob_to_xyzs_center, "VERTICES": _ob_to_xyzs_vertices}
 
 
+@_cached("XYZ", lambda context, ob: (ob.bf_xyz,))
 def ob_to_xyzs(context, ob, scale_length) -> "((x0,y0,z0,), ...), 'Msg'":
     """Transform Object geometry according to ob.bf_xyz to xyzs notation."""
     print("BFDS: ob_to_xyzs:", ob.name)
@@ -207,7 +517,136 @@ def _ob_to_pbs_planes(
     return pbs, msg
 
 
+@_cached("PB", lambda context, ob: ())
 def ob_to_pbs(context, ob, scale_length) -> "((0,x3,), (1,x7,), (1,y9,), ...), 'Msg'":
     """Transform Object geometry according to ob.bf_pb to pbs notation."""
     print("BFDS: ob_to_pbs:", ob.name)
     return _ob_to_pbs_planes(context, ob, scale_length)  # recalc
+
+
+# Export, in parallel
+# Before exporting, the Objects are snapshot on the main thread: the GEOM
+# triangulated surfaces and the chunks of the native voxelizations are
+# extracted from bpy. Then all jobs are run in a single process pool, and
+# their results are joined back in export order, filling the geometry cache.
+# The following serial export is all cache hits, and its output unchanged.
+# When the pool is not available, nothing is prepared, and the serial export
+# computes the geometry of each Object.
+
+
+@profiling.profiled("prepare_obs")
+def prepare_obs(context, obs, scale_length):
+    """Prepare the geometry of Objects in parallel, raise the first failing Object."""
+    max_workers = config.get_prefs().bf_pref_workers
+    if get_pool_workers(max_workers) == 1:
+        return
+    t0 = time()
+    todo, items = list(), list()  # (ob, kind, fn, job, item indexes), pool items
+    for ob in obs:
+        for kind, fn, job in _get_ob_jobs(context, ob, scale_length):
+            if kind == "GEOM":
+                payloads = ((job, scale_length, fn is ob_to_geom_strs),)
+            else:
+                payloads = job["chunks"]
+            indexes = range(len(items), len(items) + len(payloads))
+            items.extend((kind, payload) for payload in payloads)
+            todo.append((ob, kind, fn, job, indexes))
+    if not todo:
+        return
+    results = pool_map(_calc_item, items, max_workers=max_workers)
+    profiling.add_count(len(items))
+    # Join results in export order, raise the first failure
+    for ob, kind, fn, job, indexes in todo:
+        ob_results = list(results[i] for i in indexes)
+        if kind == "GEOM":
+            _set_geom_results(context, ob, scale_length, fn, job, ob_results[0])
+        else:
+            _set_voxels_results(context, ob, scale_length, job, ob_results)
+    print(
+        f"BFDS: prepare_obs: {len(todo)} geometries of {len(obs)} Objects, "
+        f"{len(items)} jobs in {time() - t0:.3f} s"
+    )
+
+
+def _get_ob_jobs(context, ob, scale_length) -> "kind, fn, job":
+    """Get the jobs of the uncached geometry of Object."""
+    if ob.bf_namelist_cls == "ON_GEOM" and not ob.bf_geom_is_terrain:
+        check = ob.bf_geom_check_quality
+        fn = ob.bf_geom_binary_file and ob_to_geom or ob_to_geom_strs
+        if not _is_cached(fn, context, ob, scale_length, check):
+            calc_trisurfaces._get_materials(context, ob)  # check SURFs first
+            yield "GEOM", fn, calc_trisurfaces.get_trisurface_job(context, ob, check)
+    elif (
+        ob.bf_xb_export
+        and ob.bf_xb == "VOXELS"
+        and not ob.bf_xb_mesh_voxels
+        and context.scene.bf_config_voxelizer == "NATIVE"
+    ):
+        if not _is_cached(ob_to_xbs, context, ob, scale_length):
+            yield "XB", ob_to_xbs, calc_voxels.get_voxels_job(context, ob)
+
+
+def _is_cached(fn, context, ob, scale_length, *args) -> "bool":
+    """Check if the cached results of fn are valid, counted when hit."""
+    key, fingerprint = fn.get_fingerprint(context, ob, scale_length, *args)
+    entry = _cache.get(key)
+    return bool(entry and entry[0] == fingerprint)
+
+
+def _set_cache(fn, context, ob, scale_length, args, results):
+    """Store the prepared results of fn."""
+    key, fingerprint = fn.get_fingerprint(context, ob, scale_length, *args)
+    _cache[key] = fingerprint, results
+    _prepared.add(key)
+
+
+def _calc_item(item) -> "result":
+    """Calculate a job item in any process."""
+    kind, payload = item
+    if kind == "GEOM":
+        return _calc_geom_job(payload)
+    t0 = time()
+    try:
+        boxes, voxel_count = calc_boxes.get_chunk_boxes(payload)
+    except calc_boxes.OddCrossingsError as err:
+        return err  # raised on the main thread
+    return boxes, voxel_count, time() - t0
+
+
+def _calc_geom_job(item) -> "result":
+    """Check, decimate and format a triangulated surface job."""
+    t0 = time()
+    job, scale_length, formatted = item
+    topology, report, status, co, tris, mis = calc_trisurfaces.calc_trisurface_job(job)
+    if report and any(len(bad) for bad in report.values()):
+        return topology, report, status, list(), list(), None, time() - t0
+    fds_verts = (co * scale_length).ravel().tolist()
+    fds_faces = np.column_stack((tris + 1, mis + 1)).ravel().tolist()
+    strs = formatted and geom_to_strs(fds_verts, fds_faces) or None
+    return topology, report, status, fds_verts, fds_faces, strs, time() - t0
+
+
+def _set_geom_results(context, ob, scale_length, fn, job, result):
+    """Store the verdict and the results of a GEOM job, or raise its failure."""
+    topology, report, status, fds_verts, fds_faces, strs, dt = result
+    calc_trisurfaces.set_trisurface_verdict(job, topology, report, status)
+    check = job["check"]
+    if check:
+        calc_trisurfaces.raise_quality_report(context, ob, report, protect=True)
+    mas = calc_trisurfaces._get_materials(context, ob)
+    msg = f"GEOM: {len(fds_verts)} vertices, {len(fds_faces)} faces, in {dt:.3f} s"
+    args = (check,)
+    results = mas, fds_verts, fds_faces, msg
+    _set_cache(ob_to_geom, context, ob, scale_length, args, results)
+    if strs:
+        _set_cache(fn, context, ob, scale_length, args, (mas, *strs, msg))
+
+
+def _set_voxels_results(context, ob, scale_length, job, results):
+    """Store the xbs from the results of a voxelization job, or raise its failure."""
+    xbs, voxel_size, voxel_count = calc_voxels.get_voxels_from_job(
+        ob, job, results, scale_length
+    )
+    dt = sum(r[2] for r in results)  # in workers
+    msg = _get_voxels_msg(xbs, voxel_size, voxel_count, dt)
+    _set_cache(ob_to_xbs, context, ob, scale_length, (), (xbs, msg))
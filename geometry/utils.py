@@ -1,6 +1,8 @@
 """BlenderFDS, geometric utilities."""
 
 import bpy, bmesh
+import numpy as np
+from hashlib import blake2b
 
 from ..types import BFException
 
@@ -19,6 +21,109 @@ def get_object_bmesh(context, ob, world=False) -> "BMesh":
     return bm
 
 
+# Object fingerprints
+# While exporting, Objects are not modified, so the hash of the evaluated
+# geometry and transform of each Object is computed once, and reused by the
+# text, geometry and tree caches, each adding its own settings.
+
+_digests = None  # {ob.name: digest}, while exporting
+
+
+def set_fingerprint_memo(enabled):
+    """Start or stop reusing the geometry hashes of Objects, eg. during an export."""
+    global _digests
+    _digests = dict() if enabled else None
+
+
+def get_object_fingerprint(context, ob, settings=()) -> "fingerprint":
+    """Return a hash of evaluated object geometry, transform, and settings."""
+    if _digests is None:
+        digest = _get_geometry_digest(context, ob)
+    elif ob.name in _digests:
+        digest = _digests[ob.name]
+    else:
+        digest = _digests[ob.name] = _get_geometry_digest(context, ob)
+    h = blake2b(digest_size=16)
+    h.update(repr(settings).encode())
+    h.update(digest)
+    return h.hexdigest()
+
+
+def _get_geometry_digest(context, ob) -> "digest":
+    """Return a hash of evaluated object geometry and transform."""
+    h = blake2b(digest_size=16)
+    h.update(np.array(ob.matrix_world, dtype=np.float64).tobytes())
+    if ob.type not in {"MESH", "CURVE", "SURFACE", "FONT", "META"}:
+        return h.digest()
+    bpy.ops.object.mode_set(mode="OBJECT")  # actualize
+    depsgraph = context.evaluated_depsgraph_get()
+    ob_eval = ob.evaluated_get(depsgraph)
+    me = ob_eval.to_mesh()
+    try:
+        co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+        me.vertices.foreach_get("co", co)
+        ivs = np.empty(len(me.loops), dtype=np.int32)
+        me.loops.foreach_get("vertex_index", ivs)
+        totals = np.empty(len(me.polygons), dtype=np.int32)
+        me.polygons.foreach_get("loop_total", totals)
+        mis = np.empty(len(me.polygons), dtype=np.int32)
+        me.polygons.foreach_get("material_index", mis)
+        ivs_edges = np.empty(len(me.edges) * 2, dtype=np.int32)
+        me.edges.foreach_get("vertices", ivs_edges)
+    finally:
+        ob_eval.to_mesh_clear()
+    for a in (co, ivs, totals, mis, ivs_edges):
+        h.update(a.tobytes())
+    return h.digest()
+
+
+def get_object_tris(context, ob, world=True) -> "tris":
+    """Return evaluated object triangles as an (N,3,3) array of vertex coordinates."""
+    co, ivs = get_object_verts_tris(context, ob, world)
+    return co[ivs]
+
+
+def get_object_verts_tris(context, ob, world=True) -> "co, ivs":
+    """Return evaluated object vertex coordinates and (N,3) triangle vertex indexes."""
+    bpy.ops.object.mode_set(mode="OBJECT")  # actualize
+    depsgraph = context.evaluated_depsgraph_get()
+    ob_eval = ob.evaluated_get(depsgraph)
+    me = ob_eval.to_mesh()  # no new Object, no modifier added
+    try:
+        me.calc_loop_triangles()
+        co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+        me.vertices.foreach_get("co", co)
+        ivs = np.empty(len(me.loop_triangles) * 3, dtype=np.int32)
+        me.loop_triangles.foreach_get("vertices", ivs)
+    finally:
+        ob_eval.to_mesh_clear()
+    co = co.reshape(-1, 3).astype(np.float64)
+    if world:
+        m = np.array(ob.matrix_world, dtype=np.float64)
+        co = co @ m[:3, :3].T + m[:3, 3]  # world coo
+    return co, ivs.reshape(-1, 3)
+
+
+def get_mesh_tris(me) -> "co, ivs, mis":
+    """Return mesh vertex coordinates, (N,3) triangle vertex and material indexes."""
+    me.calc_loop_triangles()
+    co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+    me.vertices.foreach_get("co", co)
+    ivs = np.empty(len(me.loop_triangles) * 3, dtype=np.int32)
+    me.loop_triangles.foreach_get("vertices", ivs)
+    mis = np.empty(len(me.loop_triangles), dtype=np.int32)
+    me.loop_triangles.foreach_get("material_index", mis)
+    return co.reshape(-1, 3).astype(np.float64), ivs.reshape(-1, 3), mis
+
+
+def set_mesh_tris(me, co, ivs, mis):
+    """Replace mesh geometry with vertex coordinates, triangles and material indexes."""
+    me.clear_geometry()
+    me.from_pydata(co.tolist(), list(), ivs.tolist())
+    me.polygons.foreach_set("material_index", np.asarray(mis, dtype=np.int32))
+    me.update()
+
+
 def get_tmp_object(context, ob, name="tmp", me_tmp=None):
     """Get a new tmp Object from ob."""
     # Create new tmp Object
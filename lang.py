@@ -37,10 +37,12 @@ from bpy.props import (
     EnumProperty,
     CollectionProperty,
 )
+from hashlib import blake2b
 from . import geometry
 from .types import BFException, Parameter, Namelist, PString, PFYI, POthers
+from .utils import LRUCache
 from .config import separator, comment, default_mas
-from . import gis
+from . import gis, profiling
 
 log = logging.getLogger(__name__)
 
@@ -192,6 +194,114 @@ class SP_config_default_voxel_size(Parameter):
     bpy_other = {"unit": "LENGTH", "step": 1.0, "precision": 3}
 
 
+@subscribe
+class SP_config_voxelizer(Parameter):
+    label = "Voxelizer"
+    description = "Voxelization algorithm"
+    bpy_type = Scene
+    bpy_idname = "bf_config_voxelizer"
+    bpy_prop = EnumProperty
+    bpy_default = "NATIVE"
+    bpy_other = {
+        "items": (
+            (
+                "NATIVE",
+                "Native",
+                "Rasterize Object triangles onto the voxel grid by raytracing",
+            ),
+            (
+                "REMESH",
+                "Remesh",
+                "Voxelize by Blender remesh modifier, limited octree depth",
+            ),
+        )
+    }
+
+
+@subscribe
+class SP_config_voxel_merge(Parameter):
+    label = "Voxel Merging"
+    description = "Strategy for merging voxels into boxes, less boxes are faster in FDS"
+    bpy_type = Scene
+    bpy_idname = "bf_config_voxel_merge"
+    bpy_prop = EnumProperty
+    bpy_default = "GREEDY"
+    bpy_other = {
+        "items": (
+            ("AXIS", "Axis", "Merge voxels by two greedy passes along axis"),
+            ("GREEDY", "Greedy", "Merge voxels by maximal 3D greedy box growth"),
+            (
+                "SLABS",
+                "Slabs",
+                "Merge voxels by rectangle decomposition of each slab, then stack",
+            ),
+        )
+    }
+
+
+@subscribe
+class SP_config_voxel_fuse(Parameter):
+    label = "Fuse Voxels"
+    description = (
+        "Voxelize together the Objects sharing namelist, voxel size, SURF_ID\n"
+        "and other parameters, when aligned to world origin"
+    )
+    bpy_type = Scene
+    bpy_idname = "bf_config_voxel_fuse"
+    bpy_prop = BoolProperty
+    bpy_default = False
+
+
+@subscribe
+class SP_config_export_profile(Parameter):
+    label = "Export Profile"
+    description = "Profile the export by namelist, Object and geometry stage"
+    bpy_type = Scene
+    bpy_idname = "bf_config_export_profile"
+    bpy_prop = EnumProperty
+    bpy_default = "NONE"
+    bpy_other = {
+        "items": (
+            ("NONE", "None", "Do not profile the export"),
+            ("REPORT", "Report", "Print the profile summary, report the slowest"),
+            ("JSON", "JSON", "Also write the profile to a JSON file next to the FDS"),
+            ("CSV", "CSV", "Also write the profile to a CSV file next to the FDS"),
+        )
+    }
+
+
+@subscribe
+class SP_config_export_profile_sort(Parameter):
+    label = "Sort Profile By"
+    description = "Sort the export profile summary by this field"
+    bpy_type = Scene
+    bpy_idname = "bf_config_export_profile_sort"
+    bpy_prop = EnumProperty
+    bpy_default = "time"
+    bpy_other = {
+        "items": (
+            ("time", "Time", "Sort by wall time"),
+            ("calls", "Calls", "Sort by call count"),
+            ("count", "Count", "Sort by exported element count"),
+            ("peak", "Peak", "Sort by peak allocated memory"),
+            ("stage", "Stage", "Sort by stage name"),
+            ("element", "Element", "Sort by element name"),
+        )
+    }
+
+
+@subscribe
+class SP_config_export_profile_memory(Parameter):
+    label = "Trace Memory"
+    description = (
+        "Trace the peak memory allocated by Python in each profiled stage,\n"
+        "slowing down the export"
+    )
+    bpy_type = Scene
+    bpy_idname = "bf_config_export_profile_memory"
+    bpy_prop = BoolProperty
+    bpy_default = False
+
 
 @subscribe
 class SP_crs(Parameter):
@@ -356,6 +466,14 @@ class SN_config(Namelist):
         col.prop(sc, "bf_config_min_edge_length")
         col.prop(sc, "bf_config_min_face_area")
         col.prop(sc, "bf_default_voxel_size")
+        col.prop(sc, "bf_config_voxelizer")
+        col.prop(sc, "bf_config_voxel_merge")
+        col.prop(sc, "bf_config_voxel_fuse")
+        col.prop(sc, "bf_config_export_profile")
+        sub = col.column()
+        sub.active = sc.bf_config_export_profile != "NONE"
+        sub.prop(sc, "bf_config_export_profile_sort")
+        sub.prop(sc, "bf_config_export_profile_memory")
 
         col.separator()
         unit = sc.unit_settings
@@ -1167,6 +1285,17 @@ class OP_XB_center_voxels(Parameter):
     bpy_other = {"update": update_bf_xb}
 
 
+@subscribe
+class OP_XB_mesh_voxels(Parameter):
+    label = "Voxels on MESH Cells"
+    description = "Voxelize on the cells of the overlapping MESHes"
+    bpy_type = Object
+    bpy_idname = "bf_xb_mesh_voxels"
+    bpy_prop = BoolProperty
+    bpy_default = False
+    bpy_other = {"update": update_bf_xb}
+
+
 def update_bf_xb_items(ob, context):
     return tuple(
         (
@@ -1205,6 +1334,10 @@ class OP_XB(Parameter):
     def draw(self, context, layout):
         super().draw(context, layout)
         ob = self.element
+        if ob.bf_xb_export and ob.bf_xb == "VOXELS":
+            OP_XB_mesh_voxels(ob).draw(context, layout)
+            if ob.bf_xb_mesh_voxels:
+                return
         if ob.bf_xb_export and ob.bf_xb in ("VOXELS", "PIXELS"):
             OP_XB_center_voxels(ob).draw(context, layout)
             OP_XB_voxel_size(ob).draw(context, layout)
@@ -1227,7 +1360,7 @@ class OP_XB(Parameter):
             return
         scale_length = context.scene.unit_settings.scale_length
         xbs, msg = geometry.to_fds.ob_to_xbs(context, ob, scale_length)
-        if not xbs:
+        if not len(xbs):
             return None, msg
         elif len(xbs) == 1:
             return self._format_xb.format(xbs[0]), msg
@@ -1237,7 +1370,7 @@ class OP_XB(Parameter):
                 self.element.bf_id_suffix
             ]  # choose formatting string
             return (
-                (format_xbs.format(xb, name, i, separator) for i, xb in enumerate(xbs)),
+                geometry.to_fds.format_rows(format_xbs, xbs, name, separator),
                 msg,
             )
 
@@ -1311,10 +1444,7 @@ class OP_XYZ(Parameter):
                 self.element.bf_id_suffix
             ]  # choose formatting string
             return (
-                (
-                    format_xyzs.format(xyz, name, i, separator)
-                    for i, xyz in enumerate(xyzs)
-                ),
+                geometry.to_fds.format_rows(format_xyzs, xyzs, name, separator),
                 msg,
             )
 
@@ -1387,10 +1517,7 @@ class OP_PB(Parameter):
             else:
                 format_pbs = self._format_pbs["IDXYZ"]
             return (
-                (
-                    format_pbs[pb[0]].format(pb[1], name, i, separator)
-                    for i, pb in enumerate(pbs)
-                ),
+                geometry.to_fds.format_pbs(format_pbs, pbs, name, separator),
                 msg,
             )
             # TODO: improve bf_id_suffix choices should change when PB is selected, as for XB!
@@ -1538,6 +1665,68 @@ class OP_GEOM_check_quality(Parameter):
     bpy_default = True
 
 
+@subscribe
+class OP_GEOM_weld_verts(Parameter):
+    label = "Weld Duplicate Vertices"
+    description = "Weld vertices closer than min edge length while exporting"
+    bpy_type = Object
+    bpy_idname = "bf_geom_weld_verts"
+    bpy_prop = BoolProperty
+    bpy_default = False
+
+
+@subscribe
+class OP_GEOM_lod(Parameter):
+    label = "Decimate While Exporting"
+    description = "Reduce the number of faces while exporting"
+    bpy_type = Object
+    bpy_idname = "bf_geom_lod"
+    bpy_prop = BoolProperty
+    bpy_default = False
+
+
+@subscribe
+class OP_GEOM_lod_faces(Parameter):
+    label = "Target Faces"
+    description = "Target number of faces of decimated geometry, 0 for no target"
+    bpy_type = Object
+    bpy_idname = "bf_geom_lod_faces"
+    bpy_prop = IntProperty
+    bpy_default = 0
+    bpy_other = {"min": 0}
+
+    @property
+    def exported(self):
+        ob = self.element
+        return ob.bf_geom_lod
+
+
+@subscribe
+class OP_GEOM_lod_error(Parameter):
+    label = "Max Error"
+    description = "Max geometric error of decimated geometry, relative to the finest overlapping MESH cell size, 0 for no limit"
+    bpy_type = Object
+    bpy_idname = "bf_geom_lod_error"
+    bpy_prop = FloatProperty
+    bpy_default = 0.5
+    bpy_other = {"step": 10.0, "precision": 2, "min": 0.0}
+
+    @property
+    def exported(self):
+        ob = self.element
+        return ob.bf_geom_lod
+
+
+@subscribe
+class OP_GEOM_binary_file(Parameter):
+    label = "Export To Binary File"
+    description = "Export verts and faces to a binary file, referenced by BINARY_FILE"
+    bpy_type = Object
+    bpy_idname = "bf_geom_binary_file"
+    bpy_prop = BoolProperty
+    bpy_default = False
+
+
 @subscribe
 class OP_GEOM_protect(Parameter):
     label = "Protect Original"
@@ -1559,27 +1748,38 @@ class OP_GEOM(Parameter):
 
     def to_fds(self, context):
         # Check is performed while exporting
-        # Get surf_idv, verts and faces
+        if self.element.bf_geom_is_terrain:
+            return self._terrain_to_fds(context)
         scale_length = context.scene.unit_settings.scale_length
         check = self.element.bf_geom_check_quality
-        fds_surfids, fds_verts, fds_faces, msg = geometry.to_fds.ob_to_geom(
+        separator1 = "\n      "
+        # Binary file
+        if self.element.bf_geom_binary_file:
+            fds_surfids, fds_verts, fds_faces, msg = geometry.to_fds.ob_to_geom(
+                context, self.element, scale_length, check
+            )
+            if not fds_faces:
+                return None, msg
+            surfids_str = ",".join(("'{}'".format(s) for s in fds_surfids))
+            filename, bin_msg = geometry.to_fds.ob_to_bingeom(
+                context, self.element, fds_verts, fds_faces, len(fds_surfids)
+            )
+            return (
+                separator1.join(
+                    (
+                        "SURF_ID={}".format(surfids_str),
+                        "BINARY_FILE='{}'".format(filename),
+                    )
+                ),
+                f"{msg}, {bin_msg}",
+            )
+        # Get surf_id, formatted verts and faces
+        fds_surfids, verts_str, faces_str, msg = geometry.to_fds.ob_to_geom_strs(
             context, self.element, scale_length, check
         )
-        if not fds_faces:
+        if not faces_str:
             return None, msg
-        # Group by 3 and 4
-        verts = [t for t in zip(*[iter(fds_verts)] * 3)]
-        faces = [t for t in zip(*[iter(fds_faces)] * 4)]
-        # Prepare
         surfids_str = ",".join(("'{}'".format(s) for s in fds_surfids))
-        separator1 = "\n      "
-        separator2 = "\n            "
-        verts_str = separator2.join(
-            ("{0[0]:+.6f}, {0[1]:+.6f}, {0[2]:+.6f},".format(v) for v in verts)
-        )
-        faces_str = separator2.join(
-            ("{0[0]},{0[1]},{0[2]}, {0[3]},".format(f) for f in faces)
-        )
         return (
             separator1.join(
                 (
@@ -1591,9 +1791,35 @@ class OP_GEOM(Parameter):
             msg,
         )
 
+    def _terrain_to_fds(self, context):
+        # Get surf_id, grid and z values
+        scale_length = context.scene.unit_settings.scale_length
+        check = self.element.bf_geom_check_quality
+        fds_surfids, ijk, xb, zvals, msg = geometry.to_fds.ob_to_terrain(
+            context, self.element, scale_length, check
+        )
+        # Prepare, one line for each grid row
+        separator1 = "\n      "
+        separator2 = "\n            "
+        format_row = "".join(f"{{0[{i}]:.3f}}," for i in range(ijk[0]))
+        zvals_str = separator2.join(
+            geometry.to_fds.format_rows(format_row, zvals.reshape(ijk[1], ijk[0]))
+        )
+        return (
+            separator1.join(
+                (
+                    "SURF_ID='{}'".format(fds_surfids[0]),
+                    "IJK={0[0]},{0[1]}".format(ijk),
+                    OP_XB._format_xb.format(xb),
+                    "ZVALS={}".format(zvals_str),
+                )
+            ),
+            msg,
+        )
+
 
 @subscribe
-class OP_GEOM_IS_TERRAIN(Parameter):  # FIXME
+class OP_GEOM_IS_TERRAIN(Parameter):
     label = "IS_TERRAIN"
     description = "Set if it represents a terrain"
     fds_label = "IS_TERRAIN"
@@ -1604,7 +1830,7 @@ class OP_GEOM_IS_TERRAIN(Parameter):  # FIXME
 
 
 @subscribe
-class OP_GEOM_EXTEND_TERRAIN(Parameter):  # FIXME
+class OP_GEOM_EXTEND_TERRAIN(Parameter):
     label = "EXTEND_TERRAIN"
     description = "Set if this terrain needs extension to fully cover the domain"
     fds_label = "EXTEND_TERRAIN"
@@ -1619,6 +1845,22 @@ class OP_GEOM_EXTEND_TERRAIN(Parameter):  # FIXME
         return ob.bf_geom_is_terrain
 
 
+@subscribe
+class OP_GEOM_terrain_cell_size(Parameter):
+    label = "Terrain Cell Size"
+    description = "Terrain sampling resolution, when its mesh is not grid-like"
+    bpy_type = Object
+    bpy_idname = "bf_geom_terrain_cell_size"
+    bpy_prop = FloatProperty
+    bpy_default = 1.0
+    bpy_other = {"unit": "LENGTH", "step": 1.0, "precision": 3, "min": 0.001}
+
+    @property
+    def exported(self):
+        ob = self.element
+        return ob.bf_geom_is_terrain
+
+
 @subscribe
 class ON_GEOM(Namelist):
     label = "GEOM"
@@ -1632,8 +1874,14 @@ class ON_GEOM(Namelist):
         OP_ID,
         OP_FYI,
         OP_GEOM_check_quality,
+        OP_GEOM_weld_verts,
+        OP_GEOM_lod,
+        OP_GEOM_lod_faces,
+        OP_GEOM_lod_error,
+        OP_GEOM_binary_file,
         OP_GEOM_IS_TERRAIN,
         OP_GEOM_EXTEND_TERRAIN,
+        OP_GEOM_terrain_cell_size,
         OP_other,
         OP_GEOM,
     )
@@ -1940,6 +2188,131 @@ items.sort(key=lambda k: k[1])
 MP_namelist_cls.bpy_other["items"] = items
 
 
+# Namelist text cache
+# The FDS text of Object, Material and Scene namelists is stored by element
+# and namelist, and is valid while the fingerprint of the element bf_
+# properties, of the Scene settings, and of the Object geometry is unchanged.
+# The geometry is hashed only when exported by the namelist.
+# Entries are dropped by the depsgraph handler when the element changes.
+# GEOM Objects are not cached, as they check quality and write binary files.
+# Timings are stripped from the cached text, as they are not replayed.
+# Texts are profiled by namelist and element, with their line count.
+
+_texts = LRUCache(maxsize=8192)
+_timing = re.compile(r"^(! .*?),? in \d+\.\d+ s$", re.MULTILINE)
+text_stats = {"hits": 0, "misses": 0, "saved": 0.0}
+
+
+def reset_text_stats():
+    """Reset the counters of the namelist text cache."""
+    text_stats.update({"hits": 0, "misses": 0, "saved": 0.0})
+
+
+def get_text_stats_msg() -> "msg":
+    """Get a message with the hit ratio and the time saved by the namelist text cache."""
+    total = text_stats["hits"] + text_stats["misses"]
+    ratio = total and text_stats["hits"] / total
+    return (
+        f"namelist cache: {ratio:.0%} hits ({text_stats['hits']} of {total}), "
+        f"{max(text_stats['saved'], 0.0):.3f} s saved"
+    )
+
+
+def invalidate_texts(element=None):
+    """Drop cached namelist text of element, or of all elements."""
+    if element is None:
+        _texts.clear()
+        return
+    for key in tuple(_texts):
+        if key[:2] == (element.bl_rna.identifier, element.name):
+            del _texts[key]
+
+
+def _get_cached_to_fds(context, element, bf_namelist) -> "str or None":
+    """Get the FDS text of the namelist of element, from cache if unchanged."""
+    if isinstance(element, Object) and element.bf_namelist_cls == "ON_GEOM":
+        return bf_namelist.to_fds(context)
+    t0 = time.time()
+    fingerprint = _get_text_fingerprint(context, element, bf_namelist)
+    key = element.bl_rna.identifier, element.name, bf_namelist.__class__.__name__
+    entry = _texts.get(key)
+    if entry and entry[0] == fingerprint:
+        text_stats["hits"] += 1
+        text_stats["saved"] += entry[2] - (time.time() - t0)
+        return entry[1]
+    text_stats["misses"] += 1
+    text = bf_namelist.to_fds(context)
+    _texts[key] = fingerprint, text and _timing.sub(r"\1", text), time.time() - t0
+    return text
+
+
+def _get_profiled_to_fds(context, element, bf_namelist) -> "str or None":
+    """Get the FDS text of the namelist of element, profiled by namelist."""
+    with profiling.stage(bf_namelist.__class__.__name__, element.name):
+        text = _get_cached_to_fds(context, element, bf_namelist)
+        if text:
+            profiling.add_count(text.count("\n") + 1)
+        return text
+
+
+def _get_text_fingerprint(context, element, bf_namelist) -> "fingerprint":
+    """Get a hash of the element bf_ properties, its geometry, and the Scene settings."""
+    sc = context.scene
+    settings = (
+        element.name,
+        _get_bf_values(element),
+        _get_bf_values(sc),
+        sc.unit_settings.scale_length,
+    )
+    if isinstance(element, Material):
+        settings += (tuple(element.diffuse_color),)
+    elif isinstance(element, Object):
+        settings += tuple(
+            ms.material and (ms.material.name, ms.material.bf_export)
+            for ms in element.material_slots
+        )
+        settings += (element.active_material and element.active_material.name,)
+        if _is_geometry_exported(element, bf_namelist):
+            if element.bf_xb_mesh_voxels:
+                settings += geometry.to_fds.get_mesh_grids_settings(context)
+            return geometry.utils.get_object_fingerprint(context, element, settings)
+        settings += (tuple(tuple(row) for row in element.matrix_world),)
+    return blake2b(repr(settings).encode(), digest_size=16).hexdigest()
+
+
+def _is_geometry_exported(ob, bf_namelist) -> "bool":
+    """Check if the namelist of Object exports its evaluated geometry."""
+    param_cls = bf_namelist.param_cls
+    return bf_namelist.exported and (
+        (OP_XB in param_cls and ob.bf_xb_export)
+        or (OP_XYZ in param_cls and ob.bf_xyz_export and ob.bf_xyz == "VERTICES")
+        or (OP_PB in param_cls and ob.bf_pb_export)
+    )
+
+
+def _get_bf_values(element, prefix="bf_") -> "values":
+    """Get the values of the properties of element starting with prefix."""
+    values = list()
+    for prop in element.bl_rna.properties:
+        key = prop.identifier
+        if key == "rna_type" or not key.startswith(prefix):
+            continue
+        value = getattr(element, key)
+        if prop.type == "COLLECTION":
+            value = tuple(_get_bf_values(item, prefix="") for item in value)
+        elif prop.type == "POINTER":
+            if isinstance(value, bpy.types.ID):
+                value = value.name
+            elif value:
+                value = _get_bf_values(value, prefix="")
+        elif prop.type == "ENUM" and prop.is_enum_flag:
+            value = sorted(value)
+        elif getattr(prop, "array_length", 0):
+            value = tuple(value)
+        values.append((key, value))
+    return tuple(values)
+
+
 # Extend Blender Object
 
 
@@ -1953,7 +2326,7 @@ class BFObject:
 
     def to_fds(self, context):
         if self.type == "MESH":
-            return self.bf_namelist.to_fds(context)
+            return _get_profiled_to_fds(context, self, self.bf_namelist)
 
     @classmethod
     def register(cls):
@@ -1977,7 +2350,7 @@ class BFMaterial:
         return namelists[self.bf_namelist_cls](self)
 
     def to_fds(self, context):
-        return self.bf_namelist.to_fds(context)
+        return _get_profiled_to_fds(context, self, self.bf_namelist)
 
     @classmethod
     def register(cls):
@@ -1990,18 +2363,128 @@ class BFMaterial:
         del Material.to_fds
 
 
+# Fused voxels
+
+
+def _get_collection_obs(collection):
+    """Get all Objects of collection and of its children."""
+    yield from collection.objects
+    for child in collection.children:
+        yield from _get_collection_obs(child)
+
+
+def _get_fused_groups(context, obs) -> "{(namelist, voxel_size, params): [ob, ...]}":
+    """Group the VOXELS Objects that can be voxelized together."""
+    groups = dict()
+    for ob in obs:
+        if (
+            ob.type != "MESH"
+            or ob.bf_is_tmp
+            or not ob.bf_xb_export
+            or ob.bf_xb != "VOXELS"
+            or ob.bf_xb_center_voxels
+            or ob.bf_xb_mesh_voxels
+        ):
+            continue
+        bf_namelist = ob.bf_namelist
+        if OP_XB not in bf_namelist.param_cls or not bf_namelist.exported:
+            continue
+        bf_namelist.check(context)
+        # Other exported params shall be the same
+        params = list()
+        for p in bf_namelist.param_cls:
+            if p in (OP_ID, OP_FYI, OP_XB, OP_ID_suffix):
+                continue
+            to_fds = p(ob).to_fds(context)
+            if to_fds and not isinstance(to_fds, str):
+                break  # multi param, eg. XYZ, not fused
+            if to_fds:
+                params.append(to_fds)
+        else:
+            voxel_size = (
+                ob.bf_xb_custom_voxel
+                and ob.bf_xb_voxel_size
+                or context.scene.bf_default_voxel_size
+            )
+            key = ob.bf_namelist_cls, voxel_size, separator.join(params)
+            groups.setdefault(key, list()).append(ob)
+    return groups
+
+
+@profiling.profiled("fused_voxels")
+def _get_fused_to_fds(context, collection) -> "body, fused_obs":
+    """Get FDS namelists of the fused voxels of collection Objects."""
+    obs = sorted(set(_get_collection_obs(collection)), key=lambda k: k.name)
+    groups = _get_fused_groups(context, obs)
+    scale_length = context.scene.unit_settings.scale_length
+    bodies, fused_obs = list(), set()
+    for (namelist_cls, _, params), group_obs in groups.items():
+        if len(group_obs) < 2:
+            continue  # nothing to fuse
+        xbs, msg = geometry.to_fds.obs_to_xbs_fused(context, group_obs, scale_length)
+        fused_obs.update(group_obs)
+        name = f"{group_obs[0].name}_fused"
+        owners = ", ".join(ob.name for ob in group_obs)
+        start = f"&{namelists[namelist_cls].fds_label} "
+        format_xb = OP_XB._format_xbs["IDI"]
+        lines = list()
+        for line in geometry.to_fds.format_rows(format_xb, xbs, name, separator):
+            if params:
+                line = separator.join((line, params))
+            lines.append(f"{start}{line} /")
+        bodies.append(
+            comment(f"Fused Objects: {owners}") + comment(msg) + "\n".join(lines)
+        )
+    if bodies:
+        bodies.insert(0, "\n! --- Geometric namelists from fused voxels")
+    return "\n".join(bodies), fused_obs
+
+
+# Parallel export
+
+
+def _get_export_obs(collection):
+    """Get all Objects of collection and of its children, in export order."""
+    yield from sorted(collection.objects, key=lambda k: k.name)
+    for child in collection.children:
+        yield from _get_export_obs(child)
+
+
+def _prepare_obs(context, collection, skip_obs=None):
+    """Prepare the geometry of the exported Objects of collection in parallel."""
+    obs = list()
+    for ob in dict.fromkeys(_get_export_obs(collection)):  # unique, ordered
+        if (
+            ob.type != "MESH"
+            or ob.bf_is_tmp
+            or (skip_obs and ob in skip_obs)
+            or not ob.bf_namelist.exported
+        ):
+            continue
+        if ob.bf_namelist_cls == "ON_GEOM" or OP_XB in ob.bf_namelist.param_cls:
+            obs.append(ob)
+    scale_length = context.scene.unit_settings.scale_length
+    geometry.to_fds.prepare_obs(context, obs, scale_length)
+
+
 # Extend Blender Scene
 
 
 class BFScene:
     name = None  # redefined by subclass
     bf_head_export = True  # redefined by subclass
+    bf_config_voxel_fuse = False  # redefined by subclass
+    collection = None  # redefined by subclass
 
     @property
     def bf_namelists(self):
         return (n for _, n in namelists.items() if n.bpy_type == Scene)
 
     def to_fds(self, context, full=False):
+        return "\n".join(self.iter_fds(context, full))
+
+    def iter_fds(self, context, full=False):
+        """Yield the non empty bodies of the FDS file, to be joined by newlines."""
         # Header
         version = "{0[0]}.{0[1]}.{0[2]}".format(
             sys.modules["blenderfds28x"].bl_info["version"]
@@ -2010,28 +2493,34 @@ class BFScene:
         filepath = bpy.data.filepath or "not saved"
         if len(filepath) > 60:
             filepath = "..." + filepath[-57:]
-        bodies = [
-            f"! Generated by BlenderFDS {version} on Blender {bpy.app.version_string}",
-            f"! Scene: <{self.name}>  Date: <{now}>  File: <{filepath}>",
-        ]
-        bodies.extend(
-            n(self).to_fds(context) for n in self.bf_namelists
-        )  # my namelists
+        yield f"! Generated by BlenderFDS {version} on Blender {bpy.app.version_string}"
+        yield f"! Scene: <{self.name}>  Date: <{now}>  File: <{filepath}>"
+        for n in self.bf_namelists:  # my namelists
+            body = _get_profiled_to_fds(context, self, n(self))
+            if body:
+                yield body
         # Extend with Materials and Collections
         if full:
             # Materials
             mas = list(bpy.data.materials)
             if mas:
                 mas.sort(key=lambda k: k.name)  # alphabetic order by name
-                bodies.append("\n! --- Boundary conditions from Blender Materials")
+                yield "\n! --- Boundary conditions from Blender Materials"
                 for ma in mas:
-                    bodies.append(ma.to_fds(context))
-            # Objects
-            bodies.append(context.scene.collection.to_fds(context))
+                    body = ma.to_fds(context)
+                    if body:
+                        yield body
+            # Fused voxels and Objects
+            fused_obs = set()
+            if self.bf_config_voxel_fuse:
+                body, fused_obs = _get_fused_to_fds(context, self.collection)
+                if body:
+                    yield body
+            _prepare_obs(context, self.collection, skip_obs=fused_obs)
+            yield from context.scene.collection.iter_fds(context, skip_obs=fused_obs)
             # Tail
             if self.bf_head_export:
-                bodies.append("\n&TAIL /")
-        return "\n".join(b for b in bodies if b)  # remove empties
+                yield "\n&TAIL /"
 
     def to_ge1(self, context):
         return geometry.to_ge1.scene_to_ge1(context, self)
@@ -2040,12 +2529,14 @@ class BFScene:
     def register(cls):
         Scene.bf_namelists = cls.bf_namelists
         Scene.to_fds = cls.to_fds
+        Scene.iter_fds = cls.iter_fds
         Scene.to_ge1 = cls.to_ge1
 
     @classmethod
     def unregister(cls):
         del Scene.bf_namelists
         del Scene.to_fds
+        del Scene.iter_fds
         del Scene.to_ge1
 
 
@@ -2057,25 +2548,31 @@ class BFCollection:
     objects = list()  # redefined by subclass
     children = list()  # redefined by subclass
 
-    def to_fds(self, context):  # FIXME messages and structure
-        obs = list(self.objects)
+    def to_fds(self, context, skip_obs=None):
+        return "\n".join(self.iter_fds(context, skip_obs))
+
+    def iter_fds(self, context, skip_obs=None):  # FIXME messages and structure
+        """Yield the non empty bodies of the Collection, to be joined by newlines."""
+        obs = list(ob for ob in self.objects if not skip_obs or ob not in skip_obs)
         obs.sort(key=lambda k: k.name)  # alphabetic order by name
-        bodies = list()
         if obs:
-            bodies.append(
-                f"\n! --- Geometric namelists from Blender Collection <{self.name}>"
-            )
-            bodies.extend(ob.to_fds(context) for ob in obs)
-        bodies.extend(child.to_fds(context) for child in self.children)
-        return "\n".join(b for b in bodies if b)  # remove empties
+            yield f"\n! --- Geometric namelists from Blender Collection <{self.name}>"
+            for ob in obs:
+                body = ob.to_fds(context)
+                if body:
+                    yield body
+        for child in self.children:
+            yield from child.iter_fds(context, skip_obs=skip_obs)
 
     @classmethod
     def register(cls):
         Collection.to_fds = cls.to_fds
+        Collection.iter_fds = cls.iter_fds
 
     @classmethod
     def unregister(cls):
         del Collection.to_fds
+        del Collection.iter_fds
 
 
 # Register
@@ -0,0 +1,178 @@
+"""BlenderFDS, export profiling."""
+
+import time, json, csv, tracemalloc
+from contextlib import nullcontext
+from functools import wraps
+
+# Export profiling
+# When started, the instrumented export stages record, by stage and element,
+# the calls, the wall time, the exported element count (eg. lines, faces,
+# voxels), and, if memory tracing is requested, the peak of memory allocated
+# by Python during the stage. Tracing slows down allocations, so it is off
+# by default, and the peaks are zero.
+# Stages nest, so the time and peak of a stage include its inner stages.
+# Stages computed in worker processes are accounted to their parent stage.
+# When stopped, stages are a shared no-op context.
+
+FIELDS = "stage", "element", "calls", "time", "count", "peak"
+
+_records = None  # {(stage, element): [calls, time, count, peak]}
+_stack = list()  # running stages
+_is_tracing = False  # tracemalloc started by start
+_null = nullcontext()
+
+
+def start(memory=False):
+    """Start recording export stages, and Python allocations if memory."""
+    global _records, _is_tracing
+    _records, _stack[:] = dict(), list()
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _is_tracing = True
+
+
+def stop() -> "records":
+    """Stop recording, and get the records sorted by time."""
+    global _records, _is_tracing
+    records, _records = _records, None
+    if _is_tracing:
+        tracemalloc.stop()
+        _is_tracing = False
+    if not records:
+        return list()
+    records = [
+        dict(zip(FIELDS, (stage, element, *values)))
+        for (stage, element), values in records.items()
+    ]
+    return sort_records(records)
+
+
+def is_started() -> "bool":
+    """Check if export stages are being recorded."""
+    return _records is not None
+
+
+def stage(name, element=""):
+    """Get the context of an export stage of the named element."""
+    if _records is None:
+        return _null
+    return _Stage(name, element)
+
+
+def profiled(name):
+    """Decorate a function, profiling its calls as a stage."""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def add_count(count):
+    """Add count exported elements to the running stage."""
+    if _stack:
+        _stack[-1].count += count
+
+
+class _Stage:
+    """Recorded export stage."""
+
+    __slots__ = "key", "count", "t0", "base", "peak"
+
+    def __init__(self, name, element):
+        self.key = name, element
+        self.count = 0
+
+    def __enter__(self):
+        self.peak = 0
+        if tracemalloc.is_tracing():
+            self.base, peak = tracemalloc.get_traced_memory()
+            if _stack:  # keep the peak of the outer stage so far
+                _stack[-1].peak = max(_stack[-1].peak, peak)
+            _reset_peak()
+        _stack.append(self)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dt = time.perf_counter() - self.t0
+        _stack.pop()
+        if tracemalloc.is_tracing():
+            peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            if _stack:
+                _stack[-1].peak = max(_stack[-1].peak, peak)
+            self.peak = max(peak - self.base, 0)
+        if _records is None:  # stopped while running
+            return
+        values = _records.setdefault(self.key, [0, 0.0, 0, 0])
+        values[0] += 1
+        values[1] += dt
+        values[2] += self.count
+        values[3] = max(values[3], self.peak)
+
+
+def _reset_peak():
+    """Reset the traced peak to the current allocation, if possible."""
+    try:
+        tracemalloc.reset_peak()  # Python 3.9+
+    except AttributeError:
+        pass  # peaks since the start of the profile
+
+
+# Report
+
+
+def sort_records(records, sort_by="time") -> "records":
+    """Sort records by a field, descending for numbers."""
+    reverse = sort_by in ("calls", "time", "count", "peak")
+    return sorted(records, key=lambda r: r[sort_by], reverse=reverse)
+
+
+def get_summary(records, sort_by="time", n=10) -> "lines":
+    """Get the summary table of the first n records, sorted by a field."""
+    lines = [
+        f"{'stage':<24} {'element':<32} {'calls':>6} {'time s':>9} "
+        f"{'count':>9} {'peak KiB':>9}"
+    ]
+    for r in sort_records(records, sort_by)[:n]:
+        lines.append(
+            f"{r['stage'][:24]:<24} {r['element'][:32]:<32} {r['calls']:>6} "
+            f"{r['time']:>9.3f} {r['count']:>9} {r['peak'] / 1024:>9.1f}"
+        )
+    return lines
+
+
+def get_summary_msg(records, n=3) -> "msg":
+    """Get a message with the n slowest stages."""
+    items = list()
+    for r in records[:n]:
+        element = r["element"] and f" <{r['element']}>"
+        items.append(f"{r['stage']}{element} {r['time']:.3f} s")
+    return f"slowest: {', '.join(items) or 'none'}"
+
+
+def write_json(filepath, records) -> "bool":
+    """Write the records to a JSON file."""
+    try:
+        with open(filepath, "w") as f:
+            json.dump(records, f, indent=1)
+    except IOError:
+        return False
+    return True
+
+
+def write_csv(filepath, records) -> "bool":
+    """Write the records to a CSV file."""
+    try:
+        with open(filepath, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+    except IOError:
+        return False
+    return True
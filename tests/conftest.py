@@ -0,0 +1,33 @@
+"""BlenderFDS, test configuration.
+
+The tested modules have no access to bpy, so they are imported from their
+directory, without importing the addon package. The modules of the addon
+root are loaded by filepath, as the addon types module shadows the standard
+library one. The geometry modules with relative imports are loaded from a
+bare geometry package, without running its init.
+"""
+
+import sys, os, importlib, importlib.util
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.path.join(ADDON_DIR, "geometry"))
+
+
+def load_addon_module(name) -> "module":
+    """Load a module of the addon root by filepath, as bf_<name>."""
+    filepath = os.path.join(ADDON_DIR, f"{name}.py")
+    spec = importlib.util.spec_from_file_location(f"bf_{name}", filepath)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_geometry_module(name) -> "module":
+    """Load a module of the addon geometry package, as bf_geometry.<name>."""
+    if "bf_geometry" not in sys.modules:
+        spec = importlib.util.spec_from_loader("bf_geometry", loader=None)
+        package = importlib.util.module_from_spec(spec)
+        package.__path__ = [os.path.join(ADDON_DIR, "geometry")]
+        sys.modules["bf_geometry"] = package
+    return importlib.import_module(f"bf_geometry.{name}")
@@ -0,0 +1,136 @@
+"""BlenderFDS, tests of the vectorized formatting, against str.format."""
+
+import numpy as np
+import pytest
+
+import bulk_format
+
+# Templates, as exported by lang and to_fds
+
+XB = "{0[0]:.6f},{0[1]:.6f},{0[2]:.6f},{0[3]:.6f},{0[4]:.6f},{0[5]:.6f}"
+XYZ = "{0[0]:.6f},{0[1]:.6f},{0[2]:.6f}"
+
+ROW_TEMPLATES = (
+    "XB=" + XB,
+    "ID='{1}_{2}'{3}XB=" + XB,
+    "ID='{1}_X{0[0]:+.3f}_Y{0[2]:+.3f}_Z{0[4]:+.3f}'{3}XB=" + XB,
+    "ID='{1}_{2}'{3}XYZ=" + XYZ,
+    "ID='{1}_X{0[0]:+.3f}_Y{0[1]:+.3f}_Z{0[2]:+.3f}'{3}XYZ=" + XYZ,
+    "{0[0]:+.6f}, {0[1]:+.6f}, {0[2]:+.6f},",  # GEOM VERTS
+)
+PB_TEMPLATES = (
+    ("ID='{1}_{2}'{3}PBX={0:.6f}", "ID='{1}_{2}'{3}PBY={0:.6f}"),
+    ("ID='{1}_X{0:+.3f}'{3}PBX={0:.6f}", "ID='{1}_Y{0:+.3f}'{3}PBY={0:.6f}"),
+)
+
+# Edge values: rounding ties and near ties, signed zeros, large magnitudes,
+# and not finite numbers
+
+EDGE_VALUES = (
+    0.0,
+    -0.0,
+    -1e-9,
+    -0.0004,
+    -0.0005,
+    0.0005,
+    0.0015,
+    0.0025,
+    1.0000005,
+    2.0000015,
+    0.1234565,
+    -0.1234565,
+    0.5,
+    -2.5,
+    1e-7,
+    123456.0000005,
+    4503599627.370496,  # 2 ** 52 / 1e6
+    4503599627.370497,
+    1e15,
+    -1e15,
+    1e20,
+    -1.7976931348623157e308,
+    float("nan"),
+    float("inf"),
+    float("-inf"),
+)
+
+
+def get_rows(ncols, seed=0, n=200) -> "rows":
+    """Get rows of random, near tie, and edge values, in all columns."""
+    rng = np.random.default_rng(seed)
+    rows = rng.normal(scale=10.0 ** rng.integers(-4, 6, size=(n, 1)), size=(n, ncols))
+    rows[50:100] = np.round(rows[50:100], 3) + 0.0005  # near ties
+    edges = np.array(EDGE_VALUES)
+    for j in range(ncols):
+        rows[: len(edges), j] = np.roll(edges, j)
+    return rows
+
+
+def get_expected(template, rows, name="", separator="", indexes=None) -> "lines":
+    if indexes is None:
+        indexes = range(len(rows))
+    return [
+        template.format(row, name, i, separator)
+        for row, i in zip(np.asarray(rows).tolist(), indexes)
+    ]
+
+
+# Format rows
+
+
+@pytest.mark.parametrize("template", ROW_TEMPLATES)
+@pytest.mark.parametrize("seed", range(3))
+def test_format_rows(template, seed):
+    rows = get_rows(6, seed)
+    got = bulk_format.format_rows(template, rows, "Ob", "\n      ")
+    assert got == get_expected(template, rows, "Ob", "\n      ")
+
+
+@pytest.mark.parametrize("n", (0, 1, bulk_format.MIN_ROWS - 1, bulk_format.MIN_ROWS))
+def test_format_rows_sizes(n):
+    template = ROW_TEMPLATES[2]
+    rows = get_rows(6, n=max(n, len(EDGE_VALUES)))[:n]
+    assert bulk_format.format_rows(template, rows, "Ob", " ") == get_expected(
+        template, rows, "Ob", " "
+    )
+
+
+def test_format_rows_ints():
+    template = "{0[0]},{0[1]},{0[2]}, {0[3]},"  # GEOM FACES
+    rng = np.random.default_rng(0)
+    rows = rng.integers(1, 10 ** rng.integers(1, 12, size=(100, 1)), size=(100, 4))
+    rows[:5] = (0, 9, 10, 99), (-1, 0, 1, 2), (2**62, 1, 1, 1), (1, 1, 1, 1), (7,) * 4
+    assert bulk_format.format_rows(template, rows) == get_expected(template, rows)
+
+
+def test_format_rows_unsupported():
+    rows = get_rows(6)
+    for template in ("{0[0]:.0f}", "{0[0]:e}", "{0[0]!r}", "{0[1]}", "{1:>5}"):
+        assert bulk_format.format_rows(template, rows, "Ob") == get_expected(
+            template, rows, "Ob"
+        )
+    template = "ID='{1}'XB=" + XB  # with the end of line marker in the name
+    assert bulk_format.format_rows(template, rows, "a\x01b") == get_expected(
+        template, rows, "a\x01b"
+    )
+
+
+@pytest.mark.parametrize("templates", PB_TEMPLATES)
+def test_format_pbs(templates):
+    values = get_rows(1)[:, 0]
+    axes = np.arange(len(values)) % 2
+    pbs = np.column_stack((axes, values))
+    got = bulk_format.format_pbs(templates, pbs, "Ob", " ")
+    expected = [
+        templates[int(axis)].format(value, "Ob", i, " ")
+        for i, (axis, value) in enumerate(pbs.tolist())
+    ]
+    assert got == expected
+
+
+@pytest.mark.parametrize("ncols", (2, 40))
+def test_format_zvals(ncols):
+    template = "".join(f"{{0[{i}]:.3f}}," for i in range(ncols))  # GEOM ZVALS row
+    rows = get_rows(ncols)
+    expected = [",".join(f"{z:.3f}" for z in row) + "," for row in rows]
+    assert bulk_format.format_rows(template, rows) == expected
@@ -0,0 +1,189 @@
+"""BlenderFDS, tests of the voxel boxes from triangulated surfaces."""
+
+import numpy as np
+import pytest
+
+import calc_boxes
+
+# Small meshes
+
+
+def get_box_tris(x0, x1, y0, y1, z0, z1) -> "tris":
+    """Get the closed triangulated surface of an axis aligned box, in grid coo."""
+    co = np.array(
+        [(x, y, z) for x in (x0, x1) for y in (y0, y1) for z in (z0, z1)],
+        dtype=np.float64,
+    )
+    quads = (
+        (0, 1, 3, 2),  # x0
+        (4, 6, 7, 5),  # x1
+        (0, 4, 5, 1),  # y0
+        (2, 3, 7, 6),  # y1
+        (0, 2, 6, 4),  # z0
+        (1, 5, 7, 3),  # z1
+    )
+    ivs = [(a, b, c) for a, b, c, d in quads] + [(a, c, d) for a, b, c, d in quads]
+    return co[np.array(ivs)]
+
+
+def get_chunked_boxes(tris, merge="AXIS") -> "boxes, voxel_count":
+    """Get the joined boxes of tris, through their chunk jobs."""
+    jobs = calc_boxes.get_chunk_jobs(tris, merge)
+    results = [calc_boxes.get_chunk_boxes(job) for job in jobs]
+    return calc_boxes.join_chunk_boxes(jobs, results)
+
+
+# Chunks
+
+
+@pytest.mark.parametrize("merge", ("AXIS", "GREEDY", "SLABS"))
+def test_tall_column_is_one_box(merge):
+    nz = 2 * calc_boxes.CHUNK_SIZE + 44  # three z blocks, in one xy chunk
+    tris = get_box_tris(0.0, 1.0, 0.0, 1.0, 0.0, nz)
+    boxes, voxel_count = get_chunked_boxes(tris, merge)
+    assert voxel_count == nz
+    assert boxes.tolist() == [[0, 1, 0, 1, 0, nz]]
+
+
+def test_wide_box_is_one_box():
+    n = calc_boxes.CHUNK_SIZE + 10  # two chunks along x and y
+    tris = get_box_tris(0.0, n, 0.0, n, 0.0, 3.0)
+    boxes, voxel_count = get_chunked_boxes(tris)
+    assert voxel_count == n * n * 3
+    assert boxes.tolist() == [[0, n, 0, n, 0, 3]]
+
+
+# Ray crossings
+
+
+def get_crossings(tris) -> "crossings":
+    """Get the sorted (ix, iy, z) crossings of tris."""
+    ixs, iys, zs = calc_boxes.get_tris_crossings(tris)
+    return sorted(zip(ixs.tolist(), iys.tolist(), zs.tolist()))
+
+
+def test_box_crossings():
+    tris = get_box_tris(0.0, 2.0, 0.0, 3.0, 0.2, 4.7)
+    crossings = get_crossings(tris)
+    expected = [(ix, iy) for ix in (0, 1) for iy in (0, 1, 2) for _ in (0, 1)]
+    assert [c[:2] for c in crossings] == expected
+    assert [c[2] for c in crossings] == pytest.approx((0.2, 4.7) * 6)
+
+
+def test_shared_edge_crossed_once():
+    # The diagonals of the z faces pass through the column centers
+    tris = get_box_tris(0.0, 2.0, 0.0, 2.0, 0.0, 1.0)
+    crossings = get_crossings(tris)
+    assert len(crossings) == 2 * 4
+    assert len(set(crossings)) == len(crossings)
+
+
+def test_side_faces_on_column_centers():
+    # The side faces contain the column centers along x = 0.5 and 2.5
+    tris = get_box_tris(0.5, 2.5, 0.0, 2.0, 0.0, 3.0)
+    boxes = calc_boxes.get_boxes_from_crossings(*calc_boxes.get_tris_crossings(tris))
+    assert calc_boxes.get_boxes_volume(boxes) == 2 * 2 * 3
+
+
+def test_vertical_tris_not_crossed():
+    tris = np.array([((0.0, 0.5, 0.0), (2.0, 0.5, 0.0), (2.0, 0.5, 2.0))])
+    ixs, iys, zs = calc_boxes.get_tris_crossings(tris)
+    assert not len(ixs) and not len(iys) and not len(zs)
+
+
+def test_crossings_in_bounds():
+    tris = get_box_tris(0.0, 4.0, 0.0, 4.0, 0.0, 1.0)
+    ixs, iys, _ = calc_boxes.get_tris_crossings(tris, bounds=(1, 3, 0, 2))
+    assert set(ixs.tolist()) == {1, 2} and set(iys.tolist()) == {0, 1}
+
+
+def test_small_batches():
+    tris = get_box_tris(0.0, 7.0, 0.0, 5.0, 0.3, 2.6)
+    assert get_crossings(tris) == sorted(
+        zip(*(a.tolist() for a in calc_boxes.get_tris_crossings(tris, batch_size=3)))
+    )
+
+
+# Ray parity
+
+
+def test_hollow_box():
+    tris = np.concatenate(
+        (
+            get_box_tris(0.0, 5.0, 0.0, 5.0, 0.0, 5.0),
+            get_box_tris(1.0, 4.0, 1.0, 4.0, 1.0, 4.0),
+        )
+    )
+    boxes = calc_boxes.get_boxes_from_crossings(*calc_boxes.get_tris_crossings(tris))
+    assert calc_boxes.get_boxes_volume(boxes) == 5 ** 3 - 3 ** 3
+    grid, offset = calc_boxes.get_occupancy(boxes)
+    assert offset.tolist() == [0, 0, 0]
+    assert not grid[1:4, 1:4, 1:4].any()
+
+
+def test_open_surface_odd_crossings():
+    tris = get_box_tris(0.0, 2.0, 0.0, 2.0, 0.0, 2.0)
+    tris = tris[tris[:, :, 2].min(axis=1) < 2.0]  # no top face
+    with pytest.raises(calc_boxes.OddCrossingsError):
+        calc_boxes.get_boxes_from_crossings(*calc_boxes.get_tris_crossings(tris))
+    jobs = calc_boxes.get_chunk_jobs(tris, "AXIS")
+    with pytest.raises(calc_boxes.OddCrossingsError):
+        calc_boxes.get_chunk_boxes(jobs[0])
+
+
+# Merge strategies
+
+
+def get_grid(shape=(9, 7, 5), fill=0.6, seed=3) -> "grid":
+    """Get a random occupancy grid."""
+    return np.random.default_rng(seed).random(shape) < fill
+
+
+def get_grid_occupancy(boxes, shape) -> "grid":
+    """Get the occupancy grid of boxes, counting overlaps."""
+    grid = np.zeros(shape, dtype=np.int64)
+    for ix0, ix1, iy0, iy1, iz0, iz1 in boxes.tolist():
+        grid[ix0:ix1, iy0:iy1, iz0:iz1] += 1
+    return grid
+
+
+@pytest.mark.parametrize("merge", ("AXIS", "GREEDY", "SLABS"))
+@pytest.mark.parametrize("fill", (0.3, 0.6, 0.95, 1.0))
+def test_occupancy_boxes(merge, fill):
+    grid = get_grid(fill=fill)
+    boxes = calc_boxes.get_occupancy_boxes(grid, merge)
+    assert np.array_equal(get_grid_occupancy(boxes, grid.shape), grid)  # no overlaps
+    assert calc_boxes.get_boxes_volume(boxes) == np.count_nonzero(grid)
+    if fill == 1.0:
+        assert len(boxes) == 1
+
+
+@pytest.mark.parametrize("merge", ("AXIS", "GREEDY", "SLABS"))
+def test_merged_boxes(merge):
+    grid = get_grid()
+    columns = calc_boxes.get_occupancy_boxes(grid, "AXIS")
+    offset = np.array((3, -2, 10), dtype=np.int32)
+    boxes = columns + np.repeat(offset, 2)
+    grows = ((calc_boxes.grow_boxes_along_x, 2), (calc_boxes.grow_boxes_along_y, 0))
+    merged = calc_boxes.get_merged_boxes(boxes, merge, grows)
+    assert calc_boxes.get_boxes_volume(merged) == np.count_nonzero(grid)
+    occupancy, merged_offset = calc_boxes.get_occupancy(merged)
+    assert merged_offset.tolist() == offset.tolist()
+    assert np.array_equal(occupancy, grid)
+
+
+def test_merge_strategies_box_count():
+    grid = get_grid(fill=0.8)
+    counts = {
+        merge: len(calc_boxes.get_occupancy_boxes(grid, merge))
+        for merge in ("AXIS", "GREEDY", "SLABS")
+    }
+    assert counts["GREEDY"] < counts["AXIS"] and counts["SLABS"] < counts["AXIS"]
+
+
+@pytest.mark.parametrize("merge", ("AXIS", "GREEDY", "SLABS"))
+def test_union_block_boxes(merge):
+    boxes = np.array(((0, 4, 0, 4, 0, 4), (2, 6, 2, 6, 2, 6)), dtype=np.int32)
+    merged, voxel_count = calc_boxes.get_block_boxes((boxes, merge))
+    assert voxel_count == 2 * 4 ** 3 - 2 ** 3
+    assert calc_boxes.get_boxes_volume(merged) == voxel_count
@@ -0,0 +1,127 @@
+"""BlenderFDS, tests of the quadric error mesh decimation."""
+
+import numpy as np
+import pytest
+
+import calc_decimation, calc_quality
+
+# Small meshes
+
+
+def get_sphere(n=24) -> "co, tris":
+    """Get a closed UV sphere of unit radius, with outward normals."""
+    thetas = np.linspace(0.0, np.pi, n + 1)[1:-1]
+    phis = np.linspace(0.0, 2.0 * np.pi, 2 * n, endpoint=False)
+    t, p = np.meshgrid(thetas, phis, indexing="ij")
+    co = np.stack((np.sin(t) * np.cos(p), np.sin(t) * np.sin(p), np.cos(t)), axis=-1)
+    co = np.vstack(((0, 0, 1), co.reshape(-1, 3), (0, 0, -1)))
+    m, south = 2 * n, len(co) - 1
+    tris = list()
+    for j in range(m):
+        tris.append((0, 1 + j, 1 + (j + 1) % m))
+        tris.append((south, south - m + (j + 1) % m, south - m + j))
+    for i in range(n - 2):
+        for j in range(m):
+            a, b = 1 + i * m + j, 1 + i * m + (j + 1) % m
+            tris.append((a, a + m, b))
+            tris.append((b, a + m, b + m))
+    return co, np.array(tris, dtype=np.int64)
+
+
+def get_grid(n=10) -> "co, tris":
+    """Get an open flat square grid, in the z=0 plane."""
+    x = np.linspace(0.0, 1.0, n + 1)
+    xx, yy = np.meshgrid(x, x, indexing="ij")
+    co = np.stack((xx.ravel(), yy.ravel(), np.zeros(xx.size)), axis=1)
+    tris = list()
+    for i in range(n):
+        for j in range(n):
+            a, b = i * (n + 1) + j, (i + 1) * (n + 1) + j
+            tris.append((a, b, b + 1))
+            tris.append((a, b + 1, a + 1))
+    return co, np.array(tris, dtype=np.int64)
+
+
+def get_report(co, tris) -> "report":
+    edges = np.sort(tris[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    edges = np.unique(edges, axis=0)
+    return calc_quality.get_quality_report(co, edges, tris, 1e-9, 1e-12)
+
+
+def get_boundary_edges(tris) -> "edges":
+    """Get the sorted edges of triangles with a single face."""
+    edges = np.sort(tris[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    edges, counts = np.unique(edges, axis=0, return_counts=True)
+    return edges[counts == 1]
+
+
+# Decimation
+
+
+def test_sphere_input():
+    co, tris = get_sphere()
+    for key, value in get_report(co, tris).items():
+        assert not len(value), key
+
+
+@pytest.mark.parametrize("target_faces", (500, 100, 20))
+def test_closed_sphere_stays_manifold(target_faces):
+    co, tris = get_sphere()
+    mis = np.zeros(len(tris), dtype=np.int64)
+    co, tris, mis = calc_decimation.decimate(co, tris, mis, target_faces=target_faces)
+    assert len(tris) <= target_faces and len(mis) == len(tris)
+    report = get_report(co, tris)
+    for key in ("manifold_verts", "manifold_edges", "loose_verts", "normals"):
+        assert not len(report[key]), key
+    assert len(co) - len(tris) * 3 // 2 + len(tris) == 2  # Euler characteristic
+
+
+def test_max_error():
+    co, tris = get_sphere()
+    mis = np.zeros(len(tris), dtype=np.int64)
+    co, tris, _ = calc_decimation.decimate(co, tris, mis, max_error=1e-3)
+    assert np.allclose(np.linalg.norm(co, axis=1), 1.0, atol=1e-3)
+    assert 8 < len(tris) < len(get_sphere()[1])
+
+
+def test_open_boundary_corners_pinned():
+    co0, tris0 = get_grid()
+    mis = np.zeros(len(tris0), dtype=np.int64)
+    co, tris, mis = calc_decimation.decimate(co0, tris0, mis)
+    assert len(tris) == 2  # flat, collapsed to a single quad
+    assert sorted(map(tuple, co.tolist())) == [
+        (0.0, 0.0, 0.0),
+        (0.0, 1.0, 0.0),
+        (1.0, 0.0, 0.0),
+        (1.0, 1.0, 0.0),
+    ]
+    assert np.isclose(calc_quality.get_tri_areas(co, tris).sum(), 1.0)
+
+
+def test_surf_boundary_kept():
+    co0, tris0 = get_grid()
+    mis0 = (co0[tris0].mean(axis=1)[:, 0] > 0.5).astype(np.int64)  # two SURFs
+    co, tris, mis = calc_decimation.decimate(co0, tris0, mis0)
+    areas = calc_quality.get_tri_areas(co, tris)
+    assert np.isclose(areas[mis == 0].sum(), 0.5)
+    assert np.isclose(areas[mis == 1].sum(), 0.5)
+    assert len(get_boundary_edges(tris)) >= 6
+    assert len(tris) < len(tris0)
+
+
+def test_quality_epsilons_kept():
+    co0, tris0 = get_sphere(12)
+    mis0 = (co0[tris0].mean(axis=1)[:, 0] > 0.3).astype(np.int64)  # two SURFs
+    epsilon_len, epsilon_area = 0.05, 0.005  # the sphere is above both
+    result = calc_decimation.decimate(co0, tris0, mis0, target_faces=40)
+    assert calc_quality.get_tri_areas(*result[:2]).min() <= epsilon_area  # slivers
+    co, tris, mis = calc_decimation.decimate(
+        co0, tris0, mis0, 40, None, epsilon_len, epsilon_area
+    )
+    assert len(tris) < len(tris0)
+    edges = np.unique(
+        np.sort(tris[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1), axis=0
+    )
+    report = calc_quality.get_quality_report(co, edges, tris, epsilon_len, epsilon_area)
+    for key in ("degenerate_edges", "degenerate_faces", "duplicate_verts"):
+        assert not len(report[key]), key
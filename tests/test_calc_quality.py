@@ -0,0 +1,177 @@
+"""BlenderFDS, tests of the quality checks of triangulated surfaces."""
+
+import numpy as np
+import pytest
+
+import calc_quality
+
+EPSILON_LEN, EPSILON_AREA = 1e-6, 1e-12
+
+# Small meshes
+
+
+def get_cube() -> "co, tris":
+    """Get a closed unit cube, with outward normals."""
+    co = np.array(
+        [(x, y, z) for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64
+    )
+    quads = (
+        (0, 1, 3, 2),
+        (4, 6, 7, 5),
+        (0, 4, 5, 1),
+        (2, 3, 7, 6),
+        (0, 2, 6, 4),
+        (1, 5, 7, 3),
+    )
+    tris = [(a, b, c) for a, b, c, d in quads] + [(a, c, d) for a, b, c, d in quads]
+    return co, np.array(tris, dtype=np.int64)
+
+
+def get_edges(tris) -> "edges":
+    """Get the unique undirected edges of triangles."""
+    edges = np.sort(tris[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    return np.unique(edges, axis=0)
+
+
+def get_report(co, tris, edges=None) -> "report":
+    if edges is None:
+        edges = get_edges(tris)
+    return calc_quality.get_quality_report(co, edges, tris, EPSILON_LEN, EPSILON_AREA)
+
+
+def assert_clean(report, *skip):
+    for key, value in report.items():
+        if key not in skip:
+            assert not len(value), key
+
+
+# Quality report
+
+
+def test_closed_cube():
+    co, tris = get_cube()
+    assert_clean(get_report(co, tris))
+
+
+def test_open_face():
+    co, tris = get_cube()
+    report = get_report(co, tris[1:])  # remove a triangle
+    edges = get_edges(tris[1:])
+    bad_edges = edges[report["manifold_edges"]]
+    assert sorted(map(tuple, bad_edges.tolist())) == [(0, 1), (0, 3), (1, 3)]
+    assert_clean(report, "manifold_edges")
+
+
+def test_flipped_face():
+    co, tris = get_cube()
+    tris[[0, 6]] = tris[[0, 6], ::-1]  # flip a quad
+    report = get_report(co, tris)
+    edges = get_edges(tris)
+    bad_edges = edges[report["normals"]]
+    assert sorted(map(tuple, bad_edges.tolist())) == [(0, 1), (0, 2), (1, 3), (2, 3)]
+    assert_clean(report, "normals")
+
+
+def test_bowtie_vertex():
+    co = np.array(
+        [(0, 0, 0), (1, 0, 0), (1, 1, 0), (-1, 0, 0), (-1, -1, 0)], dtype=np.float64
+    )
+    tris = np.array([(0, 1, 2), (0, 3, 4)], dtype=np.int64)
+    report = get_report(co, tris)
+    assert report["manifold_verts"].tolist() == [0]
+    assert len(report["manifold_edges"]) == 6  # open boundaries
+    assert_clean(report, "manifold_verts", "manifold_edges")
+
+
+def test_wire_edge_and_loose_vertex():
+    co, tris = get_cube()
+    co = np.vstack((co, ((2, 2, 2), (3, 3, 3))))
+    edges = np.vstack((get_edges(tris), ((7, 8),)))
+    report = get_report(co, tris, edges)
+    assert report["loose_verts"].tolist() == [9]
+    assert report["manifold_verts"].tolist() == [7, 8, 9]
+    assert report["manifold_edges"].tolist() == [len(edges) - 1]
+
+
+def test_degenerate():
+    co, tris = get_cube()
+    co = np.vstack((co, ((0, 0, 0), (0.5, 0.5, 0.5))))
+    tris = np.vstack((tris, ((8, 0, 9),)))  # zero length edge
+    report = get_report(co, tris)
+    edges = get_edges(tris)
+    assert edges[report["degenerate_edges"]].tolist() == [[0, 8]]
+    assert report["degenerate_faces"].tolist() == [len(tris) - 1]
+    assert report["duplicate_verts"].tolist() == [0, 8]
+
+
+@pytest.mark.parametrize("target", ((1, 1, 1), (0.5, 0.5, 0.0), (5.0, 5.0, 5.0)))
+def test_partial_report(target):
+    co, tris = get_cube()
+    edges = get_edges(tris)
+    report = get_report(co, tris, edges)
+    co[0] = target  # move a vertex, on another, on a face diagonal, or away
+    partial = calc_quality.get_partial_quality_report(
+        co, edges, tris, [0], report, EPSILON_LEN, EPSILON_AREA
+    )
+    full = get_report(co, tris, edges)
+    for key in full:
+        assert partial[key].tolist() == full[key].tolist(), key
+
+
+# Duplicate vertices
+
+
+def get_brute_force_pairs(co, epsilon_len) -> "pairs":
+    """Get the sorted (i, j) pairs of vertices closer than epsilon_len, i < j."""
+    dists = np.linalg.norm(co[:, None, :] - co[None, :, :], axis=2)
+    i, j = np.nonzero(np.triu(dists <= epsilon_len, k=1))
+    return sorted(zip(i.tolist(), j.tolist()))
+
+
+def get_sorted_pairs(pairs) -> "pairs":
+    return sorted(zip(pairs.min(axis=0).tolist(), pairs.max(axis=0).tolist()))
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("epsilon_len", (1e-6, 0.05, 0.3))
+def test_close_vert_pairs(seed, epsilon_len):
+    rng = np.random.default_rng(seed)
+    co = rng.random((200, 3)) * (1.0, 2.0, 0.5) - 0.5
+    co = np.vstack((co, co[:20] + rng.normal(scale=epsilon_len / 4, size=(20, 3))))
+    co = np.vstack((co, co[:10]))  # exact duplicates
+    pairs = calc_quality.get_close_vert_pairs(co, epsilon_len)
+    assert get_sorted_pairs(pairs) == get_brute_force_pairs(co, epsilon_len)
+
+
+def test_close_vert_pairs_edge_cases():
+    assert calc_quality.get_close_vert_pairs(np.zeros((0, 3)), 0.1).shape == (2, 0)
+    assert calc_quality.get_close_vert_pairs(np.zeros((1, 3)), 0.1).shape == (2, 0)
+    co = np.zeros((4, 3))  # all coincident, zero extent
+    pairs = calc_quality.get_close_vert_pairs(co, 0.0)
+    assert get_sorted_pairs(pairs) == get_brute_force_pairs(co, 0.0)
+    co = np.array(((0, 0, 0), (1e6, 0, 0), (1e6 + 1e-3, 0, 0)))  # large extent
+    pairs = calc_quality.get_close_vert_pairs(co, 1e-2)
+    assert get_sorted_pairs(pairs) == [(1, 2)]
+
+
+def test_connected_labels():
+    links = np.array(((5, 3, 1, 8, 6), (3, 1, 7, 6, 9)))
+    labels = calc_quality.get_connected_labels(10, links)
+    assert labels.tolist() == [0, 1, 2, 1, 4, 1, 6, 1, 6, 6]
+    labels = calc_quality.get_connected_labels(3, np.empty((2, 0), dtype=np.int64))
+    assert labels.tolist() == [0, 1, 2]
+
+
+def test_connected_labels_chain():
+    n = 1000  # long chain, in shuffled order
+    perm = np.random.default_rng(0).permutation(n)
+    links = np.stack((perm[:-1], perm[1:]))
+    assert not calc_quality.get_connected_labels(n, links).any()
+
+
+def test_duplicate_verts():
+    co, _ = get_cube()
+    co = np.vstack((co, co[[2, 5]] + 1e-7, co[[2]]))
+    assert calc_quality.get_duplicate_verts(co, 1e-6).tolist() == [2, 5, 8, 9, 10]
+    labels = calc_quality.get_vert_clusters(co, 1e-6)
+    assert labels[8:].tolist() == [2, 5, 2]
@@ -0,0 +1,89 @@
+"""BlenderFDS, tests of the terrain heightfields."""
+
+import numpy as np
+import pytest
+
+from conftest import load_geometry_module
+
+calc_terrain = load_geometry_module("calc_terrain")
+
+# Small terrains
+
+
+def get_terrain(nx=5, ny=4, x0=-1.0, y0=2.0, step=0.5) -> "co, ivs, zvals":
+    """Get a grid-like terrain mesh, with shuffled vertices, and its z values by row."""
+    xs, ys = x0 + step * np.arange(nx), y0 + step * np.arange(ny)
+    xx, yy = np.meshgrid(xs, ys)  # by row, from y0
+    zz = np.sin(xx) + 0.3 * yy
+    co = np.column_stack((xx.ravel(), yy.ravel(), zz.ravel()))
+    ivs = list()
+    for j in range(ny - 1):
+        for i in range(nx - 1):
+            a, b = j * nx + i, (j + 1) * nx + i
+            ivs.extend(((a, a + 1, b + 1), (a, b + 1, b)))
+    order = np.random.default_rng(0).permutation(len(co))
+    remap = np.argsort(order)
+    return co[order], remap[np.array(ivs)], zz.ravel()
+
+
+# Lattice
+
+
+def test_lattice():
+    values = np.array((0.3, 0.1, 0.5, 0.1, 0.3, 0.5))
+    v0, v1, n = calc_terrain._get_lattice(values, 1e-6)
+    assert (v0, v1, n) == (0.1, 0.5, 3)
+    assert isinstance(n, int)
+
+
+@pytest.mark.parametrize("values", ((0.0, 0.1, 0.3), (1.0, 1.0, 1.0)))
+def test_not_lattice(values):
+    assert calc_terrain._get_lattice(np.array(values), 1e-6) is None
+
+
+def test_lattice_rounding():
+    values = np.arange(6) * 0.1 + np.array((0, 1, -1, 0, 1, -1)) * 1e-9
+    assert calc_terrain._get_lattice(values, 1e-6)[2] == 6
+
+
+# Vertex grid
+
+
+def test_vertex_grid():
+    co, ivs, zvals = get_terrain()
+    (x0, x1, y0, y1), (nx, ny), got = calc_terrain._get_vertex_grid(co, ivs)
+    assert (x0, x1, y0, y1) == (-1.0, 1.0, 2.0, 3.5)
+    assert (nx, ny) == (5, 4)
+    assert np.array_equal(got, zvals)
+
+
+def test_not_vertex_grid():
+    co, ivs, _ = get_terrain()
+    assert calc_terrain._get_vertex_grid(co, ivs[:-1]) is None  # a missing face
+    co[0, :2] += 0.2  # off the lattice
+    assert calc_terrain._get_vertex_grid(co, ivs) is None
+
+
+def test_grid_heightfield():
+    co, ivs, zvals = get_terrain()
+    ijk, xb, got, is_grid = calc_terrain.get_heightfield(co, ivs, 0.1, 1e-6)
+    assert is_grid and ijk == (5, 4)
+    assert xb == (-1.0, 1.0, 2.0, 3.5, zvals.min(), zvals.max())
+    assert np.array_equal(got, zvals)
+
+
+def test_sampled_heightfield():
+    co = np.array(((0, 0, 1), (2, 0, 1), (2, 1, 2), (0, 1, 2), (1, 0.5, 1.5)))
+    ivs = np.array(((0, 1, 4), (1, 2, 4), (2, 3, 4), (3, 0, 4)))  # a fan, not a grid
+    ijk, xb, zvals, is_grid = calc_terrain.get_heightfield(co, ivs, 0.5, 1e-6)
+    assert not is_grid and ijk == (5, 3)
+    assert xb[:4] == (0.0, 2.0, 0.0, 1.0)
+    assert np.allclose(zvals.reshape(3, 5), ((1.0,) * 5, (1.5,) * 5, (2.0,) * 5))
+
+
+def test_heightfield_errors():
+    with pytest.raises(calc_terrain.TerrainError):
+        calc_terrain.get_heightfield(np.zeros((0, 3)), np.zeros((0, 3), int), 0.5, 1e-6)
+    co = np.array(((0.0, 0.0, 0.0), (2.0, 0.0, 0.0), (2.0, 1.0, 0.0)))
+    with pytest.raises(calc_terrain.TerrainError, match="cover"):
+        calc_terrain.get_heightfield(co, np.array(((0, 1, 2),)), 0.5, 1e-6)
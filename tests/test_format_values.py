@@ -0,0 +1,47 @@
+"""BlenderFDS, tests of the compiled value formatters, against the generic formatting."""
+
+import pytest
+
+from conftest import load_addon_module
+
+bf_utils = load_addon_module("utils")
+
+# Values of the Blender property types, by value type
+
+VALUES = {
+    bool: (True, False),
+    int: (0, 7, -12, 123456789),
+    float: (0.0, 1.0, -0.0005, 0.0015, 2.5, 1e-7, -123.456789, 1e12),
+    str: ("", "INERT", "it's", "a,b"),
+}
+
+
+@pytest.mark.parametrize("value_type", VALUES)
+@pytest.mark.parametrize("precision", (0, 1, 3, 6))
+def test_single_value(value_type, precision):
+    format_value = bf_utils.get_formatter(value_type, precision)
+    for value in VALUES[value_type]:
+        if value == "":
+            continue  # empty strings are not exported
+        assert format_value(value) == bf_utils.format_values(value, precision)
+
+
+@pytest.mark.parametrize("value_type", VALUES)
+@pytest.mark.parametrize("precision", (0, 3, 6))
+def test_multi_value(value_type, precision):
+    format_values = bf_utils.get_formatter(value_type, precision, vector=True)
+    values = VALUES[value_type]
+    for n in (1, 2, 3, len(values)):
+        vector = values[-n:]
+        assert format_values(vector) == bf_utils.format_values(vector, precision)
+        vector = list(vector)  # eg. bpy_prop_array
+        assert format_values(vector) == bf_utils.format_values(vector, precision)
+
+
+def test_generic_formatting():
+    assert bf_utils.format_values((True, False, True)) == "T,F,T"
+    assert bf_utils.format_values((1, 2, 3)) == "1,2,3"
+    assert bf_utils.format_values((1.0, 0.12345), 2) == "1.00,0.12"
+    assert bf_utils.format_values(("A", "B")) == "'A','B'"
+    with pytest.raises(Exception):
+        bf_utils.format_values(None)
@@ -0,0 +1,63 @@
+"""BlenderFDS, tests of the export profiling."""
+
+import tracemalloc
+
+from conftest import load_addon_module
+
+profiling = load_addon_module("profiling")
+
+
+def profile(memory=None) -> "records":
+    """Profile a small export, and get its records."""
+    if memory is None:
+        profiling.start()
+    else:
+        profiling.start(memory=memory)
+    with profiling.stage("export", "Scene"):
+        for i in range(3):
+            with profiling.stage("ON_OBST", f"ob{i}"):
+                profiling.add_count(2)
+                with profiling.stage("ob_to_xbs", f"ob{i}"):
+                    a = [0] * 100000 * (i + 1)
+                    del a
+                    profiling.add_count(5)
+    return profiling.stop()
+
+
+def get_record(records, stage, element) -> "record":
+    return next(r for r in records if r["stage"] == stage and r["element"] == element)
+
+
+def test_stages():
+    assert profiling.stage("x") is profiling.stage("y")  # stopped, shared no-op
+    records = profile()
+    assert not profiling.is_started()
+    assert len(records) == 7
+    assert get_record(records, "export", "Scene")["count"] == 0
+    assert get_record(records, "ON_OBST", "ob1")["count"] == 2
+    assert get_record(records, "ob_to_xbs", "ob2")["count"] == 5
+    assert records == profiling.sort_records(records, "time")
+
+
+def test_memory_off_by_default():
+    records = profile()
+    assert not tracemalloc.is_tracing()
+    assert all(r["peak"] == 0 for r in records)
+
+
+def test_memory():
+    records = profile(memory=True)
+    assert not tracemalloc.is_tracing()
+    peak = get_record(records, "ob_to_xbs", "ob2")["peak"]
+    assert peak >= 3 * 100000 * 8
+    assert get_record(records, "ON_OBST", "ob2")["peak"] >= peak
+    assert get_record(records, "export", "Scene")["peak"] >= peak
+
+
+def test_memory_tracing_kept():
+    tracemalloc.start()
+    try:
+        profile(memory=True)
+        assert tracemalloc.is_tracing()  # started by the caller
+    finally:
+        tracemalloc.stop()
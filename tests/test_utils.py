@@ -0,0 +1,116 @@
+"""BlenderFDS, tests of the process pool, against the serial reference."""
+
+import os, sys, multiprocessing
+import numpy as np
+import pytest
+
+import calc_decimation, calc_quality
+from conftest import load_addon_module
+from test_calc_decimation import get_sphere
+
+bf_utils = load_addon_module("utils")
+
+is_fork = "fork" in multiprocessing.get_all_start_methods() and sys.platform != "darwin"
+
+# Jobs, as prepared for the export pool
+
+
+def get_jobs() -> "jobs":
+    jobs = list()
+    for n, target_faces in ((8, 50), (12, 100), (16, 200), (24, 0)):
+        co, tris = get_sphere(n)
+        mis = (co[tris].mean(axis=1)[:, 2] > 0.0).astype(np.int64)
+        jobs.append((co, tris, mis, target_faces))
+    return jobs
+
+
+def calc_job(job) -> "co, tris, mis, report":
+    co, tris, mis, target_faces = job
+    co, tris, mis = calc_decimation.decimate(co, tris, mis, target_faces, 0.05)
+    edges = np.unique(
+        np.sort(tris[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1), axis=0
+    )
+    report = calc_quality.get_quality_report(co, edges, tris, 1e-9, 1e-12)
+    return co, tris, mis, report
+
+
+# Process pool
+
+
+def test_get_pool_workers(monkeypatch):
+    assert bf_utils.get_pool_workers(1) == 1
+    monkeypatch.setattr(bf_utils.sys, "platform", "darwin")
+    assert bf_utils.get_pool_workers(0) == 1
+    assert bf_utils.get_pool_workers(4) == 1
+
+
+def get_pid(_) -> "pid":
+    return os.getpid()
+
+
+@pytest.mark.parametrize("max_workers", (1, 2, 0))
+def test_pool_map_workers(monkeypatch, max_workers):
+    pids = set(bf_utils.pool_map(get_pid, range(8), max_workers=max_workers))
+    is_pooled = is_fork and (max_workers or os.cpu_count() or 1) > 1
+    assert (os.getpid() not in pids) == is_pooled
+    monkeypatch.setattr(bf_utils.sys, "platform", "darwin")
+    pids = set(bf_utils.pool_map(get_pid, range(8), max_workers=max_workers))
+    assert pids == {os.getpid()}
+
+
+@pytest.mark.skipif(not is_fork, reason="process pool not available")
+def test_pool_parity():
+    jobs = get_jobs()
+    serial = bf_utils.pool_map(calc_job, jobs, max_workers=1)
+    pooled = bf_utils.pool_map(calc_job, jobs, max_workers=2)
+    assert len(serial) == len(pooled) == len(jobs)
+    for s, p in zip(serial, pooled):
+        for a, b in zip(s[:3], p[:3]):
+            assert a.dtype == b.dtype and np.array_equal(a, b)
+        assert s[3].keys() == p[3].keys()
+        for key in s[3]:
+            assert np.array_equal(s[3][key], p[3][key]), key
+
+
+# Staged files
+
+
+def test_replace_staged_files(tmp_path):
+    a, b = str(tmp_path / "a.bingeom"), str(tmp_path / "case.fds")
+    with open(b, "w") as f:
+        f.write("old")
+    staged = {a: bf_utils.stage_chunks_to_file(a, ("A",))}
+    staged[b] = bf_utils.stage_chunks_to_file(b, ("B", "C"))
+    assert bf_utils.replace_staged_files(staged)
+    assert not staged
+    with open(a) as fa, open(b) as fb:
+        assert (fa.read(), fb.read()) == ("A", "B\nC")
+    assert sorted(os.listdir(tmp_path)) == ["a.bingeom", "case.fds"]
+
+
+def test_replace_staged_files_failure(tmp_path):
+    b = str(tmp_path / "case.fds")
+    with open(b, "w") as f:
+        f.write("old")
+    missing = str(tmp_path / "missing" / "a.bingeom")  # not replaceable
+    staged = {missing: bf_utils.stage_chunks_to_file(b, ("A",))}
+    staged[b] = bf_utils.stage_chunks_to_file(b, ("B",))
+    assert not bf_utils.replace_staged_files(staged)
+    with open(b) as fb:
+        assert fb.read() == "old"
+    assert os.listdir(tmp_path) == ["case.fds"]
+
+
+def test_get_file_mode(tmp_path, monkeypatch):
+    filepath = str(tmp_path / "case.fds")
+    umask = os.umask(0o022)
+    os.umask(umask)
+    monkeypatch.setattr(bf_utils.os, "umask", None)  # never toggled on writes
+    assert bf_utils.get_file_mode(filepath) == 0o666 & ~umask
+    with open(filepath, "w"):
+        pass
+    os.chmod(filepath, 0o640)
+    assert bf_utils.get_file_mode(filepath) == 0o640
+    tmp_filepath = bf_utils.stage_chunks_to_file(filepath, ("A",))
+    assert os.stat(tmp_filepath).st_mode & 0o777 == 0o640
+    os.remove(tmp_filepath)
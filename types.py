@@ -23,6 +23,9 @@ from bpy.props import (
     FloatProperty,
     IntProperty,
     StringProperty,
+    BoolVectorProperty,
+    FloatVectorProperty,
+    IntVectorProperty,
     PointerProperty,
     EnumProperty,
     CollectionProperty,
@@ -30,7 +33,7 @@ from bpy.props import (
 
 from .config import separator, comment
 from .bl.custom_uilist import get_ops, draw_ops
-from .utils import is_iterable
+from .utils import format_values, get_formatter
 
 
 class BFException(Exception):
@@ -184,27 +187,79 @@ class Parameter:
         if not self.exported or not self.fds_label:
             return
         self.check(context)
-        # If value is not an iterable, then put it in a tuple
-        value = self.value
-        if not is_iterable(value):
-            values = tuple((value,))
-        else:
-            values = value
-        # Check first element of the iterable and choose formatting
-        if isinstance(values[0], bool):
-            value = ",".join(v and "T" or "F" for v in values)
-        elif isinstance(values[0], int):
-            value = ",".join(str(v) for v in values)
-        elif isinstance(values[0], float):
-            p = self.bpy_other.get("precision", 3)
-            value = ",".join(f"{v:.{p}f}" for v in values)
-        elif isinstance(values[0], str):
-            value = ",".join(f"'{v}'" for v in values)
-        else:
-            raise Exception(f"Parameter.to_fds: Unknown value type '{value}'")
+        value = format_values(self.value, self.bpy_other.get("precision", 3))
         return "=".join((self.fds_label, value))
 
 
+# Compiled parameter exporters
+# Namelists export their parameters by exporters compiled once by parameter
+# class at registration, that read the Blender property and format its
+# value with no Parameter instance, giving the same result as to_fds.
+# Values are formatted by utils.get_formatter, same as utils.format_values.
+# Parameters overriding to_fds, value, or exported, or with other Blender
+# properties, use the generic to_fds.
+# Parameters overriding check are instantiated only when exported.
+
+
+def _get_formatter(bpy_prop, precision) -> "fn(value) or None":
+    """Get the formatter of the values of the Blender property type."""
+    value_type, vector = {
+        BoolProperty: (bool, False),
+        IntProperty: (int, False),
+        FloatProperty: (float, False),
+        StringProperty: (str, False),
+        EnumProperty: (str, False),
+        BoolVectorProperty: (bool, True),
+        IntVectorProperty: (int, True),
+        FloatVectorProperty: (float, True),
+    }.get(bpy_prop, (None, False))
+    if value_type:
+        return get_formatter(value_type, precision, vector)
+
+
+def get_exporter(cls) -> "fn(context, element)":
+    """Get the exporter of a Parameter class, returning its to_fds result."""
+
+    def export_generic(context, element):
+        return cls(element).to_fds(context)
+
+    if (
+        cls.to_fds is not Parameter.to_fds
+        or cls.value is not Parameter.value
+        or cls.exported is not Parameter.exported
+        or not cls.bpy_idname
+        or "ENUM_FLAG" in cls.bpy_other.get("options", ())
+    ):
+        return export_generic
+    format_value = _get_formatter(cls.bpy_prop, cls.bpy_other.get("precision", 3))
+    if not format_value:
+        return export_generic
+    if not cls.fds_label:
+        return lambda context, element: None
+    idname, bpy_export, d = cls.bpy_idname, cls.bpy_export, cls.fds_default
+    has_check, start = cls.check is not Parameter.check, f"{cls.fds_label}="
+
+    def export(context, element):
+        # Same as exported
+        value = getattr(element, idname)
+        if value is None or value == "":
+            return
+        if d is not None and isinstance(value, float):  # floats comparison
+            exported = value > d + 1e-6 or value < d - 1e-6
+        elif d is not None and value == d:  # other comparison
+            exported = False
+        else:
+            exported = not bpy_export or getattr(element, bpy_export, True)
+        if not exported:
+            return
+        # Check and format
+        if has_check:
+            cls(element).check(context)
+        return start + format_value(value)
+
+    return export
+
+
 class Namelist(Parameter):
     """Generic FDS namelist."""
 
@@ -227,6 +282,12 @@ class Namelist(Parameter):
             p(el).draw(context, col)
         return col
 
+    @classmethod
+    def register(cls):
+        """Register related Blender properties, and compile the exporters."""
+        super().register()
+        cls._exporters = tuple(get_exporter(p) for p in cls.param_cls)
+
     @property
     def exported(self) -> "bool":
         """Get if parameter is exported."""
@@ -238,10 +299,14 @@ class Namelist(Parameter):
         # Check if export requested
         if not self.exported:
             return
-        # Init
+        # Init, the exporters of unregistered subclasses are not inherited
         fds_label, params, msgs = self.fds_label, list(), list()
-        for p in self.param_cls:
-            to_fds = p(self.element).to_fds(context)
+        exporters = self.__class__.__dict__.get("_exporters") or tuple(
+            get_exporter(p) for p in self.param_cls
+        )
+        el = self.element
+        for export in exporters:
+            to_fds = export(context, el)
             if to_fds:
                 if isinstance(to_fds, str):
                     params.append(to_fds)
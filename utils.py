@@ -14,7 +14,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import re
+import re, os, sys, tempfile, multiprocessing
+from collections import OrderedDict
 
 
 def is_iterable(var):
@@ -35,6 +36,55 @@ def is_iterable(var):
     return True
 
 
+# Format FDS values
+
+
+def format_values(value, precision=3) -> "str":
+    """Format a value, or an iterable of values, by the type of the first one.
+
+    >>> format_values((True, False)), format_values(3), format_values(1.23456, 2)
+    ('T,F', '3', '1.23')
+    """
+    # If value is not an iterable, then put it in a tuple
+    if not is_iterable(value):
+        values = tuple((value,))
+    else:
+        values = value
+    # Check first element of the iterable and choose formatting
+    if isinstance(values[0], bool):
+        return ",".join(v and "T" or "F" for v in values)
+    elif isinstance(values[0], int):
+        return ",".join(str(v) for v in values)
+    elif isinstance(values[0], float):
+        return ",".join(f"{v:.{precision}f}" for v in values)
+    elif isinstance(values[0], str):
+        return ",".join(f"'{v}'" for v in values)
+    raise Exception(f"format_values: Unknown value type '{value}'")
+
+
+def _format_bool(v) -> "str":
+    """Format a bool value."""
+    return v and "T" or "F"
+
+
+def get_formatter(value_type, precision=3, vector=False) -> "fn(value)":
+    """Get the formatter of a value of value_type, or of a vector, same as format_values.
+
+    >>> get_formatter(float, precision=2, vector=True)((1., 2.))
+    '1.00,2.00'
+    """
+    spec = f".{precision}f"
+    format_value = {
+        bool: _format_bool,
+        int: str,
+        float: lambda v: format(v, spec),
+        str: lambda v: f"'{v}'",
+    }[value_type]
+    if vector:
+        return lambda vs: ",".join(format_value(v) for v in vs)
+    return format_value
+
+
 # Write to file
 
 
@@ -47,10 +97,169 @@ def write_to_file(filepath, text_file):
     """Write text_file to filepath"""
     if text_file is None:
         text_file = str()
+    return write_chunks_to_file(filepath, (text_file,))
+
+
+def write_chunks_to_file(filepath, chunks, sep="\n", buffering=1 << 20):
+    """Write the chunks of text joined by sep to filepath, atomically.
+
+    Chunks are streamed to a temporary file in the same directory, that
+    replaces filepath when complete. On failure filepath is left untouched.
+    Return False if not writable, other exceptions from chunks are raised.
+    """
+    tmp_filepath = stage_chunks_to_file(filepath, chunks, sep, buffering)
+    if not tmp_filepath:
+        return False
+    return replace_staged_files({filepath: tmp_filepath})
+
+
+def stage_chunks_to_file(filepath, chunks, sep="\n", buffering=1 << 20):
+    """Write the chunks of text joined by sep to a temporary file beside filepath.
+
+    Return the temporary filepath, to be replaced by replace_staged_files,
+    or None if not writable. Other exceptions from chunks are raised.
+    """
     try:
-        with open(filepath, "w", encoding="utf8", errors="ignore") as out_file:
-            out_file.write(text_file)
-        return True
+        fd, tmp_filepath = tempfile.mkstemp(
+            prefix=".bf_", suffix=".tmp", dir=os.path.dirname(filepath) or "."
+        )
     except IOError:
-        return False
+        return None
+    done = False
+    try:
+        with os.fdopen(
+            fd, "w", encoding="utf8", errors="ignore", buffering=buffering
+        ) as out_file:
+            os.chmod(tmp_filepath, get_file_mode(filepath))
+            for i, chunk in enumerate(chunks):
+                if i:
+                    out_file.write(sep)
+                out_file.write(chunk)
+        done = True
+    except IOError:
+        return None
+    finally:
+        if not done:
+            os.remove(tmp_filepath)
+    return tmp_filepath
+
+
+def replace_staged_files(staged) -> "bool":
+    """Replace the filepaths with their staged temporary files, in order.
+
+    staged is a dict {filepath: tmp_filepath}, that is emptied.
+    On failure, the remaining temporary files are removed and the
+    remaining filepaths are left untouched, so the referencing file
+    (eg. the FDS case file) is to be staged last.
+    """
+    ok = True
+    for filepath, tmp_filepath in staged.items():
+        try:
+            if ok:
+                os.replace(tmp_filepath, filepath)
+                continue
+        except IOError:
+            ok = False
+        try:
+            os.remove(tmp_filepath)
+        except IOError:
+            pass
+    staged.clear()
+    return ok
+
 
+def remove_staged_files(staged):
+    """Remove the staged temporary files, and empty staged."""
+    for tmp_filepath in staged.values():
+        try:
+            os.remove(tmp_filepath)
+        except IOError:
+            pass
+    staged.clear()
+
+
+def _get_umask() -> "umask":
+    """Get the process umask, only once at import, when no other thread is writing."""
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+_new_file_mode = 0o666 & ~_get_umask()
+
+
+def get_file_mode(filepath) -> "mode":
+    """Get the mode of filepath, or the default mode of new files."""
+    try:
+        return os.stat(filepath).st_mode & 0o777
+    except IOError:
+        return _new_file_mode
+
+
+# Cache
+
+
+class LRUCache(OrderedDict):
+    """Size-bounded dict, evicting the least recently used items.
+
+    >>> c = LRUCache(maxsize=2); c["a"] = 1; c["b"] = 2; c.get("a"); c["c"] = 3
+    1
+    >>> list(c)
+    ['a', 'c']
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits, self.misses = 0, 0
+        super().__init__()
+
+    def get(self, key, default=None):
+        """Get the value of key, and mark it as recently used."""
+        if key not in self:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.move_to_end(key)
+        return self[key]
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+# Process pool
+
+
+def get_pool_workers(max_workers=1) -> "workers":
+    """Get the number of process pool workers, 1 if running serially.
+
+    Workers are forked from Blender, so the pool is opt-in (max_workers=1
+    runs serially, 0 uses all cores), and is never used on macOS, where
+    forking a multithreaded process without exec is unsafe, or on Windows.
+
+    >>> get_pool_workers(max_workers=1)
+    1
+    """
+    if max_workers == 1:
+        return 1
+    if sys.platform == "darwin":
+        return 1
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return 1
+    return max_workers or os.cpu_count() or 1
+
+
+def pool_map(fn, items, max_workers=1):
+    """Map fn on items in a process pool, or serially if unavailable.
+
+    >>> pool_map(abs, (-1, 2, -3), max_workers=1)
+    [1, 2, 3]
+    """
+    items = list(items)
+    max_workers = min(get_pool_workers(max_workers), len(items))
+    if max_workers > 1:  # fork, children inherit the loaded addon
+        with multiprocessing.get_context("fork").Pool(max_workers) as pool:
+            return pool.map(fn, items, chunksize=1)
+    return list(map(fn, items))